@@ -1,4 +1,4 @@
-__all__ = ['scan', 'execute', 'ModuleException']
+__all__ = ['scan', 'iscan', 'execute', 'ModuleException']
 
 from binwalk.core.module import Modules
 from binwalk.core.version import __version__ # This file is auto-generated by setup.py and ignored by .gitignore
@@ -11,5 +11,13 @@ def scan(*args, **kwargs):
     return objs
 
 
+def iscan(*args, **kwargs):
+    # Yields valid results as they are found; specify discard=True to
+    # not also keep them in the modules' results lists
+    with Modules(*args, **kwargs) as m:
+        for r in m.iexecute():
+            yield r
+
+
 def execute(*args, **kwargs):
     return scan(*args, **kwargs)
@@ -0,0 +1,136 @@
+# Statistical identification of the CPU architecture of machine code, from the
+# byte pair histograms of each architecture's code (see the Disasm module's
+# --fast-disasm option).
+
+from binwalk.core.compat import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Model log probabilities are stored as signed bytes, in units of 1/SCALE bits
+SCALE = 16
+
+# Byte pairs that were never seen in an architecture's code are counted this many times
+SMOOTHING = 0.5
+
+
+def byte_pairs(data):
+    '''
+    Converts data into the indexes of its byte pairs (i.e., (byte << 8) | next byte).
+
+    @data - The data, as a str, bytes or memoryview object.
+
+    Returns a NumPy array of byte pair indexes, one shorter than data.
+    '''
+    A = np.frombuffer(str2bytes(data), dtype=np.uint8)
+    return (A[:-1].astype(np.intp) << 8) | A[1:]
+
+
+def pair_counts(data):
+    '''
+    Counts the byte pairs in data.
+
+    @data - The data, as a str, bytes or memoryview object.
+
+    Returns a NumPy array of 65536 byte pair counts.
+    '''
+    return np.bincount(byte_pairs(data), minlength=65536)
+
+
+class ArchModels(object):
+
+    '''
+    A set of per-architecture byte pair models.
+
+    Each model holds the log2 probability of each byte pair in an architecture's code,
+    relative to the probability of each byte pair in uniformly random data. The score
+    of a piece of data against a model is the average of these values over the data's
+    byte pairs: the number of bits per byte pair by which the model predicts the data
+    better than random data does. Code scores highest against the model of its own
+    architecture, and random or compressed data scores at or below 0 against all models.
+    '''
+
+    def __init__(self, fname):
+        '''
+        Class constructor.
+
+        @fname - Path to the models file, as written by ArchModels.save.
+
+        Returns None.
+        '''
+        if np is None:
+            raise ImportError("No module named numpy")
+
+        with np.load(fname) as models:
+            self.descriptions = [str(d) for d in models['descriptions']]
+            self.models = models['models'].astype(np.int32)
+
+    @staticmethod
+    def save(fname, counts):
+        '''
+        Builds models from the byte pair counts of each architecture's code, and saves them.
+
+        @fname  - Path to the models file.
+        @counts - A list of (architecture description, array of byte pair counts) tuples,
+                  as returned by pair_counts.
+
+        Returns None.
+        '''
+        models = []
+
+        for (description, c) in counts:
+            p = (c + SMOOTHING) / float(c.sum() + (SMOOTHING * 65536))
+            models.append(np.clip(np.round(np.log2(p * 65536) * SCALE), -128, 127).astype(np.int8))
+
+        with open(fname, 'wb') as fp:
+            np.savez_compressed(fp, descriptions=np.array([d for (d, c) in counts]), models=np.array(models))
+
+    def score(self, data, window):
+        '''
+        Scores each window of a data block against each model.
+
+        @data   - The data block, as a str, bytes or memoryview object.
+        @window - The size of each window.
+
+        Returns an array of scores with one row per window and one column per model,
+        in bits per byte pair. Windows whose bytes are all the same score 0.
+        '''
+        A = np.frombuffer(str2bytes(data), dtype=np.uint8)
+        if len(A) < 2:
+            return np.zeros((len(A), len(self.models)))
+
+        pairs = byte_pairs(A)
+        starts = np.arange(0, len(pairs), window)
+        lengths = np.diff(np.append(starts, len(pairs)))
+
+        scores = np.empty((len(starts), len(self.models)))
+        for (i, model) in enumerate(self.models):
+            scores[:, i] = np.add.reduceat(model[pairs], starts) / (lengths * float(SCALE))
+
+        # Runs of the same byte (e.g., padding) are predicted well by most models,
+        # but aren't code
+        uniform = np.minimum.reduceat(A[:len(pairs)], starts) == np.maximum.reduceat(A[:len(pairs)], starts)
+        scores[uniform] = 0
+
+        return scores
+
+    def classify(self, data, dlen, window, threshold):
+        '''
+        Finds the most likely architecture of each window of a data block.
+
+        @data      - The data block, as returned by read_block.
+        @dlen      - The length of the data block. Windows start at offsets below dlen,
+                     but the last window may extend into the block's trailing peek data.
+        @window    - The size of each window.
+        @threshold - The minimum score of a window, in bits per byte pair.
+
+        Returns a list of (window offset, model index) tuples for the windows that
+        score at least threshold against any model.
+        '''
+        count = (dlen + window - 1) // window
+        scores = self.score(data[:count * window + 1], window)[:count]
+        best = scores.argmax(axis=1)
+
+        return [(i * window, int(best[i])) for i in np.flatnonzero(scores[np.arange(len(best)), best] >= threshold)]
@@ -0,0 +1,217 @@
+# Statistical tests of byte distributions (chi-square, arithmetic mean, Monte
+# Carlo value of pi and serial correlation, as reported by the ent utility),
+# used to tell plaintext, compressed and encrypted data apart (see the Entropy
+# module's --classify option).
+
+import math
+import operator
+import collections
+from binwalk.core.compat import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PLAINTEXT = 'plaintext'
+COMPRESSED = 'compressed'
+ENCRYPTED = 'encrypted'
+
+# Data with a lower Shannon entropy (as a fraction of 8 bits per byte) is plaintext
+PLAINTEXT_ENTROPY = 0.9
+
+# The 99th percentile of the chi-square distribution with 255 degrees of freedom;
+# random data has a higher chi-square only 1% of the time
+CHI_SQUARE_LIMIT = 310.457
+
+# The serial correlation of random data is within this many standard deviations
+# (1 / sqrt(length)) of 0
+SERIAL_CORRELATION_SIGMAS = 4.0
+
+# Monte Carlo points are pairs of 24-bit coordinates; points at most this
+# (squared) distance from the origin are inside the circle
+MONTE_CARLO_RADIUS = (256 ** 3 - 1) ** 2
+
+# Maximum number of data bytes processed at once by analyze_blocks
+NUMPY_BATCH_SIZE = 1024 * 1024
+
+
+class ByteStatistics(object):
+
+    '''
+    The statistics of a piece of data, and its classification.
+
+    Compressed and encrypted data both have a high entropy, but the output of most
+    compressors deviates measurably from a uniform byte distribution, while good
+    encryption does not. This is a statistical test: small pieces of compressed
+    data, and the output of range coders such as LZMA, are often indistinguishable
+    from random data.
+    '''
+
+    __slots__ = ('length', 'entropy', 'chi_square', 'mean', 'monte_carlo_pi', 'serial_correlation', 'classification')
+
+    def __init__(self, length, entropy, chi_square, mean, monte_carlo_pi, serial_correlation):
+        '''
+        Class constructor.
+
+        @length             - The length of the data, in bytes.
+        @entropy            - The Shannon entropy of the data, as a fraction of 8 bits per byte.
+        @chi_square         - The chi-square statistic of the byte distribution.
+        @mean               - The arithmetic mean of the data bytes.
+        @monte_carlo_pi     - The Monte Carlo estimate of pi from the data.
+        @serial_correlation - The serial correlation coefficient of consecutive data bytes.
+
+        Returns None.
+        '''
+        self.length = length
+        self.entropy = entropy
+        self.chi_square = chi_square
+        self.mean = mean
+        self.monte_carlo_pi = monte_carlo_pi
+        self.serial_correlation = serial_correlation
+        self.classification = classify(self)
+
+
+def classify(stats):
+    '''
+    Classifies a piece of data by its statistics.
+
+    @stats - An instance of ByteStatistics.
+
+    Returns PLAINTEXT, COMPRESSED or ENCRYPTED.
+    '''
+    if stats.entropy < PLAINTEXT_ENTROPY:
+        return PLAINTEXT
+    elif (stats.chi_square <= CHI_SQUARE_LIMIT and
+            abs(stats.serial_correlation) * math.sqrt(stats.length) <= SERIAL_CORRELATION_SIGMAS):
+        return ENCRYPTED
+    return COMPRESSED
+
+
+def _serial_correlation(length, total, squares, products):
+    # The serial correlation coefficient, where the last byte is followed by the first;
+    # data whose bytes are all the same is perfectly correlated.
+    d = (length * squares) - (total * total)
+    if d == 0:
+        return 1.0
+    return float((length * products) - (total * total)) / d
+
+
+def analyze(data):
+    '''
+    Calculates the statistics of a piece of data.
+
+    @data - The data, as a str or bytes object.
+
+    Returns an instance of ByteStatistics.
+    '''
+    if not data:
+        return ByteStatistics(0, 0.0, 0.0, 0.0, 0.0, 0.0)
+    elif np is not None:
+        return analyze_blocks(data, len(data), len(data))[0]
+
+    data = bytearray(str2bytes(data))
+    length = len(data)
+
+    counts = collections.Counter(data)
+    expected = length / 256.0
+    entropy = 0.0
+    chi_square = 0.0
+
+    for byte in range(0, 256):
+        count = counts.get(byte, 0)
+        if count:
+            p_x = float(count) / length
+            entropy -= p_x * math.log(p_x, 2)
+        chi_square += ((count - expected) ** 2) / expected
+
+    total = sum([byte * count for (byte, count) in counts.items()])
+    squares = sum([byte * byte * count for (byte, count) in counts.items()])
+    products = sum(map(operator.mul, data, data[1:] + data[:1]))
+
+    inside = 0
+    points = length // 6
+    for i in range(0, points * 6, 6):
+        x = (data[i] << 16) | (data[i + 1] << 8) | data[i + 2]
+        y = (data[i + 3] << 16) | (data[i + 4] << 8) | data[i + 5]
+        if (x * x) + (y * y) <= MONTE_CARLO_RADIUS:
+            inside += 1
+
+    return ByteStatistics(length,
+                          entropy / 8,
+                          chi_square,
+                          float(total) / length,
+                          (4.0 * inside / points) if points else 0.0,
+                          _serial_correlation(length, total, squares, products))
+
+
+def analyze_blocks(data, dlen, block_size):
+    '''
+    Calculates the statistics of each piece of a data block, using NumPy if it is
+    available. Full size pieces are analyzed in batches, as rows of a 2D array.
+
+    @data       - The data block, as returned by read_block.
+    @dlen       - The length of the data block. Pieces start at offsets below dlen,
+                  but the last piece may extend into the block's trailing peek data.
+    @block_size - The size of each piece.
+
+    Returns a list of ByteStatistics instances.
+    '''
+    starts = range(0, dlen, block_size)
+
+    if np is None:
+        return [analyze(data[i:i + block_size]) for i in starts]
+
+    A = np.frombuffer(str2bytes(data), dtype=np.uint8)
+    # Number of pieces that are block_size bytes long
+    rows = min(len(starts), len(A) // block_size)
+    # Number of rows processed at once
+    batch = max(1, NUMPY_BATCH_SIZE // block_size)
+    expected = block_size / 256.0
+    points = block_size // 6
+    stats = []
+
+    for first in range(0, rows, batch):
+        n = min(batch, rows - first)
+        R = A[first * block_size:(first + n) * block_size].reshape(n, block_size)
+
+        # Offset each row's byte values so that each row gets its own 256 histogram bins
+        bins = (R + (np.arange(n, dtype=np.intp) * 256)[:, None]).ravel()
+        counts = np.bincount(bins, minlength=n * 256).reshape(n, 256)
+
+        p = counts / float(block_size)
+        entropy = (0.0 - (p * np.log2(np.where(counts > 0, p, 1.0))).sum(axis=1)) / 8
+        chi_square = (((counts - expected) ** 2) / expected).sum(axis=1)
+
+        U = R.astype(np.int64)
+        total = U.sum(axis=1)
+        squares = (U * U).sum(axis=1)
+        products = (U * np.roll(U, -1, axis=1)).sum(axis=1)
+
+        if points:
+            G = U[:, :points * 6].reshape(n, points, 6)
+            x = (G[:, :, 0] << 16) | (G[:, :, 1] << 8) | G[:, :, 2]
+            y = (G[:, :, 3] << 16) | (G[:, :, 4] << 8) | G[:, :, 5]
+            pi = (4.0 * ((x * x) + (y * y) <= MONTE_CARLO_RADIUS).sum(axis=1)) / points
+        else:
+            pi = np.zeros(n)
+
+        for (e, c, t, s, m, q) in zip(entropy.tolist(),
+                                      chi_square.tolist(),
+                                      total.tolist(),
+                                      squares.tolist(),
+                                      products.tolist(),
+                                      pi.tolist()):
+            stats.append(ByteStatistics(block_size,
+                                        e,
+                                        c,
+                                        float(t) / block_size,
+                                        q,
+                                        _serial_correlation(block_size, t, s, m)))
+
+    # Any remaining piece at the end of the data is shorter than block_size
+    for i in starts[rows:]:
+        piece = data[i:i + block_size]
+        stats.extend(analyze_blocks(piece, len(piece), len(piece)))
+
+    return stats
@@ -5,6 +5,7 @@ import os
 import re
 import sys
 import ast
+import mmap
 import platform
 import operator as op
 import binwalk.core.idb
@@ -197,6 +198,19 @@ def strings(filename, minimum=4):
                     result = ""
 
 
+def data_strings(data, minimum=4):
+    '''
+    A strings generator for a block of data, similar to the Unix strings utility.
+
+    @data    - The data to search for strings in, as a str or bytes object.
+    @minimum - The minimum string length to search for.
+
+    Yields (offset, string) tuples for the printable ASCII strings in data.
+    '''
+    for m in re.finditer('[%s]{%d,}' % (re.escape(string.printable), minimum), bytes2str(data)):
+        yield (m.start(), m.group())
+
+
 class GenericContainer(object):
 
     def __init__(self, **kwargs):
@@ -250,6 +264,60 @@ class MathExpression(object):
             raise TypeError(node)
 
 
+class MMapFile(io.FileIO):
+
+    '''
+    A class to access files through a read-only memory mapping.
+    Used internally as a conditional superclass to InternalBlockFile, so that data
+    blocks are sliced directly out of the mapping rather than read through the file.
+    '''
+
+    def __init__(self, fname, mode='r'):
+        io.FileIO.__init__(self, fname, mode)
+        self.mmap = None
+
+        # Empty files can't be mapped; these (and files opened for writing)
+        # are accessed through the usual io.FileIO methods instead.
+        if mode == 'r':
+            try:
+                self.mmap = mmap.mmap(self.fileno(), 0, access=mmap.ACCESS_READ)
+            except KeyboardInterrupt as e:
+                raise e
+            except Exception as e:
+                self.mmap = None
+
+    def window(self, start, end):
+        '''
+        Returns a memoryview of the mapped file data from offset start to offset end.
+        No data is copied.
+        '''
+        return memoryview(self.mmap)[start:end]
+
+    def read(self, n=-1):
+        if self.mmap is None:
+            return io.FileIO.read(self, n)
+
+        pos = io.FileIO.tell(self)
+        if n < 0:
+            data = self.mmap[pos:]
+        else:
+            data = self.mmap[pos:pos + n]
+        io.FileIO.seek(self, pos + len(data))
+
+        return data
+
+    def close(self):
+        if self.mmap is not None:
+            try:
+                self.mmap.close()
+            # Raised if there are still references to self.window memoryviews;
+            # the mapping is closed once they are garbage collected.
+            except BufferError as e:
+                pass
+            self.mmap = None
+        io.FileIO.close(self)
+
+
 class StringFile(object):
 
     '''
@@ -323,7 +391,7 @@ def BlockFile(fname, mode='r', subclass=io.FileIO, **kwargs):
         # blocks.
         DEFAULT_BLOCK_READ_SIZE = 1 * 1024 * 1024
 
-        def __init__(self, fname, mode='r', length=0, offset=0, block=DEFAULT_BLOCK_READ_SIZE, peek=DEFAULT_BLOCK_PEEK_SIZE, swap=0):
+        def __init__(self, fname, mode='r', length=0, offset=0, block=DEFAULT_BLOCK_READ_SIZE, peek=DEFAULT_BLOCK_PEEK_SIZE, swap=0, native=False):
             '''
             Class constructor.
 
@@ -334,6 +402,7 @@ def BlockFile(fname, mode='r', subclass=io.FileIO, **kwargs):
             @block  - Size of data block to read (excluding any trailing size),
             @peek   - Size of trailing data to append to the end of each block.
             @swap   - Swap every n bytes of data.
+            @native - Return bytes objects from reads instead of str objects (Python 3 only).
 
             Returns None.
             '''
@@ -350,6 +419,7 @@ def BlockFile(fname, mode='r', subclass=io.FileIO, **kwargs):
                                          block=block,
                                          peek=peek,
                                          swap=swap,
+                                         native=native,
                                          size=0)
 
             # Python 2.6 doesn't like modes like 'rb' or 'wb'
@@ -359,6 +429,9 @@ def BlockFile(fname, mode='r', subclass=io.FileIO, **kwargs):
 
             self.swap_size = self.args.swap
 
+            # In Python 2 str objects are already bytes objects
+            self.native = bool(self.args.native and PY_MAJOR_VERSION > 2)
+
             if self.args.size:
                 self.size = self.args.size
             else:
@@ -415,10 +488,10 @@ def BlockFile(fname, mode='r', subclass=io.FileIO, **kwargs):
 
             @block - The data block to swap.
 
-            Returns a swapped string.
+            Returns a swapped string (or bytes object, if block is a bytes object).
             '''
             i = 0
-            data = ""
+            data = block[0:0]
 
             if self.swap_size > 0:
                 while i < len(block):
@@ -466,7 +539,7 @@ def BlockFile(fname, mode='r', subclass=io.FileIO, **kwargs):
             io.FileIO.read does not guaruntee that all requested data will be read;
             this method overrides io.FileIO.read and does guaruntee that all data will be read.
 
-            Returns a str object containing the read data.
+            Returns a str object containing the read data (a bytes object if self.native is set).
             '''
             l = 0
             data = b''
@@ -487,7 +560,10 @@ def BlockFile(fname, mode='r', subclass=io.FileIO, **kwargs):
 
                 self.total_read += len(data)
 
-            return self._swap_data_block(bytes2str(data))
+            if not self.native:
+                data = bytes2str(data)
+
+            return self._swap_data_block(data)
 
         def peek(self, n=-1):
             '''
@@ -513,11 +589,40 @@ def BlockFile(fname, mode='r', subclass=io.FileIO, **kwargs):
             Reads in a block of data from the target file.
 
             Returns a tuple of (str(file block data), block data length).
+            If self.native is set, the block data is a bytes object.
             '''
+            # Memory mapped files (see MMapFile) provide the data block and its
+            # trailing peek data as a single window into the file
+            if getattr(self, 'mmap', None) is not None and not self.swap_size:
+                return self._read_window_block()
+
             data = self.read(self.block_read_size)
             dlen = len(data)
             data += self.peek(self.block_peek_size)
 
             return (data, dlen)
 
+        def _read_window_block(self):
+            '''
+            Equivalent to self.read_block for memory mapped files; the block data is
+            decoded directly from the mapping, with no intermediate reads or seeks.
+            '''
+            pos = self.tell()
+
+            # Don't read more than self.length bytes (see self.read)
+            if self.total_read < self.length:
+                n = min(self.block_read_size, self.length - self.total_read)
+                dlen = max(0, min(n, len(self.mmap) - pos))
+            else:
+                dlen = 0
+
+            data = self.window(pos, pos + dlen + self.block_peek_size)
+            if self.native:
+                data = data.tobytes()
+            else:
+                data = buffer2str(data)
+            self.seek(pos + dlen)
+
+            return (data, dlen)
+
     return InternalBlockFile(fname, mode=mode, **kwargs)
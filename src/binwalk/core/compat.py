@@ -2,12 +2,14 @@
 
 from __future__ import print_function
 import sys
+import codecs
 import string
 
 PY_MAJOR_VERSION = sys.version_info[0]
 
 if PY_MAJOR_VERSION > 2:
     string.letters = string.ascii_letters
+    long = int
 
 
 def get_class_name_from_method(method):
@@ -67,6 +69,18 @@ def bytes2str(bs):
         return bs
 
 
+def buffer2str(buf):
+    '''
+    For cross compatibility between Python 2 and Python 3 strings.
+    Converts any bytes-like object (e.g., a memoryview) into a str, without
+    first copying it into an intermediate bytes object.
+    '''
+    if PY_MAJOR_VERSION > 2:
+        return codecs.latin_1_decode(buf)[0]
+    else:
+        return buf.tobytes()
+
+
 def string_decode(string):
     '''
     For cross compatibility between Python 2 and Python 3 strings.
@@ -0,0 +1,337 @@
+# Persistent multi-resolution index of the byte histograms of target files
+# (see the Entropy module's --index option).
+
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import binwalk.core.common
+from binwalk.core.compat import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class EntropyIndex(object):
+
+    '''
+    A pyramid of the byte histograms of a file's data.
+
+    Level 0 holds the histogram of each LEAF_SIZE byte piece of the file (the last
+    piece may be shorter), and each higher level holds the sums of pairs of histograms
+    from the level below, up to a single histogram of the entire file. The histogram
+    of any range of the file that starts and ends on a multiple of LEAF_SIZE (or at
+    the end of the file) is the sum of at most two histograms per level.
+
+    Each level is stored as a NumPy .npy file, and is memory mapped when loaded.
+    '''
+
+    # Size of the pieces of data in level 0, in bytes
+    LEAF_SIZE = 4 * 1024
+
+    # Size of the data read at once when building an index
+    READ_SIZE = 4 * 1024 * 1024
+
+    # Maximum number of histograms summed at once
+    BATCH_SIZE = 64 * 1024
+
+    LEVEL_FILE = "level%d.npy"
+
+    def __init__(self, path):
+        '''
+        Class constructor.
+
+        @path - The directory containing the index's level files.
+
+        Returns None.
+        '''
+        self.path = path
+        self.levels = []
+
+        while True:
+            fname = os.path.join(path, self.LEVEL_FILE % len(self.levels))
+            if not os.path.exists(fname):
+                break
+            self.levels.append(np.load(fname, mmap_mode='r'))
+
+        if not self.levels:
+            raise IOError("No entropy index found in %s" % path)
+
+        # The top level histogram counts every byte in the file
+        self.size = int(self.levels[-1][0].sum())
+
+    @classmethod
+    def _dtype(cls, level):
+        # The smallest unsigned type that can hold a count of every byte in a node
+        largest = cls.LEAF_SIZE << level
+        if largest <= 0xFFFF:
+            return np.uint16
+        elif largest <= 0xFFFFFFFF:
+            return np.uint32
+        return np.uint64
+
+    @classmethod
+    def index_size(cls, size):
+        '''
+        Calculates the size of the index of a file.
+
+        @size - The size of the file, in bytes.
+
+        Returns the size of the index's level data, in bytes.
+        '''
+        nodes = max(1, (size + cls.LEAF_SIZE - 1) // cls.LEAF_SIZE)
+        total = 0
+        k = 0
+
+        while True:
+            total += nodes * 256 * np.dtype(cls._dtype(k)).itemsize
+            if nodes == 1:
+                break
+            nodes = (nodes + 1) // 2
+            k += 1
+
+        return total
+
+    @classmethod
+    def build(cls, fname, path):
+        '''
+        Builds the index of a file.
+
+        @fname - Path to the file.
+        @path  - The directory to write the index's level files to.
+
+        Returns the SHA256 hex digest of the file contents.
+        '''
+        h = hashlib.sha256()
+        size = binwalk.core.common.file_size(fname)
+        nodes = max(1, (size + cls.LEAF_SIZE - 1) // cls.LEAF_SIZE)
+
+        level = np.lib.format.open_memmap(os.path.join(path, cls.LEVEL_FILE % 0),
+                                          mode='w+',
+                                          dtype=cls._dtype(0),
+                                          shape=(nodes, 256))
+
+        # Level 0 is built while the file is hashed, so the file is only read once
+        with open(fname, 'rb') as fp:
+            i = 0
+            while True:
+                data = fp.read(cls.READ_SIZE)
+                if not data:
+                    break
+                h.update(data)
+
+                A = np.frombuffer(data, dtype=np.uint8)
+                n = (len(A) + cls.LEAF_SIZE - 1) // cls.LEAF_SIZE
+                # Offset each leaf's byte values so that each leaf gets its own 256 histogram bins
+                bins = A + (np.arange(len(A), dtype=np.intp) // cls.LEAF_SIZE) * 256
+                level[i:i + n] = np.bincount(bins, minlength=n * 256).reshape(n, 256)
+                i += n
+
+        level.flush()
+
+        k = 0
+        while len(level) > 1:
+            k += 1
+            parent = np.lib.format.open_memmap(os.path.join(path, cls.LEVEL_FILE % k),
+                                               mode='w+',
+                                               dtype=cls._dtype(k),
+                                               shape=((len(level) + 1) // 2, 256))
+
+            for i in range(0, len(level), cls.BATCH_SIZE):
+                rows = np.array(level[i:i + cls.BATCH_SIZE], dtype=parent.dtype)
+                if len(rows) % 2:
+                    rows = np.vstack((rows, np.zeros((1, 256), dtype=parent.dtype)))
+                parent[i // 2:(i + len(rows)) // 2] = rows[0::2] + rows[1::2]
+
+            parent.flush()
+            del level
+            level = parent
+
+        del level
+        return h.hexdigest()
+
+    def histogram(self, start, end):
+        '''
+        Calculates the byte histogram of a range of the file.
+
+        @start - The file offset of the start of the range; must be a multiple of LEAF_SIZE.
+        @end   - The file offset of the end of the range; must be a multiple of LEAF_SIZE,
+                 or the end of the file.
+
+        Returns an array of 256 byte counts.
+        '''
+        counts = np.zeros(256, dtype=np.int64)
+        l = start // self.LEAF_SIZE
+        r = (end + self.LEAF_SIZE - 1) // self.LEAF_SIZE
+        k = 0
+
+        while l < r:
+            nodes = self.levels[k]
+            if l & 1:
+                counts += nodes[l]
+                l += 1
+            if r & 1:
+                r -= 1
+                counts += nodes[r]
+            l >>= 1
+            r >>= 1
+            k += 1
+
+        return counts
+
+    def histograms(self, start, size, count):
+        '''
+        Calculates the byte histograms of consecutive, equally sized ranges of the file.
+
+        @start - The file offset of the first range; must be a multiple of LEAF_SIZE.
+        @size  - The size of each range; must be a multiple of LEAF_SIZE.
+        @count - The number of ranges. Only the last range may extend past the end of the file.
+
+        Yields tuples of (file offset, array of byte counts with one row per range).
+        '''
+        first = start // self.LEAF_SIZE
+        width = size // self.LEAF_SIZE
+        k = 0
+
+        # Use the highest level whose nodes line up with the ranges
+        while k + 1 < len(self.levels) and not (first % 2 or width % 2):
+            first //= 2
+            width //= 2
+            k += 1
+
+        nodes = self.levels[k]
+        batch = max(1, self.BATCH_SIZE // width)
+
+        for i in range(0, count, batch):
+            n = min(batch, count - i)
+            rows = np.array(nodes[first + (i * width):first + ((i + n) * width)], dtype=np.int64)
+            # The last range may be short a few nodes at the end of the file
+            if len(rows) < n * width:
+                rows = np.vstack((rows, np.zeros((n * width - len(rows), 256), dtype=np.int64)))
+            yield (start + (i * size), rows.reshape(n, width, 256).sum(axis=1))
+
+
+class EntropyIndexCache(object):
+
+    '''
+    The directory of EntropyIndex files built by previous scans, keyed by a hash of
+    the indexed file data.
+
+    File digests are remembered by path, size, modification time and inode, so that
+    unmodified files don't need to be read again to find their index. The least
+    recently used indexes are deleted once the cache grows past its maximum size.
+    '''
+
+    # Name of the index directory in the cache directory
+    DIRECTORY = "entropy"
+
+    # Name of the database file in the index directory
+    DATABASE = "index.sqlite"
+
+    # Seconds to wait for other binwalk processes that are writing to the database
+    TIMEOUT = 30
+
+    def __init__(self, path, max_size):
+        '''
+        Class constructor.
+
+        @path     - The cache directory.
+        @max_size - The maximum size of all cached indexes, in bytes.
+
+        Returns None.
+        '''
+        if np is None:
+            raise ImportError("No module named numpy")
+
+        self.max_size = max_size
+        self.path = os.path.join(path, self.DIRECTORY)
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        self.db = sqlite3.connect(os.path.join(self.path, self.DATABASE), timeout=self.TIMEOUT)
+        self.db.execute("CREATE TABLE IF NOT EXISTS files "
+                        "(path TEXT PRIMARY KEY, size INTEGER, mtime REAL, inode INTEGER, digest TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS indexes "
+                        "(digest TEXT PRIMARY KEY, size INTEGER, atime REAL)")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def open(self, fname):
+        '''
+        Loads the index of a file, building it first if it is not in the cache.
+
+        @fname - Path to the file.
+
+        Returns an instance of EntropyIndex.
+        '''
+        fname = os.path.realpath(fname)
+        st = os.stat(fname)
+        stamp = (st.st_size, st.st_mtime, st.st_ino)
+
+        row = self.db.execute("SELECT size, mtime, inode, digest FROM files WHERE path=?", (fname,)).fetchone()
+        if row is not None and tuple(row[0:3]) == stamp and os.path.isdir(self._index_path(row[3])):
+            digest = row[3]
+            binwalk.core.common.debug("Using cached entropy index for '%s'" % fname)
+        else:
+            # Indexes that can't fit in the cache aren't built; _evict would delete
+            # every other index, and still leave the cache over its maximum size
+            index_size = EntropyIndex.index_size(st.st_size)
+            if index_size > self.max_size:
+                raise IOError("the index of a %.1f MB file needs %.1f MB, more than the maximum index cache size (%.1f MB)" %
+                              (st.st_size / (1024.0 * 1024), index_size / (1024.0 * 1024), self.max_size / (1024.0 * 1024)))
+
+            digest = self._build(fname)
+            self.db.execute("INSERT OR REPLACE INTO files (path, size, mtime, inode, digest) VALUES (?, ?, ?, ?, ?)",
+                            (fname,) + stamp + (digest,))
+
+        self.db.execute("UPDATE indexes SET atime=? WHERE digest=?", (time.time(), digest))
+        self.db.commit()
+
+        return EntropyIndex(self._index_path(digest))
+
+    def _index_path(self, digest):
+        return os.path.join(self.path, digest)
+
+    def _build(self, fname):
+        binwalk.core.common.debug("Building entropy index for '%s'" % fname)
+
+        tmp = tempfile.mkdtemp(dir=self.path)
+        try:
+            digest = EntropyIndex.build(fname, tmp)
+            path = self._index_path(digest)
+
+            # Another file with identical contents may have already been indexed
+            if os.path.isdir(path):
+                shutil.rmtree(tmp)
+            else:
+                os.rename(tmp, path)
+                size = sum([os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)])
+                self.db.execute("INSERT OR REPLACE INTO indexes (digest, size, atime) VALUES (?, ?, ?)",
+                                (digest, size, time.time()))
+                self._evict(digest)
+        finally:
+            # Don't leave partially built indexes behind
+            if os.path.isdir(tmp):
+                shutil.rmtree(tmp, ignore_errors=True)
+
+        return digest
+
+    def _evict(self, keep):
+        total = self.db.execute("SELECT SUM(size) FROM indexes").fetchone()[0] or 0
+        if total <= self.max_size:
+            return
+
+        for (digest, size) in self.db.execute("SELECT digest, size FROM indexes ORDER BY atime").fetchall():
+            if total <= self.max_size:
+                break
+            if digest != keep:
+                shutil.rmtree(self._index_path(digest), ignore_errors=True)
+                self.db.execute("DELETE FROM indexes WHERE digest=?", (digest,))
+                self.db.execute("DELETE FROM files WHERE digest=?", (digest,))
+                total -= size
@@ -23,3 +23,13 @@ class IgnoreFileException(Exception):
     should be ignored.
     '''
     pass
+
+
+class ScanAborted(BaseException):
+
+    '''
+    Raised inside a running scan to stop it when the consumer of the results
+    yielded by Modules.iexecute has gone away. Derived from BaseException so that
+    it isn't caught and reported as an error by modules.
+    '''
+    pass
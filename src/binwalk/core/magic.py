@@ -4,20 +4,45 @@
 
 __all__ = ['Magic']
 
+import os
 import re
+import sys
+import ast
 import struct
+import pickle
+import marshal
+import hashlib
+import tempfile
+import threading
+import operator
 import datetime
+import collections
 import binwalk.core.common
 import binwalk.core.compat
 from binwalk.core.exceptions import ParserException
 
 
+def native_regex(regex):
+    '''
+    Re-compiles a str regular expression as a bytes regular expression, for matching
+    against bytes data (see Magic.scan). Note that character classes such as \\w and \\s
+    only match ASCII characters in bytes regular expressions.
+
+    @regex - A compiled str regular expression.
+
+    Returns a compiled regular expression.
+    '''
+    return re.compile(binwalk.core.compat.str2bytes(regex.pattern), regex.flags & ~re.UNICODE)
+
+
 class SignatureResult(binwalk.core.module.Result):
 
     '''
     Container class for signature results.
     '''
 
+    __slots__ = ('jump', 'many', 'adjust', 'strlen', 'string', 'invalid', 'once', 'overlap', 'end', 'id')
+
     def __init__(self, **kwargs):
         # These are set by signature keyword tags.
         # Keyword tags can also set any other object attributes,
@@ -293,7 +318,15 @@ class Signature(object):
         self.lines = [first_line]
         self.title = first_line.format
         self.offset = first_line.offset
+        # The literal magic bytes of the signature (None for regex signatures);
+        # set by self._generate_regex and used to build the Prefilter.
+        self.literal = None
         self.regex = self._generate_regex(first_line)
+        # The compiled analysis function for this signature; generated on
+        # first use by Magic.scan (see SignatureCompiler).
+        self.analyzer = None
+        # Same as self.analyzer, but for scans of bytes data
+        self.native_analyzer = None
         try:
             self.confidence = first_line.tags['confidence']
         except KeyError:
@@ -372,8 +405,27 @@ class Signature(object):
                     binwalk.core.common.warning("Signature '%s' is a self-overlapping signature!" % line.text)
                     break
 
+        self.literal = restr
+
         return re.compile(re.escape(restr))
 
+    def __getstate__(self):
+        # Compiled analyzer functions can't be pickled (see SignatureCache)
+        state = self.__dict__.copy()
+        state['analyzer'] = None
+        state['native_analyzer'] = None
+        # The regex of literal signatures is only re-built on demand, as
+        # compiling them all accounts for most of the time spent unpickling
+        if self.literal is not None:
+            del state['regex']
+        return state
+
+    def __getattr__(self, name):
+        if name == 'regex' and self.__dict__.get('literal') is not None:
+            self.regex = re.compile(re.escape(self.literal))
+            return self.regex
+        raise AttributeError(name)
+
     def append(self, line):
         '''
         Add a new SignatureLine object to the signature.
@@ -387,6 +439,787 @@ class Signature(object):
         self.lines.append(line)
 
 
+class Prefilter(object):
+
+    '''
+    Locates candidate offsets for a list of signatures.
+
+    Rather than running one regular expression per signature over each data
+    block, the literal magic bytes of all signatures are merged into a trie,
+    and one regular expression is built per leading byte of that trie. Each
+    search hit identifies the longest matching magic string, from which every
+    signature whose magic bytes match at that offset is derived.
+
+    Python's regex engine has no multi-literal dispatch, so one alternation of
+    all magic strings is slower than a search per signature; splitting the trie
+    at its first level lets each expression use the engine's fast literal prefix
+    search, while still de-duplicating the magic strings shared by signatures.
+    '''
+
+    def __init__(self, signatures, native=False):
+        '''
+        Class constructor.
+
+        @signatures - A list of Signature objects, in the order they are to be processed.
+        @native     - Set to True to search bytes data instead of str data.
+
+        Returns None.
+        '''
+        # Number of signatures that candidate offsets are returned for
+        self.count = len(signatures)
+        # Signatures with regex magic types are searched individually
+        self.regexes = []
+        # Dictionary of magic strings and the (signature index, signature offset)
+        # tuples that use each magic string
+        self.literals = {}
+        # Dictionary of magic strings and all magic strings that are prefixes of
+        # (or equal to) the key string
+        self.prefixes = {}
+        # List of compiled regexes, one per leading byte of the magic strings
+        self.searches = []
+        # Matches can not start beyond the last scanned offset plus this value
+        self.max_offset = 0
+        # Longest magic string length
+        self.max_length = 0
+
+        for (index, signature) in enumerate(signatures):
+            if signature.literal is None:
+                if native:
+                    self.regexes.append((index, signature.offset, native_regex(signature.regex)))
+                else:
+                    self.regexes.append((index, signature.offset, signature.regex))
+            else:
+                if not binwalk.core.compat.has_key(self.literals, signature.literal):
+                    self.literals[signature.literal] = []
+                self.literals[signature.literal].append((index, signature.offset))
+                self.max_offset = max(self.max_offset, signature.offset)
+                self.max_length = max(self.max_length, len(signature.literal))
+
+        trie = {}
+        for literal in self.literals:
+            node = trie
+            for c in literal:
+                node = node.setdefault(c, {})
+            # The empty key marks the end of a magic string
+            node[''] = literal
+
+        for literal in self.literals:
+            self.prefixes[literal] = []
+            node = trie
+            for c in literal:
+                node = node[c]
+                if binwalk.core.compat.has_key(node, ''):
+                    self.prefixes[literal].append(node[''])
+
+        for c in sorted(k for k in trie if k):
+            restr = re.escape(c) + self._trie_regex(trie[c])
+            if native:
+                restr = binwalk.core.compat.str2bytes(restr)
+            self.searches.append(re.compile(restr))
+
+        # Matches of bytes regexes are bytes objects
+        if native:
+            self.prefixes = dict([(binwalk.core.compat.str2bytes(k), v) for (k, v) in binwalk.core.compat.iterator(self.prefixes)])
+
+    def _trie_regex(self, node):
+        '''
+        Generates a regular expression string from a trie node. Since every
+        alternation branch starts with a different character and terminal
+        nodes are optional greedy groups, the longest matching string wins.
+
+        @node - The trie node.
+
+        Returns a regular expression string.
+        '''
+        branches = [re.escape(c) + self._trie_regex(node[c]) for c in sorted(k for k in node if k)]
+
+        if not branches:
+            return ''
+        elif len(branches) == 1:
+            restr = branches[0]
+        else:
+            restr = '(?:' + '|'.join(branches) + ')'
+
+        if binwalk.core.compat.has_key(node, ''):
+            restr = '(?:' + restr + ')?'
+
+        return restr
+
+    def candidates(self, data, dlen):
+        '''
+        Finds all candidate signature offsets inside a block of data. The
+        candidates for each signature are identical to those that would be
+        returned by running signature.regex.finditer over the data block.
+
+        @data - The data block to search.
+        @dlen - Only offsets smaller than dlen are returned.
+
+        Returns a list (indexed by signature order) of ascending offset lists.
+        '''
+        candidates = [[] for i in range(0, self.count)]
+        # Offset at which the next non-overlapping match of each magic string may start
+        next_start = {}
+        endpos = min(len(data), dlen + self.max_offset + self.max_length)
+
+        for regex in self.searches:
+            search = regex.search
+            pos = 0
+
+            while True:
+                match = search(data, pos, endpos)
+                if match is None:
+                    break
+
+                start = match.start()
+                pos = start + 1
+
+                for literal in self.prefixes[match.group()]:
+                    if start < next_start.get(literal, 0):
+                        continue
+                    next_start[literal] = start + len(literal)
+
+                    for (index, sig_offset) in self.literals[literal]:
+                        offset = start - sig_offset
+                        if offset >= 0 and offset < dlen:
+                            candidates[index].append(offset)
+
+        for (index, sig_offset, regex) in self.regexes:
+            for match in regex.finditer(data):
+                offset = match.start() - sig_offset
+                if offset >= 0 and offset < dlen:
+                    candidates[index].append(offset)
+
+        return candidates
+
+
+class SignatureCompiler(object):
+
+    '''
+    Translates a Signature into a specialized Python function which returns
+    exactly the same tags as Magic._analyze, but without re-interpreting each
+    SignatureLine (operators, conditions, offset expressions, struct formats)
+    for every candidate offset.
+    '''
+
+    # Struct formats used by Magic._do_math for each indirect offset type
+    # (e.g., '(4.l+12)').
+    READ_FORMATS = {
+        'b': 'b',
+        'B': 'b',
+        's': '<h',
+        'l': '<i',
+        'S': '>h',
+        'L': '>i',
+    }
+
+    # Python operators for each of the binary operations supported by
+    # binwalk.core.common.MathExpression. Division is handled separately
+    # (see self._math).
+    MATH_OPERATORS = {
+        ast.Add: '+',
+        ast.Sub: '-',
+        ast.Mult: '*',
+        ast.Pow: '**',
+        ast.BitXor: '^',
+    }
+
+    # Python expressions for each SignatureLine.condition, as evaluated by
+    # Magic._analyze.
+    CONDITIONS = {
+        '=': 'dvalue == %s',
+        '>': 'dvalue > %s',
+        '<': 'dvalue < %s',
+        '!': 'dvalue != %s',
+        '~': 'dvalue == ~%s',
+        '^': 'dvalue ^ %s',
+        '&': 'dvalue & %s',
+        '|': 'dvalue | %s',
+    }
+
+    # Placeholder names used while translating offset expressions
+    PLE = '_ple_'
+    READ = '_r%d_'
+
+    def __init__(self, magic, signature, native=False):
+        '''
+        Class constructor.
+
+        @magic     - The Magic instance that the signature was loaded by.
+        @signature - The Signature to compile.
+        @native    - Set to True to generate a function that analyzes bytes data instead of str data.
+
+        Returns None.
+        '''
+        self.magic = magic
+        self.signature = signature
+        self.native = native
+        self.source = []
+        # Values referenced by the generated code, keyed by variable name
+        self.constants = {}
+        # Struct formats referenced by the generated code (as unpack_from
+        # functions), keyed by variable name
+        self.structs = {}
+
+    def compile(self):
+        '''
+        Generates and compiles the analysis function for the signature.
+
+        Returns a function which takes the arguments (data, bdata, offset), where data is the
+        block of data being scanned (self.magic.data), bdata is the same data as a byte string,
+        and offset is the candidate offset in data. The function returns a dictionary of tags.
+        '''
+        return self.bind(self.magic, self.signature, self.generate(), self.constants, self.structs, self.native)
+
+    def generate(self):
+        '''
+        Generates the code for the signature's analysis function. The code's variables are
+        listed in self.constants and self.structs (see self.bind).
+
+        Returns a code object.
+        '''
+        self._emit(0, "def analyze(data, bdata, offset):")
+        self._emit(1, "description = []")
+        self._emit(1, "tags = {'id': signature.id, 'offset': offset, 'invalid': False, 'once': False}")
+        self._emit(1, "max_line_level = 0")
+        self._emit(1, "previous_line_end = 0")
+        # A single pass loop, so that processing can be aborted with a break
+        # statement, just as in Magic._analyze.
+        self._emit(1, "while True:")
+        for n in range(0, len(self.signature.lines)):
+            self._line(n)
+        self._emit(2, "break")
+        self._emit(1, "tags['description'] = bspace_sub('', ' '.join(description))")
+        self._emit(1, "if not tags['description']:")
+        self._emit(2, "tags['display'] = False")
+        self._emit(2, "tags['invalid'] = True")
+        self._emit(1, "if printable_match(tags['description']).group() != tags['description']:")
+        self._emit(2, "tags['invalid'] = True")
+        self._emit(1, "return tags")
+
+        return compile('\n'.join(self.source) + '\n', '<signature>', 'exec', 0, True)
+
+    @staticmethod
+    def bind(magic, signature, code, constants, structs, native=False):
+        '''
+        Creates the analysis function from code generated by SignatureCompiler.generate.
+
+        @magic     - The Magic instance that the signature was loaded by.
+        @signature - The Signature that the code was generated for.
+        @code      - The generated code object.
+        @constants - The SignatureCompiler.constants dictionary.
+        @structs   - The SignatureCompiler.structs dictionary.
+        @native    - The SignatureCompiler.native value.
+
+        Returns the analysis function (see self.compile).
+        '''
+        cstring = '[^\x00\r\n]*'
+        if native:
+            cstring = binwalk.core.compat.str2bytes(cstring)
+
+        namespace = {
+            'magic': magic,
+            'signature': signature,
+            'struct_error': struct.error,
+            'ParserException': ParserException,
+            'utcfromtimestamp': datetime.datetime.utcfromtimestamp,
+            'truediv': operator.truediv,
+            'cstring': re.compile(cstring).match,
+            'bspace_sub': magic.bspace.sub,
+            'printable_match': magic.printable.match,
+        }
+        namespace.update(constants)
+        for (name, fmt) in binwalk.core.compat.iterator(structs):
+            namespace[name] = struct.Struct(fmt).unpack_from
+
+        exec(code, namespace)
+        return namespace['analyze']
+
+    def _emit(self, depth, text):
+        '''
+        Appends a line of generated source code at the given indentation level.
+        '''
+        self.source.append(('    ' * depth) + text)
+
+    def _constant(self, value):
+        '''
+        Returns the name of a new namespace variable holding value.
+        '''
+        name = 'c%d' % len(self.constants)
+        self.constants[name] = value
+        return name
+
+    def _struct(self, fmt):
+        '''
+        Returns the name of the namespace variable holding the unpack_from function for fmt.
+        '''
+        name = 's' + ''.join([c if c.isalpha() else '%02X' % ord(c) for c in fmt])
+        self.structs[name] = fmt
+        return name
+
+    def _literal(self, value):
+        '''
+        Returns value as Python source; integers are inlined, everything else is referenced
+        through the namespace.
+        '''
+        if isinstance(value, int) and not isinstance(value, bool):
+            return '(%d)' % value
+        return self._constant(value)
+
+    def _value(self, value):
+        '''
+        Returns value as Python source, converting str values and regular expressions
+        to bytes for native analysis functions.
+        '''
+        if self.native:
+            if isinstance(value, str):
+                value = binwalk.core.compat.str2bytes(value)
+            elif hasattr(value, 'match'):
+                value = native_regex(value)
+        return self._literal(value)
+
+    def _tuple(self, fmt):
+        '''
+        Returns the Python source for the tuple used to format the fmt string with dvalue.
+        '''
+        count = len([x for x in self.magic.fmtstr.finditer(fmt)])
+        return '(' + ('dvalue, ' * count) + ')'
+
+    def _line(self, n):
+        '''
+        Generates the code for signature line number n.
+        '''
+        lines = self.signature.lines
+        line = lines[n]
+        depth = 2
+
+        # Lines above the current max indent level are skipped; the max indent level is
+        # never less than 0, so this check is only needed for indented lines.
+        if line.level > 0:
+            self._emit(depth, "if max_line_level >= %d:" % line.level)
+            depth += 1
+
+        # Calculate the start of the data for this line
+        if isinstance(line.offset, int):
+            line_offset = '(%d)' % line.offset
+        else:
+            line_offset = 'line_offset'
+            self._math(depth, line_offset, line.offset, True)
+            self._emit(depth, "if not isinstance(line_offset, int):")
+            self._emit(depth + 1, "raise ParserException(%r)" % ("Failed to convert offset '%s' to a number: '%s'" % (line.offset, line.text)))
+        self._emit(depth, "start = offset + %s" % line_offset)
+
+        # Read the data value
+        if line.pkfmt:
+            self._read(depth, 'dvalue', line.pkfmt, 'start')
+        elif line.value is None:
+            generic = depth
+            if binwalk.core.compat.has_key(line.tags, 'string'):
+                self._emit(depth, "if 'strlen' in tags:")
+                self._emit(depth + 1, "dvalue = data[start:(start + tags['strlen'])]")
+                self._emit(depth, "else:")
+                generic += 1
+            # Strings are terminated at the first NULL byte, carriage return
+            # or newline.
+            self._emit(generic, "if 0 <= start < len(data):")
+            self._emit(generic + 1, "dvalue = cstring(data, start, start + %d).group()" % line.size)
+            self._emit(generic, "else:")
+            terminators = ['\x00', '\r', '\n']
+            if self.native:
+                terminators = [binwalk.core.compat.str2bytes(x) for x in terminators]
+            self._emit(generic + 1, "dvalue = data[start:start + %d].split(%r)[0].split(%r)[0].split(%r)[0]" %
+                       tuple([line.size] + terminators))
+        else:
+            self._emit(depth, "dvalue = data[start:start + %d]" % line.size)
+
+        # Apply any operator
+        if line.operator:
+            failed = " %s= %s' failed: " % (line.operator, line.opvalue)
+            if line.operator == '~' and not isinstance(line.opvalue, str):
+                self._emit(depth, "dvalue = %s" % self._literal(~line.opvalue))
+            else:
+                self._emit(depth, "try:")
+                if isinstance(line.opvalue, str):
+                    opval = 'opval'
+                    self._math(depth + 1, opval, line.opvalue, False)
+                else:
+                    opval = self._literal(line.opvalue)
+                if line.operator == '~':
+                    self._emit(depth + 1, "dvalue = ~%s" % opval)
+                else:
+                    self._emit(depth + 1, "dvalue %s= %s" % (line.operator, opval))
+                self._emit(depth, "except Exception as e:")
+                self._emit(depth + 1, "raise ParserException(\"Operation '\" + str(dvalue) + %r + str(e))" % failed)
+
+        # Compare the data value; wildcard lines always match
+        if line.value is not None:
+            value = self._value(line.value)
+            condition = self.CONDITIONS[line.condition] % value
+            if line.regex:
+                condition = '%s.match(dvalue) or (%s)' % (value, condition)
+            self._emit(depth, "if %s:" % condition)
+            self._matched(depth + 1, n)
+            self._emit(depth, "else:")
+            if line.level == 0:
+                self._emit(depth + 1, "break")
+            else:
+                self._emit(depth + 1, "max_line_level = %d" % line.level)
+        else:
+            self._matched(depth, n)
+
+    def _matched(self, depth, n):
+        '''
+        Generates the code executed when signature line number n matches.
+        '''
+        lines = self.signature.lines
+        line = lines[n]
+
+        # Descriptions and tags are always formatted from str values
+        if self.native and not line.pkfmt:
+            self._emit(depth, "dvalue = dvalue.decode('latin-1')")
+
+        if line.type == 'date':
+            self._emit(depth, "try:")
+            self._emit(depth + 1, "dvalue = utcfromtimestamp(dvalue).strftime('%Y-%m-%d %H:%M:%S')")
+            self._emit(depth, "except Exception:")
+            self._emit(depth + 1, "dvalue = 'invalid timestamp'")
+
+        # Format the description string
+        if '%' in line.format:
+            self._emit(depth, "desc = %s %% %s" % (self._constant(line.format), self._tuple(line.format)))
+            self._emit(depth, "if desc:")
+            self._emit(depth + 1, "description.append(desc)")
+        elif line.format:
+            self._emit(depth, "description.append(%s)" % self._constant(line.format))
+
+        # Process tag keywords
+        for (tag_name, tag_value) in binwalk.core.compat.iterator(line.tags):
+            key = self._constant(tag_name)
+            if isinstance(tag_value, str) and '%' in tag_value:
+                self._emit(depth, "tag = %s %% %s" % (self._constant(tag_value), self._tuple(tag_value)))
+                self._emit(depth, "try:")
+                self._emit(depth + 1, "tag = int(tag, 0)")
+                self._emit(depth, "except Exception:")
+                self._emit(depth + 1, "pass")
+                self._emit(depth, "tags[%s] = tag" % key)
+            else:
+                # Constant tag values are converted to integers (where possible) up front
+                if isinstance(tag_value, str):
+                    try:
+                        tag_value = int(tag_value, 0)
+                    except ValueError as e:
+                        pass
+                self._emit(depth, "tags[%s] = %s" % (key, self._literal(tag_value)))
+
+        if binwalk.core.compat.has_key(line.tags, 'invalid'):
+            self._emit(depth, "if not magic.show_invalid and tags['invalid']:")
+            self._emit(depth + 1, "break")
+
+        # Track the end of this line's data if the next line is indented beneath it
+        if n + 1 < len(lines) and lines[n + 1].level > line.level:
+            if isinstance(line.offset, int):
+                line_offset = '(%d)' % line.offset
+            else:
+                line_offset = 'line_offset'
+
+            if line.type == 'string':
+                self._emit(depth, "previous_line_end = %s + len(dvalue)" % line_offset)
+            else:
+                self._emit(depth, "previous_line_end = %s + %d" % (line_offset, line.size))
+
+        self._emit(depth, "max_line_level = %d" % (line.level + 1))
+
+    def _read(self, depth, target, fmt, start):
+        '''
+        Generates code to unpack a value from bdata at the offset start, or 0 if there
+        is not enough data at that offset.
+        '''
+        unpack = self._struct(fmt)
+        self._emit(depth, "try:")
+        self._emit(depth + 1, "if %s >= 0:" % start)
+        self._emit(depth + 2, "%s = %s(bdata, %s)[0]" % (target, unpack, start))
+        # Negative offsets index from the end of the data, same as the slice in Magic._analyze
+        self._emit(depth + 1, "else:")
+        self._emit(depth + 2, "%s = %s(bdata[%s:%s + %d])[0]" % (target, unpack, start, start, struct.calcsize(fmt)))
+        self._emit(depth, "except (struct_error, OverflowError):")
+        self._emit(depth + 1, "%s = 0" % target)
+
+    def _math(self, depth, target, expression, relative):
+        '''
+        Generates code equivalent to Magic._do_math for the given expression.
+
+        @depth      - Indentation level of the generated code.
+        @target     - The variable to assign the result to.
+        @expression - The offset or operator value expression.
+        @relative   - Set to True if '&' references the end of the previous line.
+
+        Returns None.
+        '''
+        if relative:
+            template = expression.replace('&+', self.PLE + '+').replace('&', self.PLE + '+')
+        else:
+            template = expression
+
+        names = {}
+        reads = []
+
+        if relative and template != expression:
+            names[self.PLE] = 'previous_line_end'
+
+        if '.' in template and '(' in template:
+            replacements = []
+
+            for period in [match.start() for match in self.magic.period.finditer(template)]:
+                s = template[:period].rfind('(') + 1
+                if period + 1 >= len(template) or template[period + 1] not in self.READ_FORMATS:
+                    break
+
+                text = "%s.%c" % (template[s:period], template[period + 1])
+                if text in [x[0] for x in replacements]:
+                    continue
+
+                # Indirect offsets must be integers
+                o = self._eval(template[s:period], names, False)
+                if o is None:
+                    break
+
+                name = self.READ % len(replacements)
+                replacements.append((text, name))
+                reads.append((name, o, template[period + 1]))
+            else:
+                for (text, name) in replacements:
+                    template = template.replace(text, name)
+                    names[name] = name
+                replacements = None
+
+            # Expressions that can't be translated are left to Magic._do_math
+            if replacements is not None:
+                template = None
+        elif not names:
+            # No offsets to read, just a constant expression
+            value = binwalk.core.common.MathExpression(expression).value
+            self._emit(depth, "%s = %s" % (target, self._literal(value) if value is not None else 'None'))
+            return
+
+        if template is not None:
+            template = self._eval(template, names, True)
+
+        if template is None:
+            text = self._constant(expression)
+            if relative and '&' in expression:
+                self._emit(depth, "ple = '%d+' % previous_line_end")
+                text = "%s.replace('&+', ple).replace('&', ple)" % text
+            self._emit(depth, "%s = magic._do_math(offset, %s)" % (target, text))
+        else:
+            for (name, o, t) in reads:
+                self._emit(depth, "o = offset + %s" % o)
+                self._read(depth, name, self.READ_FORMATS[t], 'o')
+            self._emit(depth, "try:")
+            self._emit(depth + 1, "%s = %s" % (target, template))
+            self._emit(depth, "except Exception:")
+            self._emit(depth + 1, "%s = None" % target)
+
+    def _eval(self, expression, names, full):
+        '''
+        Translates a math expression into Python source code with the same semantics as
+        binwalk.core.common.MathExpression.
+
+        @expression - The expression string.
+        @names      - A dictionary of placeholder names allowed in the expression, and their
+                      corresponding Python source.
+        @full       - If False, only addition, subtraction and multiplication are allowed, which
+                      guarantees an integer result.
+
+        Returns the Python source, or None if the expression could not be translated.
+        '''
+        try:
+            return self._node(ast.parse(expression).body[0].value, names, full)
+        except KeyboardInterrupt as e:
+            raise e
+        except Exception as e:
+            return None
+
+    def _node(self, node, names, full):
+        '''
+        Translates an AST node for self._eval. Returns None if the node is not supported.
+        '''
+        if isinstance(node, ast.Constant) and type(node.value) is int:
+            return '(%d)' % node.value
+        elif isinstance(node, ast.Name) and binwalk.core.compat.has_key(names, node.id):
+            return names[node.id]
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in [ast.UAdd, ast.USub]:
+            operand = self._node(node.operand, names, full)
+            if operand is not None:
+                return '(0 %s %s)' % (self.MATH_OPERATORS[ast.Add if type(node.op) == ast.UAdd else ast.Sub], operand)
+        elif isinstance(node, ast.BinOp):
+            # Negative values substituted into the left side of a power operator
+            # would change how the original expression string is parsed.
+            if type(node.op) == ast.Pow and isinstance(node.left, ast.Name):
+                return None
+            if not full and type(node.op) not in [ast.Add, ast.Sub, ast.Mult]:
+                return None
+
+            left = self._node(node.left, names, full)
+            right = self._node(node.right, names, full)
+            if left is None or right is None:
+                return None
+            elif type(node.op) == ast.Div:
+                return 'truediv(%s, %s)' % (left, right)
+            elif binwalk.core.compat.has_key(self.MATH_OPERATORS, type(node.op)):
+                return '(%s %s %s)' % (left, self.MATH_OPERATORS[type(node.op)], right)
+        return None
+
+
+class SignatureCache(object):
+
+    '''
+    On-disk cache of parsed and compiled signatures, with one cache file per magic file.
+    Cache entries are keyed by the magic file's path, modification time, size and MD5 hash,
+    as well as the Python and cache format versions, so stale entries are simply re-built.
+
+    Entries hold every signature in the magic file; include/exclude filters are applied
+    after loading (see Magic.load), so the cache never grows past one file per magic file.
+    '''
+
+    # Bump this whenever the format of cached signatures changes
+    VERSION = 3
+
+    def __init__(self, path, magic):
+        '''
+        Class constructor.
+
+        @path  - The cache directory.
+        @magic - The Magic instance to load signatures for.
+
+        Returns None.
+        '''
+        self.path = path
+        self.magic = magic
+
+    def _key(self, fname):
+        '''
+        Builds the cache key for the specified magic file.
+
+        @fname - Path to the magic file.
+
+        Returns a tuple of all values that the cached signatures depend on.
+        '''
+        fname = os.path.abspath(fname)
+        info = os.stat(fname)
+
+        with open(fname, 'rb') as fp:
+            md5 = hashlib.md5(fp.read()).hexdigest()
+
+        # Changes to the code that parses and compiles signatures also invalidate the cache
+        this = os.stat(os.path.splitext(__file__)[0] + '.py')
+
+        return (fname,
+                info.st_mtime,
+                info.st_size,
+                md5,
+                this.st_mtime,
+                this.st_size,
+                sys.version,
+                self.VERSION)
+
+    def _file(self, key):
+        '''
+        Returns the path to the cache file for the specified key. Each magic file
+        gets its own cache file.
+        '''
+        name = hashlib.md5(binwalk.core.compat.str2bytes(key[0])).hexdigest()
+        return os.path.join(self.path, 'signatures-%s.pickle' % name)
+
+    def load(self, fname):
+        '''
+        Loads cached signatures for the specified magic file.
+
+        @fname - Path to the magic file.
+
+        Returns a tuple of (key, signatures). The key is None if the magic file could not be
+        hashed, and signatures is None if there was no valid cache entry.
+        '''
+        key = None
+        signatures = None
+
+        try:
+            key = self._key(fname)
+            cache_file = self._file(key)
+
+            if os.path.exists(cache_file):
+                with open(cache_file, 'rb') as fp:
+                    entry = pickle.load(fp)
+
+                if entry['key'] == key:
+                    for (signature, (code, constants, structs)) in zip(entry['signatures'], entry['code']):
+                        signature.analyzer = SignatureCompiler.bind(self.magic,
+                                                                    signature,
+                                                                    marshal.loads(code),
+                                                                    constants,
+                                                                    structs)
+                    for (signature, (code, constants, structs)) in zip(entry['signatures'], entry['native']):
+                        signature.native_analyzer = SignatureCompiler.bind(self.magic,
+                                                                           signature,
+                                                                           marshal.loads(code),
+                                                                           constants,
+                                                                           structs,
+                                                                           True)
+                    signatures = entry['signatures']
+        except KeyboardInterrupt as e:
+            raise e
+        except Exception as e:
+            binwalk.core.common.debug("Failed to load cached signatures for '%s': %s" % (fname, str(e)))
+
+        return (key, signatures)
+
+    def save(self, key, signatures):
+        '''
+        Compiles and caches signatures that were parsed from a magic file.
+
+        @key        - The key returned by self.load.
+        @signatures - A list of Signature objects.
+
+        Returns None.
+        '''
+        code = []
+        native = []
+
+        if key is None:
+            return
+
+        for signature in signatures:
+            compiler = SignatureCompiler(self.magic, signature)
+            compiled = compiler.generate()
+            signature.analyzer = compiler.bind(self.magic, signature, compiled, compiler.constants, compiler.structs)
+            code.append((marshal.dumps(compiled), compiler.constants, compiler.structs))
+
+            # Native (bytes) scans are only possible in Python 3
+            if binwalk.core.compat.PY_MAJOR_VERSION > 2:
+                compiler = SignatureCompiler(self.magic, signature, True)
+                compiled = compiler.generate()
+                signature.native_analyzer = compiler.bind(self.magic, signature, compiled, compiler.constants, compiler.structs, True)
+                native.append((marshal.dumps(compiled), compiler.constants, compiler.structs))
+
+        cache_file = self._file(key)
+        tmp = None
+
+        # Write to a temporary file first, so that concurrent binwalk processes never
+        # see a partially written cache file
+        try:
+            (fd, tmp) = tempfile.mkstemp(dir=self.path)
+            with os.fdopen(fd, 'wb') as fp:
+                pickle.dump({'key': key, 'signatures': signatures, 'code': code, 'native': native}, fp, pickle.HIGHEST_PROTOCOL)
+            # Windows does not allow renaming over an existing file
+            if os.name == 'nt' and os.path.exists(cache_file):
+                os.unlink(cache_file)
+            os.rename(tmp, cache_file)
+        except KeyboardInterrupt as e:
+            raise e
+        except Exception as e:
+            binwalk.core.common.debug("Failed to save signature cache '%s': %s" % (cache_file, str(e)))
+            if tmp and os.path.exists(tmp):
+                os.unlink(tmp)
+
+
 class Magic(object):
 
     '''
@@ -394,13 +1227,14 @@ class Magic(object):
     blocks of arbitrary data for matching signatures.
     '''
 
-    def __init__(self, exclude=[], include=[], invalid=False):
+    def __init__(self, exclude=[], include=[], invalid=False, cache=None):
         '''
         Class constructor.
 
         @include - A list of regex strings describing which signatures should be included in the scan results.
         @exclude - A list of regex strings describing which signatures should not be included in the scan results.
         @invalid - If set to True, invalid results will not be ignored.
+        @cache   - If specified, signatures loaded by self.load are cached in this directory (see SignatureCache).
 
         Returns None.
         '''
@@ -413,12 +1247,21 @@ class Magic(object):
         # A set of signatures with the 'once' keyword that have already been
         # displayed once
         self.display_once = set()
+        # Set whenever self.signatures changes, so that self.scan knows to
+        # re-build self.prefilters
         self.dirty = True
+        # Candidate prefilters for str and bytes data, keyed by self.scan's native flag
+        self.prefilters = {}
 
         self.show_invalid = invalid
         self.includes = [re.compile(x) for x in include]
         self.excludes = [re.compile(x) for x in exclude]
 
+        if cache:
+            self.cache = SignatureCache(cache, self)
+        else:
+            self.cache = None
+
         # Regex rule to replace backspace characters (an the preceeding character)
         # in formatted signature strings (see self._analyze).
         self.bspace = re.compile(".\\\\b")
@@ -431,6 +1274,13 @@ class Magic(object):
         self.period = re.compile("\.")
 
     def reset(self):
+        '''
+        Resets all per-scan state, so that loaded signatures can be re-used
+        for a new scan (see MagicRegistry).
+
+        Returns None.
+        '''
+        self.data = ""
         self.display_once = set()
 
     def _filtered(self, text):
@@ -549,6 +1399,9 @@ class Magic(object):
         '''
         Analyzes self.data for the specified signature data at the specified offset .
 
+        This is the reference interpreter for signature lines; self.scan uses the
+        equivalent functions generated by SignatureCompiler instead.
+
         @signature - The signature to apply to the data.
         @offset    - The offset in self.data to apply the signature to.
 
@@ -625,7 +1478,7 @@ class Magic(object):
                     try:
                         # If the operator value of this signature line is just
                         # an integer value, use it
-                        if isinstance(line.opvalue, int) or isinstance(line.opvalue, long):
+                        if not isinstance(line.opvalue, str):
                             opval = line.opvalue
                         # Else, evaluate the complex expression
                         else:
@@ -784,13 +1637,53 @@ class Magic(object):
         '''
         Scan a data block for matching signatures.
 
-        @data - A string of data to scan.
+        @data - A string of data to scan. In Python 3, this may also be a bytes object.
         @dlen - If specified, signatures at offsets larger than dlen will be ignored.
 
         Returns a list of SignatureResult objects.
         '''
-        results = []
         matched_offsets = set()
+        return self._select(self._hits(data, dlen, matched_offsets), matched_offsets)
+
+    def hits(self, data, dlen=None):
+        '''
+        Analyzes all candidate signatures in a data block, without regard to the signatures
+        already matched in the block, or displayed by previous scans. This does not depend
+        on (or change) the state of this Magic instance, so data blocks can be analyzed in
+        any order, or by other processes.
+
+        @data - A string of data to scan. In Python 3, this may also be a bytes object.
+        @dlen - If specified, signatures at offsets larger than dlen will be ignored.
+
+        Returns a list of hits to pass to self.select.
+        '''
+        return list(self._hits(data, dlen, None))
+
+    def select(self, hits):
+        '''
+        Selects the results for a data block from the hits returned by self.hits. Results
+        are identical to those returned by self.scan for the same data block.
+
+        @hits - The list returned by self.hits.
+
+        Returns a list of SignatureResult objects.
+        '''
+        return self._select(hits, set())
+
+    def _hits(self, data, dlen, matched_offsets):
+        '''
+        Generates (signature index, offset, tags) tuples for each valid signature match in
+        a data block, in signature order.
+
+        @data            - The data block to scan.
+        @dlen            - If specified, signatures at offsets larger than dlen will be ignored.
+        @matched_offsets - The set of offsets matched so far (see self._select). Already matched
+                           offsets are not analyzed again. If None, all offsets are analyzed, and
+                           analysis exceptions are generated in place of the tags.
+        '''
+        # Bytes data is scanned as is, with bytes regexes and analysis functions (Python 3 only;
+        # in Python 2, str objects are bytes objects)
+        native = not isinstance(data, str)
 
         # Since data can potentially be quite a large string, make it available to other
         # methods via a class attribute so that it doesn't need to be passed around to
@@ -801,41 +1694,96 @@ class Magic(object):
         if dlen is None:
             dlen = len(data)
 
-        sc = 0
-        for signature in self.signatures:
-            # Use regex to search the data block for potential signature
-            # matches (fast)
-            sc += 1
-            for match in signature.regex.finditer(data):
-                # Take the offset of the start of the signature into account
-                offset = match.start() - signature.offset
+        # (Re-)build the candidate prefilters if signatures have been added
+        # since the last scan
+        if self.dirty:
+            self.prefilters = {}
+            self.dirty = False
+        if not binwalk.core.compat.has_key(self.prefilters, native):
+            self.prefilters[native] = Prefilter(self.signatures, native)
+
+        # Search the data block for potential signature matches for all
+        # signatures at once (fast). Offsets outside of the specified self.data
+        # range (dlen), or obviously invalid offsets (<0), are not returned.
+        candidates = self.prefilters[native].candidates(data, dlen)
+
+        # The compiled signature analyzers unpack integer values directly from
+        # a byte string copy of the data.
+        if native:
+            bdata = data
+        else:
+            bdata = binwalk.core.compat.str2bytes(data)
+
+        for (index, (signature, offsets)) in enumerate(zip(self.signatures, candidates)):
+            if not offsets:
+                continue
+
+            # Signatures are only compiled once they have a candidate offset,
+            # which keeps the cost of loading unused signatures down.
+            if native:
+                if signature.native_analyzer is None:
+                    signature.native_analyzer = SignatureCompiler(self, signature, True).compile()
+                analyze = signature.native_analyzer
+            else:
+                if signature.analyzer is None:
+                    signature.analyzer = SignatureCompiler(self, signature).compile()
+                analyze = signature.analyzer
 
+            for offset in offsets:
                 # Signatures are ordered based on the length of their magic bytes (largest first).
                 # If this offset has already been matched to a previous signature, ignore it unless
-                # self.show_invalid has been specified. Also ignore obviously invalid offsets (<0)
-                # as well as those outside the specified self.data range (dlen).
-                if (offset not in matched_offsets or self.show_invalid) and offset >= 0 and offset < dlen:
-                # if offset >= 0 and offset < dlen:
+                # self.show_invalid has been specified.
+                if matched_offsets is None:
+                    # Errors are raised by self._select, if this offset is not matched by then
+                    try:
+                        tags = analyze(data, bdata, offset)
+                    except KeyboardInterrupt as e:
+                        raise e
+                    except Exception as e:
+                        yield (index, offset, e)
+                        continue
+                elif offset not in matched_offsets or self.show_invalid:
                     # Analyze the data at this offset using the current
-                    # signature rule
-                    tags = self._analyze(signature, offset)
-
-                    # Generate a SignatureResult object and append it to the results list if the
-                    # signature is valid, or if invalid results were requested.
-                    if (not tags['invalid'] or self.show_invalid) and not self._filtered(tags['description']):
-                        # Only display results with the 'once' tag once.
-                        if tags['once']:
-                            if signature.title in self.display_once:
-                                continue
-                            else:
-                                self.display_once.add(signature.title)
-                        
-                        # Append the result to the results list
-                        results.append(SignatureResult(**tags))
+                    # signature rule (equivalent to self._analyze(signature, offset))
+                    tags = analyze(data, bdata, offset)
+                else:
+                    continue
+
+                # Only valid signatures are candidates for results, unless invalid results were requested.
+                if (not tags['invalid'] or self.show_invalid) and not self._filtered(tags['description']):
+                    yield (index, offset, tags)
+
+    def _select(self, hits, matched_offsets):
+        '''
+        Builds the list of results for a data block.
+
+        @hits            - An iterable of (signature index, offset, tags) tuples (see self._hits).
+        @matched_offsets - The set of offsets matched so far; updated as results are selected.
+
+        Returns a list of SignatureResult objects.
+        '''
+        results = []
+
+        for (index, offset, tags) in hits:
+            if offset in matched_offsets and not self.show_invalid:
+                continue
+            elif isinstance(tags, Exception):
+                raise tags
+
+            # Only display results with the 'once' tag once.
+            if tags['once']:
+                title = self.signatures[index].title
+                if title in self.display_once:
+                    continue
+                else:
+                    self.display_once.add(title)
+
+            # Append the result to the results list
+            results.append(SignatureResult(**tags))
 
-                        # Add this offset to the matched_offsets set, so that it can be ignored by
-                        # subsequent loops.
-                        matched_offsets.add(offset)
+            # Add this offset to the matched_offsets set, so that it can be ignored by
+            # subsequent signatures.
+            matched_offsets.add(offset)
 
         # Sort results by offset
         results.sort(key=lambda x: x.offset, reverse=False)
@@ -850,11 +1798,22 @@ class Magic(object):
 
         Returns None.
         '''
-        # Magic files must be ASCII, else encoding issues can arise.
-        fp = open(fname, "r")
-        lines = fp.readlines()
-        self.parse(lines)
-        fp.close()
+        signatures = None
+
+        if self.cache:
+            (key, signatures) = self.cache.load(fname)
+
+        if signatures is None:
+            # Magic files must be ASCII, else encoding issues can arise.
+            fp = open(fname, "r")
+            lines = fp.readlines()
+            fp.close()
+
+            signatures = self._parse(lines)
+            if self.cache:
+                self.cache.save(key, signatures)
+
+        self._append(self._filter(signatures))
 
     def parse(self, lines):
         '''
@@ -864,6 +1823,18 @@ class Magic(object):
 
         Returns None.
         '''
+        self._append(self._filter(self._parse(lines)))
+
+    def _parse(self, lines):
+        '''
+        Parse signature file lines into a list of signatures. User-defined filter
+        rules are not applied (see self._filter).
+
+        @lines - A list of lines from a signature file.
+
+        Returns a list of Signature objects, with IDs starting at 0.
+        '''
+        signatures = []
         signature = None
 
         for line in lines:
@@ -877,15 +1848,13 @@ class Magic(object):
                 sigline = SignatureLine(line)
                 # Level 0 means the first line of a signature entry
                 if sigline.level == 0:
-                    # If there is an existing signature, append it to the signature list,
-                    # unless the text in its title field has been filtered by user-defined
-                    # filter rules.
-                    if signature and not self._filtered(signature.title):
-                        self.signatures.append(signature)
+                    # If there is an existing signature, append it to the signature list
+                    if signature:
+                        signatures.append(signature)
 
-                    # Create a new signature object; use the size of self.signatures to
+                    # Create a new signature object; use the size of the signature list to
                     # assign each signature a unique ID.
-                    signature = Signature(len(self.signatures), sigline)
+                    signature = Signature(len(signatures), sigline)
                 # Else, just append this line to the existing signature
                 elif signature:
                     # signature.append(sigline)
@@ -898,9 +1867,142 @@ class Magic(object):
 
         # Add the final signature to the signature list
         if signature:
-            if not self._filtered(signature.lines[0].format):
-                self.signatures.append(signature)
+            signatures.append(signature)
+
+        return signatures
+
+    def _filter(self, signatures):
+        '''
+        Removes signatures whose title text has been filtered by user-defined filter rules.
+
+        @signatures - A list of Signature objects returned by self._parse.
+
+        Returns a list of the remaining Signature objects, with IDs starting at 0 (see self._append).
+        '''
+        signatures = [signature for signature in signatures if not self._filtered(signature.title)]
+        for (i, signature) in enumerate(signatures):
+            signature.id = i
+        return signatures
+
+    def _append(self, signatures):
+        '''
+        Adds parsed signatures to self.signatures.
+
+        @signatures - A list of Signature objects returned by self._parse.
+
+        Returns None.
+        '''
+        # Signature IDs are unique across all loaded signatures
+        for signature in signatures:
+            signature.id += len(self.signatures)
+
+        self.signatures += signatures
+        self.dirty = True
 
         # Sort signatures by confidence (aka, length of their magic bytes),
         # largest first
         self.signatures.sort(key=lambda x: x.confidence, reverse=True)
+
+
+class MagicRegistry(object):
+
+    '''
+    Process-wide pool of loaded Magic instances, so that repeated scans with the
+    same signature configuration don't re-load all of their magic files.
+
+    Instances are handed out to one user at a time by self.acquire, and must be
+    handed back by self.release once the scan is done. Only the idle instances of the
+    most recently released configurations are kept.
+    '''
+
+    # Maximum number of signature configurations with idle instances in the pool
+    MAX_CONFIGURATIONS = 4
+    # Maximum number of idle instances kept for each signature configuration
+    MAX_IDLE = 2
+
+    def __init__(self):
+        # Idle Magic instances, keyed by their signature configuration, least recently released first
+        self.idle = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def _stat(self, files):
+        '''
+        Returns the (modification time, size) of each magic file, or None for files that can't be accessed.
+        '''
+        stats = []
+        for f in files:
+            try:
+                info = os.stat(f)
+                stats.append((info.st_mtime, info.st_size))
+            except KeyboardInterrupt as e:
+                raise e
+            except Exception as e:
+                stats.append(None)
+        return tuple(stats)
+
+    def acquire(self, files=[], raw=[], include=[], exclude=[], invalid=False, cache=None):
+        '''
+        Gets a Magic instance with the specified signatures loaded.
+
+        @files   - A list of magic files to load.
+        @raw     - A list of signature lines to parse before loading the magic files.
+        @include - Passed to Magic.__init__.
+        @exclude - Passed to Magic.__init__.
+        @invalid - Passed to Magic.__init__.
+        @cache   - Passed to Magic.__init__.
+
+        Returns a Magic instance, with its per-scan state reset.
+        '''
+        magic = None
+        key = (tuple(files), tuple(raw), tuple(include), tuple(exclude), invalid, cache)
+        stats = self._stat(files)
+
+        with self.lock:
+            pool = self.idle.get(key, [])
+            # Instances loaded from magic files that have since been modified are discarded
+            while pool and magic is None:
+                magic = pool.pop()
+                if magic.registry_stats != stats:
+                    magic = None
+            if not pool:
+                self.idle.pop(key, None)
+
+        if magic is None:
+            magic = Magic(include=include, exclude=exclude, invalid=invalid, cache=cache)
+
+            if raw:
+                binwalk.core.common.debug("Parsing raw signatures: %s" % str(raw))
+                magic.parse(raw)
+
+            if files:
+                binwalk.core.common.debug("Loading magic files: %s" % str(files))
+                for f in files:
+                    magic.load(f)
+
+            magic.registry_key = key
+            magic.registry_stats = stats
+
+        magic.reset()
+        return magic
+
+    def release(self, magic):
+        '''
+        Returns a Magic instance obtained from self.acquire to the pool. The least
+        recently released instances are discarded once the pool is full.
+
+        @magic - The Magic instance.
+
+        Returns None.
+        '''
+        with self.lock:
+            # Re-inserting the configuration marks it as the most recently released
+            pool = self.idle.pop(magic.registry_key, [])
+            if magic not in pool:
+                pool.append(magic)
+            self.idle[magic.registry_key] = pool[-self.MAX_IDLE:]
+
+            while len(self.idle) > self.MAX_CONFIGURATIONS:
+                self.idle.popitem(last=False)
+
+# The process-wide Magic registry
+registry = MagicRegistry()
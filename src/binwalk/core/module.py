@@ -7,8 +7,11 @@ import io
 import os
 import sys
 import time
+import array
+import operator
 import inspect
 import argparse
+import threading
 import traceback
 from copy import copy
 import binwalk
@@ -16,8 +19,13 @@ import binwalk.core.statuserver
 import binwalk.core.common
 import binwalk.core.settings
 import binwalk.core.plugin
+import binwalk.core.parallel
 from binwalk.core.compat import *
 from binwalk.core.exceptions import *
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 
 class Option(object):
@@ -115,6 +123,12 @@ class Result(object):
     Generic class for storing and accessing scan results.
     '''
 
+    # Standard attributes are stored in slots; any others (e.g., set by signature
+    # keyword tags or plugins) are stored in the instance dictionary, which is only
+    # allocated if needed.
+    __slots__ = ('offset', 'size', 'description', 'module', 'file', 'valid',
+                 'display', 'extract', 'plot', 'name', '__dict__')
+
     def __init__(self, **kwargs):
         '''
         Class constructor.
@@ -147,6 +161,32 @@ class Result(object):
         for (k, v) in iterator(kwargs):
             setattr(self, k, v)
 
+    def _items(self):
+        '''
+        Returns a list of (name, value) tuples for all attributes of this result.
+        '''
+        cls = type(self)
+
+        try:
+            (slots, getter) = _result_slots[cls]
+        except KeyError:
+            slots = tuple([name for c in cls.__mro__ for name in getattr(c, '__slots__', ()) if name != '__dict__'])
+            getter = operator.attrgetter(*slots) if len(slots) > 1 else None
+            _result_slots[cls] = (slots, getter)
+
+        try:
+            # All slots are normally set by __init__
+            items = list(zip(slots, getter(self)))
+        except (TypeError, AttributeError):
+            items = [(name, getattr(self, name)) for name in slots if hasattr(self, name)]
+
+        items.extend(getattr(self, '__dict__', {}).items())
+        return items
+
+
+# Slot names and an attribute getter for each Result class, cached by Result._items
+_result_slots = {}
+
 
 class Error(Result):
 
@@ -154,6 +194,8 @@ class Error(Result):
     A subclass of binwalk.core.module.Result.
     '''
 
+    __slots__ = ('exception',)
+
     def __init__(self, **kwargs):
         '''
         Accepts all the same kwargs as binwalk.core.module.Result, but the following are also added:
@@ -166,6 +208,136 @@ class Error(Result):
         Result.__init__(self, **kwargs)
 
 
+class ResultList(object):
+
+    '''
+    A compact, list-like container for large numbers of results (see the General
+    module's --compact option).
+
+    Result offsets, sizes and IDs are stored in integer arrays, and descriptions are
+    interned. All other attributes of a result are stored as a prototype, which is shared
+    by all results with the same class and attribute values.
+
+    Result objects are re-built each time they are accessed; changes to them are not
+    stored.
+    '''
+
+    # Integer attributes stored in arrays
+    COLUMNS = ('offset', 'size', 'id')
+
+    # Marks an array value as not set; such values are stored in the prototype
+    UNSET = -(2 ** 63)
+    MAX = 2 ** 63
+
+    # Typecode for 64-bit integer arrays
+    TYPECODE = 'q' if PY_MAJOR_VERSION > 2 else 'l'
+
+    def __init__(self, results=[]):
+        '''
+        Class constructor.
+
+        @results - An iterable of initial Result objects.
+
+        Returns None.
+        '''
+        self.columns = dict([(name, array.array(self.TYPECODE)) for name in self.COLUMNS])
+        self.descriptions = array.array('l')
+        self.strings = []
+        self.string_index = {}
+        self.prototypes = array.array('l')
+        self.prototype_list = []
+        self.prototype_index = {}
+
+        self.extend(results)
+
+    def _intern(self, value, values, index, key=None):
+        '''
+        Gets the index of a value in a list of interned values, adding it if necessary.
+        '''
+        if key is None:
+            key = value
+
+        try:
+            return index[key]
+        except KeyError:
+            index[key] = len(values)
+        except TypeError:
+            # Unhashable values are not shared
+            pass
+
+        values.append(value)
+        return len(values) - 1
+
+    def append(self, r):
+        '''
+        Appends a result.
+
+        @r - A Result object.
+
+        Returns None.
+        '''
+        items = []
+        columns = {}
+        description = -1
+
+        for (name, value) in r._items():
+            if name in self.columns and type(value) in (int, long) and self.UNSET < value < self.MAX:
+                columns[name] = value
+            elif name == 'description' and isinstance(value, str):
+                description = self._intern(value, self.strings, self.string_index)
+            else:
+                items.append((name, value))
+
+        for (name, column) in iterator(self.columns):
+            column.append(columns.get(name, self.UNSET))
+
+        # Values such as 1 and True are equal, but must not be interchanged
+        prototype = (r.__class__, tuple(items))
+        key = (prototype, tuple([type(value) for (name, value) in items]))
+
+        self.descriptions.append(description)
+        self.prototypes.append(self._intern(prototype, self.prototype_list, self.prototype_index, key))
+
+    def extend(self, results):
+        for r in results:
+            self.append(r)
+
+    def __iadd__(self, results):
+        self.extend(results)
+        return self
+
+    def __len__(self):
+        return len(self.prototypes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("result index out of range")
+
+        (cls, items) = self.prototype_list[self.prototypes[index]]
+
+        r = cls.__new__(cls)
+        for (name, value) in items:
+            setattr(r, name, value)
+
+        for (name, column) in iterator(self.columns):
+            if column[index] != self.UNSET:
+                setattr(r, name, column[index])
+
+        if self.descriptions[index] != -1:
+            r.description = self.strings[self.descriptions[index]]
+
+        return r
+
+    def __iter__(self):
+        for i in range(0, len(self)):
+            yield self[i]
+
+
 class Module(object):
 
     '''
@@ -236,6 +408,16 @@ class Module(object):
     # modules)
     PRIMARY = True
 
+    # Set to True if this module can process target file data as bytes objects
+    # (see the General module's --native option)
+    NATIVE = False
+
+    # Set to True if this module's run method scans each target file independently
+    # (i.e., displays a header, the results for the file, and a footer), so that
+    # target files can be scanned by parallel worker processes (see the General
+    # module's --jobs option)
+    PARALLEL = False
+
     def __init__(self, parent, **kwargs):
         self.errors = []
         self.results = []
@@ -246,6 +428,10 @@ class Module(object):
         self.enabled = False
         self.previous_next_file_fp = None
         self.current_target_file_name = None
+        # Files scanned by, and pending extracted files found by, worker processes
+        # (see binwalk.core.parallel)
+        self.scanned_files = []
+        self.pending_files = []
         self.name = self.__class__.__name__
         self.plugins = binwalk.core.plugin.Plugins(self)
         self.dependencies = self.DEFAULT_DEPENDS + self.DEPENDS
@@ -401,8 +587,12 @@ class Module(object):
                 pass
 
         # Add any pending extracted files to the target_files list and reset
-        # the extractor's pending file list
-        self.target_file_list += self.extractor.pending
+        # the extractor's pending file list. Worker processes hand them back to
+        # the parent process instead, which schedules them (see self._run_parallel).
+        if self.config.worker:
+            self.pending_files += self.extractor.pending
+        else:
+            self.target_file_list += self.extractor.pending
 
         # Reset all dependencies prior to continuing with another file.
         # This is particularly important for the extractor module, which must be reset
@@ -416,7 +606,7 @@ class Module(object):
             # Values in self.target_file_list are either already open files (BlockFile instances), or paths
             # to files that need to be opened for scanning.
             if isinstance(next_target_file, str) or isinstance(next_target_file, unicode):
-                fp = self.config.open_file(next_target_file)
+                fp = self.config.open_file(next_target_file, native=self.NATIVE)
             else:
                 fp = next_target_file
 
@@ -436,6 +626,8 @@ class Module(object):
         if fp is not None:
             self.current_target_file_name = fp.path
             self.status.fp = fp
+            if self.config.worker:
+                self.scanned_files.append(fp.path)
         else:
             self.current_target_file_name = None
             self.status.fp = None
@@ -451,7 +643,7 @@ class Module(object):
         Clears results and errors lists.
         '''
         if results:
-            self.results = []
+            self.results = ResultList() if isinstance(self.results, ResultList) else []
         if errors:
             self.errors = []
 
@@ -464,6 +656,10 @@ class Module(object):
 
         Returns an instance of binwalk.core.module.Result.
         '''
+        # The consumer of Modules.iexecute has stopped iterating over results
+        if self.parent.scan_aborted:
+            raise ScanAborted()
+
         if r is None:
             r = Result(**kwargs)
 
@@ -491,15 +687,26 @@ class Module(object):
                 continue
 
         if r.valid:
+            self._store_result(r)
+
+        return r
+
+    def _store_result(self, r):
+        '''
+        Stores a valid result in self.results, prints it, and passes it on to
+        the consumer of Modules.iexecute, if any.
+        '''
+        if self.config.retain_results:
             self.results.append(r)
 
-            if r.display:
-                display_args = self._build_display_args(r)
-                if display_args:
-                    self.config.display.format_strings(self.HEADER_FORMAT, self.RESULT_FORMAT)
-                    self.config.display.result(*display_args)
+        if r.display:
+            display_args = self._build_display_args(r)
+            if display_args:
+                self.config.display.format_strings(self.HEADER_FORMAT, self.RESULT_FORMAT)
+                self.config.display.result(*display_args)
 
-        return r
+        if self.parent.result_callback is not None:
+            self.parent.result_callback(r)
 
     def error(self, **kwargs):
         '''
@@ -573,6 +780,9 @@ class Module(object):
 
         self.reset_dependencies()
 
+        if self.config.compact_results and not isinstance(self.results, ResultList):
+            self.results = ResultList(self.results)
+
         try:
             self.init()
         except KeyboardInterrupt as e:
@@ -592,7 +802,10 @@ class Module(object):
         self._plugins_pre_scan()
 
         try:
-            retval = self.run()
+            if self.PARALLEL and self.config.jobs != 1 and not (self.config.worker or self.config.chunk):
+                retval = self._run_parallel()
+            else:
+                retval = self.run()
         except KeyboardInterrupt as e:
             raise e
         except Exception as e:
@@ -603,6 +816,55 @@ class Module(object):
 
         return retval
 
+    def _run_parallel(self):
+        '''
+        Equivalent to self.run, but target files are scanned by a pool of worker processes.
+        Results are displayed and stored in the same order as they would be by self.run,
+        with pending extracted files scanned after all of the files before them.
+
+        Returns None.
+        '''
+        pool = binwalk.core.parallel.ScanPool(self, self.config.jobs)
+
+        try:
+            jobs = [pool.submit(f) for f in self.target_file_list]
+            self.target_file_list = []
+
+            while jobs:
+                scan = jobs.pop(0).get()
+
+                for f in scan['pending']:
+                    jobs.append(pool.submit(f))
+
+                for f in scan['files']:
+                    # Results reference the file object of the scanned file, as they do in self.run
+                    fp = self.config.open_file(f, native=self.NATIVE)
+                    fp.close()
+
+                    self.current_target_file_name = fp.path
+                    self.header()
+                    for r in scan['results']:
+                        r.file = fp
+                        self._store_result(r)
+                    self.footer()
+
+                    for r in scan['extractor_results']:
+                        r.file = fp
+                    self.extractor.results += scan['extractor_results']
+
+                self.errors += scan['errors']
+                self.extractor.output.update(scan['extractor_output'])
+                self.extractor.extraction_count += scan['extraction_count']
+        except KeyboardInterrupt as e:
+            pool.terminate()
+            raise e
+        except Exception as e:
+            pool.terminate()
+            raise e
+
+        pool.close()
+        self.current_target_file_name = None
+
 
 class Status(object):
 
@@ -625,6 +887,9 @@ class Modules(object):
     Main class used for running and managing modules.
     '''
 
+    # Maximum number of results waiting to be consumed from self.iexecute
+    RESULT_QUEUE_SIZE = 1024
+
     def __init__(self, *argv, **kargv):
         '''
         Class constructor.
@@ -640,6 +905,10 @@ class Modules(object):
         self.status = Status(completed=0, total=0, fp=None, running=False, shutdown=False, finished=False)
         self.status_server_started = False
         self.status_service = None
+        # Called with each valid result as it is stored, and set to stop running
+        # modules (see self.iexecute)
+        self.result_callback = None
+        self.scan_aborted = False
 
         self._set_arguments(list(argv), kargv)
 
@@ -794,6 +1063,57 @@ class Modules(object):
 
         return run_modules
 
+    def iexecute(self, *args, **kwargs):
+        '''
+        Executes all appropriate modules, in the same manner as self.execute, in a background
+        thread. Valid results are yielded as soon as they are found, so they can be processed
+        while the scan continues.
+
+        If the caller stops iterating before the scan is finished, the scan is stopped at the
+        next result reported by a module, valid or not.
+
+        Returns a generator of binwalk.core.module.Result objects.
+        '''
+        results = queue.Queue(self.RESULT_QUEUE_SIZE)
+        done = object()
+        exceptions = []
+
+        def scan():
+            try:
+                self.execute(*args, **kwargs)
+            except ScanAborted:
+                pass
+            except BaseException as e:
+                exceptions.append(e)
+            finally:
+                self.result_callback = None
+                results.put(done)
+
+        self.scan_aborted = False
+        self.result_callback = results.put
+        thread = threading.Thread(target=scan)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            while True:
+                r = results.get()
+                if r is done:
+                    break
+                yield r
+        finally:
+            self.scan_aborted = True
+            # Unblock the scan thread if it is waiting on a full queue
+            while thread.is_alive():
+                try:
+                    results.get(True, 0.1)
+                except queue.Empty:
+                    pass
+            self.scan_aborted = False
+
+        if exceptions:
+            raise exceptions[0]
+
     def run(self, module, dependency=False, kwargs={}):
         '''
         Runs a specific module.
@@ -0,0 +1,282 @@
+# Code for scanning multiple target files, or chunks of a single target file,
+# in parallel with a pool of worker processes (see the General module's --jobs
+# and --chunk options).
+
+import pickle
+import multiprocessing
+import binwalk.core.common
+from binwalk.core.compat import *
+
+
+def _sanitize(obj):
+    '''
+    Removes any attributes that can't be sent back to the parent process from a
+    Result object (e.g., open file objects or handles added by plugins).
+
+    @obj - The object to sanitize.
+
+    Returns obj.
+    '''
+    for (k, v) in obj._items():
+        try:
+            pickle.dumps(v, pickle.HIGHEST_PROTOCOL)
+        except KeyboardInterrupt as e:
+            raise e
+        except Exception:
+            delattr(obj, k)
+    return obj
+
+
+def scan(module_name, arguments, target):
+    '''
+    Runs a single module against a single target file. This is executed in the
+    worker processes of a ScanPool.
+
+    @module_name - The class name of the module to run.
+    @arguments   - The command line arguments of the parent process.
+    @target      - The target file to scan.
+
+    Returns a dictionary of the module's scan results, errors and extraction data.
+    '''
+    import binwalk.core.module
+
+    with binwalk.core.module.Modules(*(list(arguments) + ['--worker=' + target])) as m:
+        for module in m.list():
+            if module.__name__ == module_name:
+                break
+        else:
+            raise Exception("Module %s not found" % module_name)
+
+        obj = m.run(module)
+
+    extractor = getattr(obj, 'extractor', None)
+    # Results may be stored in a binwalk.core.module.ResultList
+    results = list(obj.results)
+
+    for r in results + obj.errors:
+        r.file = None
+        _sanitize(r)
+
+    if extractor is not None:
+        for r in extractor.results:
+            r.file = None
+            _sanitize(r)
+
+    return {
+        'files': obj.scanned_files,
+        'pending': obj.pending_files,
+        'results': results,
+        'errors': obj.errors,
+        'extractor_results': extractor.results if extractor is not None else [],
+        'extractor_output': extractor.output if extractor is not None else {},
+        'extraction_count': extractor.extraction_count if extractor is not None else 0,
+    }
+
+
+# The module instance used by this worker process for chunked scans, and its
+# (module name, arguments, target) key; re-used for all chunks of the same target file.
+_chunk_module = (None, None)
+
+# The ScanPool's current chunk generation (see ScanPool.discard)
+_generation = None
+
+
+def _init_worker(generation):
+    global _generation
+    _generation = generation
+
+
+def scan_chunk(module_name, arguments, target, start, count, generation):
+    '''
+    Analyzes a chunk of a target file's data blocks. This is executed in the worker
+    processes of a ScanPool.
+
+    @module_name - The class name of the module to run.
+    @arguments   - The command line arguments of the parent process.
+    @target      - The target file to scan.
+    @start       - The file offset of the first data block in the chunk.
+    @count       - The number of data blocks in the chunk.
+    @generation  - The ScanPool's chunk generation when the chunk was queued.
+
+    Returns the list returned by the module's scan_blocks method, or None if the
+    chunk has been discarded.
+    '''
+    global _chunk_module
+    import binwalk.core.module
+
+    if _generation is not None and _generation.value != generation:
+        return None
+
+    key = (module_name, tuple(arguments), target)
+
+    if _chunk_module[0] != key:
+        m = binwalk.core.module.Modules(*(list(arguments) + ['--worker=' + target]))
+        for module in m.list():
+            if module.__name__ == module_name:
+                break
+        else:
+            raise Exception("Module %s not found" % module_name)
+
+        obj = m.load(module)
+        obj.init()
+        _chunk_module = (key, obj)
+
+    obj = _chunk_module[1]
+
+    fp = obj.config.open_file(target, native=obj.NATIVE)
+    try:
+        fp.seek(start)
+        return obj.scan_blocks(fp, count)
+    finally:
+        fp.close()
+
+
+class ScanPool(object):
+
+    '''
+    A pool of worker processes that run a module against individual target files,
+    or against chunks of a single target file.
+    Workers are re-used for multiple target files, so loaded signatures are shared
+    across the scans run by each worker (see binwalk.core.magic.MagicRegistry).
+    '''
+
+    def __init__(self, module, jobs):
+        '''
+        Class constructor.
+
+        @module - The module instance to scan target files for.
+        @jobs   - The number of worker processes; if 0, one per CPU.
+
+        Returns None.
+        '''
+        if jobs < 1:
+            jobs = multiprocessing.cpu_count()
+
+        self.jobs = jobs
+        self.module_name = module.name
+        self.arguments = list(module.parent.arguments)
+        # Chunks queued before the last call to self.discard are skipped by the workers
+        self.generation = multiprocessing.Value('i', 0)
+        self.pool = multiprocessing.Pool(processes=jobs, initializer=_init_worker, initargs=(self.generation,))
+
+        binwalk.core.common.debug("Started %d worker processes for module %s" % (jobs, self.module_name))
+
+    def submit(self, target):
+        '''
+        Queues a target file to be scanned.
+
+        @target - The target file path.
+
+        Returns a multiprocessing AsyncResult, whose get method returns the
+        dictionary returned by binwalk.core.parallel.scan.
+        '''
+        return self.pool.apply_async(scan, (self.module_name, self.arguments, target))
+
+    def submit_chunk(self, target, start, count):
+        '''
+        Queues a chunk of a target file to be analyzed.
+
+        @target - The target file path.
+        @start  - The file offset of the first data block in the chunk.
+        @count  - The number of data blocks in the chunk.
+
+        Returns a multiprocessing AsyncResult, whose get method returns the
+        list returned by binwalk.core.parallel.scan_chunk.
+        '''
+        return self.pool.apply_async(scan_chunk, (self.module_name, self.arguments, target, start, count, self.generation.value))
+
+    def discard(self):
+        '''
+        Discards all queued chunks; their results will be None.
+        '''
+        with self.generation.get_lock():
+            self.generation.value += 1
+
+    def close(self):
+        '''
+        Waits for all worker processes to finish.
+        '''
+        self.pool.close()
+        self.pool.join()
+
+    def terminate(self):
+        '''
+        Kills all worker processes.
+        '''
+        self.pool.terminate()
+        self.pool.join()
+
+
+class ChunkedScan(object):
+
+    '''
+    Provides the analyzed data blocks of a single target file, in any order that the
+    module reads them, while worker processes speculatively analyze the chunks of
+    data blocks that follow.
+
+    Chunks are laid out on the grid of data blocks that a sequential read of the
+    file would produce. If the module seeks to an offset that is not on that grid
+    (e.g., a signature's jump keyword), the chunks on the old grid are discarded,
+    and a new grid is started at that offset, so each block is always analyzed
+    exactly as a sequential scan would have analyzed it.
+    '''
+
+    def __init__(self, pool, fp, chunk_size):
+        '''
+        Class constructor.
+
+        @pool       - The ScanPool to analyze chunks with.
+        @fp         - The target file (an instance of binwalk.core.common.BlockFile).
+        @chunk_size - The approximate chunk size, in bytes.
+
+        Returns None.
+        '''
+        self.pool = pool
+        self.target = fp.args.fname
+        self.block_size = fp.block_read_size
+        self.count = max(1, chunk_size // self.block_size)
+        # Data blocks at or beyond this offset are empty
+        self.end = fp.offset + fp.length
+        # Number of chunks to analyze ahead of the current chunk
+        self.ahead = pool.jobs
+        # Offset of the first data block of the current grid
+        self.grid = None
+        # Pending and completed chunks on the current grid, keyed by chunk index
+        self.jobs = {}
+        self.chunks = {}
+
+    def block(self, offset):
+        '''
+        Gets the analyzed data block starting at the specified file offset.
+
+        @offset - The file offset of the data block.
+
+        Returns a tuple of (hits, block length); see Magic.hits.
+        '''
+        if offset >= self.end:
+            return ([], 0)
+
+        if self.grid is None or offset < self.grid or (offset - self.grid) % self.block_size:
+            self.pool.discard()
+            self.grid = offset
+            self.jobs = {}
+            self.chunks = {}
+
+        chunk_bytes = self.block_size * self.count
+        index = (offset - self.grid) // chunk_bytes
+
+        for i in range(index, index + self.ahead + 1):
+            start = self.grid + (i * chunk_bytes)
+            if start < self.end and i not in self.jobs and i not in self.chunks:
+                self.jobs[i] = self.pool.submit_chunk(self.target, start, self.count)
+
+        if index not in self.chunks:
+            self.chunks[index] = dict([(start, (hits, dlen)) for (start, dlen, hits) in self.jobs.pop(index).get()])
+
+        # Chunks behind the current chunk are no longer needed
+        for i in [i for i in self.chunks if i < index]:
+            del self.chunks[i]
+        for i in [i for i in self.jobs if i < index]:
+            del self.jobs[i]
+
+        return self.chunks[index].get(offset, ([], 0))
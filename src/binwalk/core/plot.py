@@ -0,0 +1,196 @@
+# Helpers for rendering large plots (see the Entropy module): streaming
+# decimation of plotted points, grouping of plot markers, and an SVG writer
+# that does not require matplotlib.
+
+from binwalk.core.compat import *
+
+
+class Decimator(object):
+
+    '''
+    Reduces a stream of (x, y) points to what can actually be seen at a given
+    pixel width.
+
+    Points are binned into one column per pixel, and only the first, last, minimum
+    and maximum points of each column are kept, so peaks and dips are never lost,
+    and lines between columns are drawn exactly as they would be for every point.
+    Memory use depends on the pixel width, not the number of points.
+    '''
+
+    def __init__(self, start, end, width):
+        '''
+        Class constructor.
+
+        @start - The lowest x value.
+        @end   - The highest x value.
+        @width - The number of pixel columns.
+
+        Returns None.
+        '''
+        self.start = start
+        self.width = max(1, width)
+        self.scale = float(self.width) / max(1, end - start)
+        # {column : [first, minimum, maximum, last]}, where each is an (x, y) tuple
+        self.columns = {}
+        self.count = 0
+
+    def column(self, x):
+        '''
+        Returns the pixel column of an x value.
+        '''
+        return min(self.width - 1, max(0, int((x - self.start) * self.scale)))
+
+    def add(self, x, y):
+        '''
+        Adds a point.
+
+        @x - The x value.
+        @y - The y value.
+
+        Returns None.
+        '''
+        self.count += 1
+        col = self.column(x)
+        c = self.columns.get(col, None)
+
+        if c is None:
+            self.columns[col] = [(x, y), (x, y), (x, y), (x, y)]
+        else:
+            if x < c[0][0]:
+                c[0] = (x, y)
+            if y < c[1][1]:
+                c[1] = (x, y)
+            if y > c[2][1]:
+                c[2] = (x, y)
+            if x >= c[3][0]:
+                c[3] = (x, y)
+
+    def points(self):
+        '''
+        Returns a tuple of (list of x values, list of y values), sorted by x.
+        '''
+        x = []
+        y = []
+
+        for col in sorted(self.columns.keys()):
+            for (px, py) in sorted(set(self.columns[col])):
+                x.append(px)
+                y.append(py)
+
+        return (x, y)
+
+
+def group_markers(markers, decimator=None):
+    '''
+    Groups plot markers by description, so that each description can be drawn
+    with a single call.
+
+    @markers   - An iterable of (offset, description) tuples.
+    @decimator - If specified, an instance of Decimator; markers with the same
+                 description in the same pixel column are drawn only once.
+
+    Returns a list of (description, list of offsets), in the order that each
+    description first appears.
+    '''
+    groups = []
+    offsets = {}
+    columns = {}
+
+    for (offset, description) in markers:
+        if not has_key(offsets, description):
+            offsets[description] = []
+            columns[description] = set()
+            groups.append((description, offsets[description]))
+
+        if decimator is not None:
+            col = decimator.column(offset)
+            if col in columns[description]:
+                continue
+            columns[description].add(col)
+
+        offsets[description].append(offset)
+
+    return groups
+
+
+def _escape(text):
+    return str(text).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+
+def write_svg(fname, x, y, markers=[], title='', xlabel='', ylabel='', ymax=1.0, width=1024, height=512):
+    '''
+    Writes a line plot to an SVG file.
+
+    @fname   - The output file path.
+    @x       - The list of x values.
+    @y       - The list of y values; the y axis runs from 0 to ymax.
+    @markers - A list of (description, color, list of x values) tuples, drawn as vertical lines.
+    @title   - The plot title.
+    @xlabel  - The x axis label.
+    @ylabel  - The y axis label.
+    @ymax    - The highest y value on the y axis.
+    @width   - The width of the plot area, in pixels.
+    @height  - The height of the plot area, in pixels.
+
+    Returns None.
+    '''
+    (left, top, bottom) = (70, 40, 50)
+    legend_width = 0
+    if markers:
+        legend_width = 30 + (7 * max([len(str(m[0])) for m in markers]))
+    total_width = left + width + 20 + legend_width
+    total_height = top + height + bottom
+
+    xmin = min(x) if x else 0
+    xmax = max(x) if x else 1
+    xscale = float(width) / max(1, xmax - xmin)
+    yscale = float(height) / ymax
+
+    def px(value):
+        return left + ((value - xmin) * xscale)
+
+    def py(value):
+        return top + height - (value * yscale)
+
+    svg = []
+    svg.append('<?xml version="1.0" encoding="UTF-8"?>')
+    svg.append('<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" font-family="sans-serif" font-size="12">' %
+               (total_width, total_height))
+    svg.append('<rect width="100%" height="100%" fill="white"/>')
+    svg.append('<rect x="%d" y="%d" width="%d" height="%d" fill="black"/>' % (left, top, width, height))
+    svg.append('<text x="%d" y="%d" text-anchor="middle" font-size="14">%s</text>' % (left + (width // 2), top - 15, _escape(title)))
+    svg.append('<text x="%d" y="%d" text-anchor="middle">%s</text>' % (left + (width // 2), total_height - 10, _escape(xlabel)))
+    svg.append('<text x="15" y="%d" text-anchor="middle" transform="rotate(-90 15 %d)">%s</text>' %
+               (top + (height // 2), top + (height // 2), _escape(ylabel)))
+
+    # Axis ticks
+    for i in range(0, 6):
+        value = xmin + (((xmax - xmin) * i) // 5)
+        svg.append('<line x1="%.1f" y1="%d" x2="%.1f" y2="%d" stroke="black"/>' % (px(value), top + height, px(value), top + height + 5))
+        svg.append('<text x="%.1f" y="%d" text-anchor="middle">%d</text>' % (px(value), top + height + 18, value))
+    for i in range(0, 6):
+        value = (ymax * i) / 5.0
+        svg.append('<line x1="%d" y1="%.1f" x2="%d" y2="%.1f" stroke="black"/>' % (left - 5, py(value), left, py(value)))
+        svg.append('<text x="%d" y="%.1f" text-anchor="end">%.2f</text>' % (left - 8, py(value) + 4, value))
+
+    # Markers, one path per description
+    for (description, color, offsets) in markers:
+        path = ''.join(['M%.1f %.1fV%.1f' % (px(o), py(0), py(ymax)) for o in offsets if xmin <= o <= xmax])
+        if path:
+            svg.append('<path d="%s" stroke="%s" stroke-width="2"/>' % (path, color))
+
+    if x:
+        svg.append('<polyline fill="none" stroke="yellow" stroke-width="2" points="%s"/>' %
+                   ' '.join(['%.1f,%.1f' % (px(a), py(b)) for (a, b) in zip(x, y)]))
+
+    # Legend
+    for (i, (description, color, offsets)) in enumerate(markers):
+        ly = top + 10 + (i * 18)
+        svg.append('<line x1="%d" y1="%d" x2="%d" y2="%d" stroke="%s" stroke-width="2"/>' %
+                   (left + width + 20, ly, left + width + 40, ly, color))
+        svg.append('<text x="%d" y="%d">%s</text>' % (left + width + 45, ly + 4, _escape(description)))
+
+    svg.append('</svg>')
+
+    with open(fname, 'w') as fp:
+        fp.write('\n'.join(svg) + '\n')
@@ -19,6 +19,12 @@ class Plugin(object):
     # modules.
     MODULES = []
 
+    # Set to True if this plugin can handle files opened in native mode (see the
+    # General module's --native option), whose read methods return bytes objects
+    # instead of str objects. For all other plugins, files are temporarily switched
+    # back to returning str objects while their callback methods are invoked.
+    NATIVE = False
+
     def __init__(self, module):
         '''
         Class constructor.
@@ -108,9 +114,27 @@ class Plugins(object):
     def __exit__(self, t, v, traceback):
         pass
 
+    def _legacy_file(self, callback, obj):
+        '''
+        Returns the native mode BlockFile referenced by obj (either a BlockFile, or
+        a Result with a file attribute), if the callback's plugin does not support
+        native mode files. Otherwise, returns None.
+        '''
+        if getattr(getattr(callback, '__self__', None), 'NATIVE', False):
+            return None
+
+        fp = getattr(obj, 'file', obj)
+        if getattr(fp, 'native', False):
+            return fp
+
+        return None
+
     def _call_plugins(self, callback_list, obj=None):
         for callback in callback_list:
+            fp = self._legacy_file(callback, obj)
             try:
+                if fp is not None:
+                    fp.native = False
                 try:
                     callback()
                 except TypeError:
@@ -124,6 +148,9 @@ class Plugins(object):
                 raise e
             except Exception as e:
                 binwalk.core.common.warning("%s.%s failed [%s]: '%s'" % (callback.__module__, callback.__name__, type(e), e))
+            finally:
+                if fp is not None:
+                    fp.native = True
 
     def _find_plugin_class(self, plugin):
         for (name, klass) in inspect.getmembers(plugin, inspect.isclass):
@@ -0,0 +1,198 @@
+# Persistent cache of signature scan results, keyed by the content of the
+# scanned target files (see the Signature module's --cache option).
+
+import os
+import time
+import zlib
+import pickle
+import hashlib
+import sqlite3
+import binwalk.core.common
+from binwalk.core.compat import *
+
+
+class ResultCache(object):
+
+    '''
+    SQLite database of the data blocks analyzed by previous scans of target files.
+
+    Each entry holds the (block offset, block length, hits) tuples that a module
+    consumed while scanning a target file (see Magic.hits), so that a later scan of
+    identical data with identical options can replay them without running the magic
+    engine. Entries are keyed by a hash of the file data, the module, the options
+    that affect the analysis of data blocks and the loaded signatures.
+
+    The least recently used entries are evicted once the database grows past its
+    maximum size.
+    '''
+
+    # Bump this whenever the format of cached entries changes
+    VERSION = 1
+
+    # Name of the database file in the cache directory
+    DATABASE = "results.sqlite"
+
+    # Seconds to wait for other binwalk processes that are writing to the database
+    TIMEOUT = 30
+
+    def __init__(self, path, max_size):
+        '''
+        Class constructor.
+
+        @path     - The cache directory.
+        @max_size - The maximum size of all cached entries, in bytes.
+
+        Returns None.
+        '''
+        self.max_size = max_size
+        self.db = sqlite3.connect(os.path.join(path, self.DATABASE), timeout=self.TIMEOUT)
+        self.db.execute("CREATE TABLE IF NOT EXISTS results "
+                        "(key TEXT PRIMARY KEY, data BLOB, size INTEGER, atime REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_atime ON results (atime)")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def digest(fname):
+        '''
+        Hashes the contents of a file.
+
+        @fname - Path to the file.
+
+        Returns the SHA256 hex digest of the file contents.
+        '''
+        h = hashlib.sha256()
+
+        with open(fname, 'rb') as fp:
+            while True:
+                data = fp.read(1024 * 1024)
+                if not data:
+                    break
+                h.update(data)
+
+        return h.hexdigest()
+
+    def key(self, fp, *args):
+        '''
+        Builds the cache key for a target file.
+
+        @fp   - The target file (an instance of binwalk.core.common.BlockFile).
+        @args - Any additional values that the cached data depends on (module name,
+                options, signatures, etc).
+
+        Returns the cache key string.
+        '''
+        if isinstance(fp, binwalk.core.common.StringFile):
+            content = hashlib.sha256(str2bytes(fp.string)).hexdigest()
+        else:
+            content = self.digest(fp.args.fname)
+
+        # The data blocks depend on how the target file is read, as well as its contents
+        blocks = (fp.offset,
+                  fp.length,
+                  fp.block_read_size,
+                  fp.block_peek_size,
+                  fp.swap_size,
+                  getattr(fp, 'native', False))
+
+        options = hashlib.sha256(str2bytes(repr((blocks, args, self.VERSION)))).hexdigest()
+
+        return content + options
+
+    def get(self, key):
+        '''
+        Looks up a cache entry, and marks it as recently used.
+
+        @key - The cache key returned by self.key.
+
+        Returns the cached data, or None if there is no such entry.
+        '''
+        data = None
+
+        try:
+            row = self.db.execute("SELECT data FROM results WHERE key=?", (key,)).fetchone()
+            if row is not None:
+                data = pickle.loads(zlib.decompress(row[0]))
+                self.db.execute("UPDATE results SET atime=? WHERE key=?", (time.time(), key))
+                self.db.commit()
+        except KeyboardInterrupt as e:
+            raise e
+        except Exception as e:
+            binwalk.core.common.debug("Failed to load cached results: %s" % str(e))
+
+        return data
+
+    def put(self, key, data):
+        '''
+        Stores a cache entry, evicting the least recently used entries if the cache
+        has grown too large.
+
+        @key  - The cache key returned by self.key.
+        @data - The data to cache; must be picklable.
+
+        Returns None.
+        '''
+        try:
+            blob = zlib.compress(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+            # Entries that would never fit are not worth evicting everything else for
+            if len(blob) > self.max_size:
+                return
+
+            self.db.execute("INSERT OR REPLACE INTO results (key, data, size, atime) VALUES (?, ?, ?, ?)",
+                            (key, sqlite3.Binary(blob), len(blob), time.time()))
+
+            total = self.db.execute("SELECT SUM(size) FROM results").fetchone()[0]
+            if total > self.max_size:
+                for (old_key, size) in self.db.execute("SELECT key, size FROM results ORDER BY atime").fetchall():
+                    if total <= self.max_size:
+                        break
+                    if old_key != key:
+                        self.db.execute("DELETE FROM results WHERE key=?", (old_key,))
+                        total -= size
+
+            self.db.commit()
+        except KeyboardInterrupt as e:
+            raise e
+        except Exception as e:
+            binwalk.core.common.debug("Failed to save cached results: %s" % str(e))
+            self.db.rollback()
+
+
+class CachedScan(object):
+
+    '''
+    Provides the analyzed data blocks of a target file from a ResultCache entry, in the
+    same manner as binwalk.core.parallel.ChunkedScan.
+
+    Data blocks that were skipped by the scan that created the cache entry (e.g., a
+    plugin now invalidates a result whose jump was previously followed) are not
+    available, and must be analyzed by the caller.
+    '''
+
+    def __init__(self, blocks):
+        '''
+        Class constructor.
+
+        @blocks - The list of (block offset, block length, hits) tuples from the cache.
+
+        Returns None.
+        '''
+        self.blocks = dict([(start, (hits, dlen)) for (start, dlen, hits) in blocks])
+        # Number of requested data blocks that were not cached
+        self.misses = 0
+
+    def block(self, offset):
+        '''
+        Gets the analyzed data block starting at the specified file offset.
+
+        @offset - The file offset of the data block.
+
+        Returns a tuple of (hits, block length), or None if the block was not cached.
+        '''
+        block = self.blocks.get(offset, None)
+        if block is None:
+            self.misses += 1
+        return block
@@ -18,6 +18,8 @@ class Settings(object):
 
         o BINWALK_MAGIC_FILE  - Path to the default binwalk magic file.
         o PLUGINS             - Path to the plugins directory.
+        o ARCHSTATS           - Path to the architecture models of the Disasm module's --fast-disasm option.
+        o CACHE               - Path to the cache directory (user only).
     '''
     # Sub directories
     BINWALK_USER_DIR = "binwalk"
@@ -25,11 +27,13 @@ class Settings(object):
     BINWALK_CONFIG_DIR = "config"
     BINWALK_MODULES_DIR = "modules"
     BINWALK_PLUGINS_DIR = "plugins"
+    BINWALK_CACHE_DIR = "cache"
 
     # File names
     PLUGINS = "plugins"
     EXTRACT_FILE = "extract.conf"
     BINARCH_MAGIC_FILE = "binarch"
+    ARCHSTATS_FILE = "archstats.npz"
 
     def __init__(self):
         '''
@@ -44,13 +48,16 @@ class Settings(object):
         self.user = common.GenericContainer(binarch=self._user_path(self.BINWALK_MAGIC_DIR, self.BINARCH_MAGIC_FILE),
             magic=self._magic_signature_files(user_only=True),
             extract=self._user_path(self.BINWALK_CONFIG_DIR, self.EXTRACT_FILE),
+            archstats=self._user_path(self.BINWALK_CONFIG_DIR, self.ARCHSTATS_FILE),
             modules=self._user_path(self.BINWALK_MODULES_DIR),
-            plugins=self._user_path(self.BINWALK_PLUGINS_DIR))
+            plugins=self._user_path(self.BINWALK_PLUGINS_DIR),
+            cache=self._user_path(self.BINWALK_CACHE_DIR))
 
         # Build the paths to all system-wide files
         self.system = common.GenericContainer(binarch=self._system_path(self.BINWALK_MAGIC_DIR, self.BINARCH_MAGIC_FILE),
             magic=self._magic_signature_files(system_only=True),
             extract=self._system_path(self.BINWALK_CONFIG_DIR, self.EXTRACT_FILE),
+            archstats=self._system_path(self.BINWALK_CONFIG_DIR, self.ARCHSTATS_FILE),
             plugins=self._system_path(self.BINWALK_PLUGINS_DIR))
 
     def _magic_signature_files(self, system_only=False, user_only=False):
@@ -1,6 +1,8 @@
-# Don't load the disasm module if the capstone module can't be found
+# Don't load the disasm module, or the base address module that depends on it,
+# if the capstone module can't be found
 try:
     from binwalk.modules.disasm import Disasm
+    from binwalk.modules.baseaddress import BaseAddress
 except ImportError:
     pass
 
@@ -0,0 +1,222 @@
+# Finds the address that raw firmware images (e.g., RTOS images) are loaded at,
+# by matching the file offsets of their strings against the pointers in them.
+
+import binwalk.core.common
+import binwalk.core.compat
+from binwalk.core.module import Module, Option, Kwarg, Dependency
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class BaseAddress(Module):
+
+    '''
+    Code and data that refer to strings hold their addresses, which are their file
+    offsets plus the image's base address. For each candidate base address, the number
+    of strings whose address (file offset + base address) appears as a pointer in the
+    image counts how well that base address explains the image's pointers.
+
+    The pointer size comes from the architecture found by the Disasm module (32-bit if
+    no architecture is found). Little and big endian pointers are both tried, since the
+    byte order of code isn't always identified correctly (e.g., little endian Thumb code
+    often disassembles as big endian Thumb code).
+
+    All base addresses that are multiples of ALIGNMENT are scored at once by cross
+    correlating the histogram of pointer values with the histogram of string offsets,
+    one bin per ALIGNMENT bytes (i.e., counting the pointers that fall in the same
+    page as a string). The best CANDIDATES base addresses are then scored exactly, by
+    the intersection of the set of pointer values and the set of string addresses.
+    '''
+
+    TITLE = "Base Address"
+    ORDER = 11
+
+    # Candidate base addresses are multiples of this
+    ALIGNMENT = 0x1000
+
+    # Minimum length of the strings that pointers are matched against
+    MIN_STRING_LENGTH = 6
+
+    # Number of base addresses with the best histogram correlations that are scored exactly
+    CANDIDATES = 64
+
+    # Number of base addresses reported per target file
+    MAX_RESULTS = 3
+
+    # Minimum number of strings referenced by a reported base address
+    MIN_MATCHES = 2
+
+    # Minimum fraction of the strings referenced by a reported base address, and minimum
+    # number of strings referenced relative to the number referenced by the best base
+    # address; wrong base addresses only match the few strings whose addresses happen
+    # to be equal to random words
+    MIN_STRING_MATCHES = 0.05
+    MIN_RELATIVE_MATCHES = 0.25
+
+    # Pointers are only looked for below this address
+    ADDRESS_SPACE = 2 ** 32
+
+    # Maximum amount of a target file's data that is loaded and searched; the whole
+    # image is held in memory, along with its pointer values (up to twice its size)
+    MAX_IMAGE_SIZE = 64 * 1024 * 1024
+
+    CLI = [
+        Option(long='base-address',
+               kwargs={'enabled': True},
+               description='Find the load address of raw firmware images (runs a disassembly scan first)'),
+    ]
+
+    KWARGS = [
+        Kwarg(name='enabled', default=False),
+    ]
+
+    DEPENDS = [
+        Dependency(name='Disasm',
+                   attribute='disasm',
+                   kwargs={'enabled': True}),
+    ]
+
+    def init(self):
+        if np is None:
+            binwalk.core.common.warning("Failed to import numpy module, base address discovery will be disabled")
+
+    def architecture(self, fp):
+        '''
+        Returns the description of the architecture that the Disasm module found in
+        a target file, or None.
+        '''
+        descriptions = [arch.description for arch in self.disasm.ARCHITECTURES]
+
+        for r in self.disasm.results:
+            if r.file is not None and r.file.path == fp.path:
+                for description in descriptions:
+                    if r.description.startswith(description):
+                        return description
+
+        return None
+
+    @staticmethod
+    def pointer_types(description):
+        '''
+        Returns a list of the NumPy data types of the pointers of an architecture.
+        '''
+        size = 8 if description is not None and ', 64-bit,' in description else 4
+        return [np.dtype('<u%d' % size), np.dtype('>u%d' % size)]
+
+    def pointers(self, data, dtype):
+        '''
+        Finds the values of the aligned pointers in a target file's data.
+
+        @data  - The data, as a bytes object.
+        @dtype - The NumPy data type of the pointers.
+
+        Returns a sorted NumPy array of the unique pointer values.
+        '''
+        words = np.frombuffer(data[:len(data) - (len(data) % dtype.itemsize)], dtype=dtype)
+        return np.unique(words[(words > 0) & (words < self.ADDRESS_SPACE)]).astype(np.int64)
+
+    def string_offsets(self, data):
+        '''
+        Finds the strings in a target file's data that are likely to be referenced by
+        pointers, i.e., strings that start at the start of the data or after a NUL byte.
+
+        @data - The target file's data, as a bytes object.
+
+        Returns a sorted NumPy array of string offsets.
+        '''
+        offsets = []
+
+        for (offset, string) in binwalk.core.common.data_strings(data, self.MIN_STRING_LENGTH):
+            if offset == 0 or data[offset - 1:offset] == b'\x00':
+                offsets.append(offset)
+
+        return np.array(offsets, dtype=np.int64)
+
+    def candidates(self, pointers, strings):
+        '''
+        Cross correlates the page histograms of pointer values and string offsets.
+
+        @pointers - The sorted pointer values.
+        @strings  - The sorted string offsets.
+
+        Returns a list of the candidate base addresses with the best correlations.
+        '''
+        hp = np.bincount(pointers // self.ALIGNMENT).astype(np.float64)
+        hs = np.bincount(strings // self.ALIGNMENT).astype(np.float64)
+
+        # correlation[k] is the number of (pointer, string) pairs in pages that are k pages apart
+        size = 1 << int(len(hp) + len(hs) - 1).bit_length()
+        correlation = np.fft.irfft(np.fft.rfft(hp, size) * np.conj(np.fft.rfft(hs, size)), size)[:len(hp)]
+        correlation = np.round(correlation)
+
+        best = np.argsort(correlation)[::-1][:self.CANDIDATES]
+        return [int(k) * self.ALIGNMENT for k in best if correlation[k] > 0]
+
+    def matches(self, pointers, strings, base):
+        '''
+        Returns the number of string addresses (string offset + base address) that are pointer values.
+        '''
+        addresses = strings + base
+        i = np.searchsorted(pointers, addresses)
+        i[i >= len(pointers)] = 0
+        return int((pointers[i] == addresses).sum())
+
+    def find_base(self, fp):
+        if fp.length > self.MAX_IMAGE_SIZE:
+            binwalk.core.common.warning("Only the first %d bytes of '%s' are searched for its base address" %
+                                        (self.MAX_IMAGE_SIZE, fp.path))
+
+        chunks = []
+        size = 0
+        while size < self.MAX_IMAGE_SIZE:
+            (data, dlen) = fp.read_block()
+            if dlen < 1:
+                break
+            dlen = min(dlen, self.MAX_IMAGE_SIZE - size)
+            chunks.append(binwalk.core.compat.str2bytes(data[:dlen]))
+            size += dlen
+            self.status.completed = fp.tell() - fp.offset
+
+        data = b''.join(chunks)
+        strings = self.string_offsets(data)
+        if len(strings) == 0:
+            return
+
+        scores = []
+
+        for dtype in self.pointer_types(self.architecture(fp)):
+            pointers = self.pointers(data, dtype)
+            if len(pointers) == 0:
+                continue
+
+            for base in self.candidates(pointers, strings):
+                scores.append((self.matches(pointers, strings, base), base, dtype))
+
+        scores.sort(key=lambda s: (-s[0], s[1]))
+        if not scores:
+            return
+
+        min_count = max(self.MIN_MATCHES,
+                        len(strings) * self.MIN_STRING_MATCHES,
+                        scores[0][0] * self.MIN_RELATIVE_MATCHES)
+
+        for (count, base, dtype) in scores[:self.MAX_RESULTS]:
+            if count < min_count:
+                break
+
+            self.result(offset=fp.offset,
+                        file=fp,
+                        base=base,
+                        matches=count,
+                        description="Base address: 0x%X, %d of %d strings referenced, %s endian %d-bit pointers" %
+                                    (base, count, len(strings), "big" if dtype.byteorder == '>' else "little", dtype.itemsize * 8))
+
+    def run(self):
+        for fp in iter(self.next_file, None):
+            self.header()
+            if np is not None:
+                self.find_base(fp)
+            self.footer()
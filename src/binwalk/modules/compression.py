@@ -1,39 +1,64 @@
-# Performs raw decompression of various compression algorithms (currently,
-# only deflate).
+# Performs raw decompression of various compression algorithms (deflate, LZMA,
+# bzip2 and xz).
 
 import os
+import bz2
 import zlib
+import heapq
 import struct
+import binascii
 import binwalk.core.compat
 import binwalk.core.common
+import binwalk.core.parallel
 from binwalk.core.module import Option, Kwarg, Module
 try:
     import lzma
 except ImportError:
     from backports import lzma
 
-
-class LZMAHeader(object):
-
-    def __init__(self, **kwargs):
-        for (k, v) in binwalk.core.compat.iterator(kwargs):
-            setattr(self, k, v)
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class LZMA(object):
 
+    '''
+    Finds and extracts raw LZMA compression streams.
+    '''
+
     DESCRIPTION = "Raw LZMA compression stream"
     COMMON_PROPERTIES = [0x5D, 0x6E]
     MAX_PROP = ((4 * 5 + 4) * 9 + 8)
     BLOCK_SIZE = 32 * 1024
 
+    # liblzma rejects properties values whose lc + lp exceeds this
+    MAX_LCLP = 4
+
+    # Dictionary sizes that decompression is attempted with. A larger dictionary only
+    # allows matches to refer further back, so data that decompresses with any
+    # dictionary size decompresses with the largest one, which is also the size
+    # written to the headers of extracted streams; and until more than the smallest
+    # dictionary size has been decompressed, all sizes decompress data the same way.
+    MIN_DICTIONARY_SIZE = 2 ** 16
+    DICTIONARY_SIZE = 2 ** 25
+
+    # Maximum amount of data decompressed by each call to the decoder; the
+    # decompressed data is discarded
+    MAX_OUTPUT = MIN_DICTIONARY_SIZE
+
+    # The range decoder starts with a 0 byte, followed by a 32-bit big endian code.
+    # The first symbol must be a literal (there is no data to refer back to yet),
+    # and its is-match bit (with a probability of 0.5 for any properties value)
+    # decodes as a literal only if the code is below this bound.
+    FIRST_LITERAL_BOUND = 0x7FFFFC00
+
     def __init__(self, module):
         self.module = module
         self.properties = None
 
         self.build_properties()
-        self.build_dictionaries()
-        self.build_headers()
 
         # Add an extraction rule
         if self.module.extractor.enabled:
@@ -51,7 +76,7 @@ class LZMA(object):
             # Header consists of the detected properties values, the largest possible dictionary size,
             # and a fake output file size field.
             header = chr(self.properties) + \
-                self.dictionaries[-1] + ("\xFF" * 8)
+                binwalk.core.compat.bytes2str(struct.pack("<I", self.DICTIONARY_SIZE)) + ("\xFF" * 8)
             binwalk.core.common.BlockFile(file_name, "wb").write(header + compressed_data)
 
             # Try to extract it with all the normal lzma extractors until one
@@ -62,94 +87,188 @@ class LZMA(object):
 
     def build_property(self, pb, lp, lc):
         prop = (((pb * 5) + lp) * 9) + lc
-        if prop > self.MAX_PROP:
+        if prop > self.MAX_PROP or (lc + lp) > self.MAX_LCLP:
             return None
         return int(prop)
 
     def parse_property(self, prop):
-        prop = int(ord(prop))
-
         if prop > self.MAX_PROP:
             return None
 
-        pb = prop / (9 * 5)
+        pb = prop // (9 * 5)
         prop -= pb * 9 * 5
-        lp = prop / 9
+        lp = prop // 9
         lc = prop - lp * 9
 
         return (pb, lp, lc)
 
-    def parse_header(self, header):
-        (pb, lp, lc) = self.parse_property(header[0])
-        dictionary = struct.unpack("<I", binwalk.core.compat.str2bytes(header[1:5]))[0]
-        return LZMAHeader(pb=pb, lp=lp, lc=lc, dictionary=dictionary)
-
     def build_properties(self):
-        self.properties = set()
+        # Properties values, in the order that they are tried
+        self.property_values = list(self.COMMON_PROPERTIES)
 
-        if self.module.partial_scan == True:
-            # For partial scans, only check the most common properties values
-            for prop in self.COMMON_PROPERTIES:
-                self.properties.add(chr(prop))
-        else:
+        if self.module.partial_scan == False:
             for pb in range(0, 9):
                 for lp in range(0, 5):
                     for lc in range(0, 5):
                         prop = self.build_property(pb, lp, lc)
-                        if prop is not None:
-                            self.properties.add(chr(prop))
+                        if prop is not None and prop not in self.property_values:
+                            self.property_values.append(prop)
 
-    def build_dictionaries(self):
-        self.dictionaries = []
-
-        if self.module.partial_scan == True:
-            # For partial scans, only use the largest dictionary value
-            self.dictionaries.append(binwalk.core.compat.bytes2str(struct.pack("<I", 2 ** 25)))
-        else:
-            for n in range(16, 26):
-                self.dictionaries.append(binwalk.core.compat.bytes2str(struct.pack("<I", 2 ** n)))
+    def _decode(self, data, prop, dictionary):
+        # Decompresses raw LZMA data with the given properties value and dictionary size.
+        # Returns None if the data is valid or truncated, otherwise the amount of data
+        # that had been decompressed before the call to the decoder that failed.
+        (pb, lp, lc) = self.parse_property(prop)
+        d = lzma.LZMADecompressor(format=lzma.FORMAT_RAW,
+                                  filters=[{'id': lzma.FILTER_LZMA1,
+                                            'pb': pb,
+                                            'lp': lp,
+                                            'lc': lc,
+                                            'dict_size': dictionary}])
+        size = 0
 
-    def build_headers(self):
-        self.headers = set()
+        try:
+            out = d.decompress(data, self.MAX_OUTPUT)
+            while not d.eof and not d.needs_input:
+                size += len(out)
+                out = d.decompress(b'', self.MAX_OUTPUT)
+        except lzma.LZMAError as e:
+            # Bad data.
+            return size
 
-        for prop in self.properties:
-            for dictionary in self.dictionaries:
-                self.headers.add(prop + dictionary + ("\xFF" * 8))
+        return None
 
     def decompress(self, data):
-        result = None
-        description = None
+        '''
+        Checks if data starts with a raw LZMA stream, trying each properties value.
+        The detected properties value is stored in self.properties.
 
-        for header in self.headers:
-            # The only acceptable exceptions are those indicating that the
-            # input data was truncated.
-            try:
-                final_data = binwalk.core.compat.str2bytes(header + data)
-                lzma.decompress(final_data)
-                result = self.parse_header(header)
-                break
-            except IOError as e:
-                # The Python2 module gives this error on truncated input data.
-                if str(e) == "unknown BUF error":
-                    result = self.parse_header(header)
-                    break
-            except Exception as e:
-                # The Python3 module gives this error on truncated input data.
-                # The inconsistency between modules is a bit worrisome.
-                if str(e) == "Compressed data ended before the end-of-stream marker was reached":
-                    result = self.parse_header(header)
-                    break
+        @data - The data, as a str, bytes or memoryview object.
+
+        Returns a description of valid or truncated streams, None for bad data.
+        '''
+        if not isinstance(data, memoryview):
+            data = memoryview(binwalk.core.compat.str2bytes(data))
+
+        for prop in self.property_values:
+            dictionary = self.MIN_DICTIONARY_SIZE
+            size = self._decode(data, prop, dictionary)
+
+            # If the decoder failed before decompressing more than the smallest dictionary
+            # size, it would have failed with any dictionary size
+            if size:
+                dictionary = self.DICTIONARY_SIZE
+                size = self._decode(data, prop, dictionary)
+
+            if size is None:
+                self.properties = prop
+                (pb, lp, lc) = self.parse_property(prop)
+                # The dictionary size isn't reported: the stream's actual dictionary size
+                # can't be determined, only that it decodes with one of the sizes tried
+                return "%s, properties: 0x%.2X [pb: %d, lp: %d, lc: %d]" % (self.DESCRIPTION, prop, pb, lp, lc)
 
-        if result is not None:
-            self.properties = self.build_property(result.pb, result.lp, result.lc)
-            description = "%s, properties: 0x%.2X [pb: %d, lp: %d, lc: %d], dictionary size: %d" % (self.DESCRIPTION,
-                                                                                                    self.properties,
-                                                                                                    result.pb,
-                                                                                                    result.lp,
-                                                                                                    result.lc,
-                                                                                                    result.dictionary)
+        return None
 
-        return description
+    def scan(self, data, dlen):
+        '''
+        Scans each offset of a data block for LZMA streams.
+
+        @data - The data block, as returned by read_block.
+        @dlen - The length of the data block.
+
+        Yields tuples of (offset into data, description) for each stream found.
+        '''
+        data = binwalk.core.compat.str2bytes(data)
+        view = memoryview(data)
+
+        for i in self.candidates(data, dlen):
+            # Skip offsets inside a stream that has already been found
+            if i < self.module.skip:
+                continue
+
+            description = self.decompress(view[i:i + self.BLOCK_SIZE])
+            if description:
+                yield (i, description)
+
+    def stream_size(self, blocks):
+        '''
+        Decompresses a raw LZMA stream to its end of stream marker.
+
+        @blocks - An iterator of consecutive pieces of the compressed data.
+
+        Returns a tuple of (compressed size, decompressed size), or None if the data
+        is invalid, or the stream does not end within the data.
+        '''
+        csize = 0
+        dsize = 0
+        d = None
+
+        try:
+            for data in blocks:
+                data = binwalk.core.compat.str2bytes(data)
+
+                if d is None:
+                    # Detect the properties value of the stream
+                    if not self.decompress(data[:self.BLOCK_SIZE]):
+                        return None
+                    (pb, lp, lc) = self.parse_property(self.properties)
+                    d = lzma.LZMADecompressor(format=lzma.FORMAT_RAW,
+                                              filters=[{'id': lzma.FILTER_LZMA1,
+                                                        'pb': pb,
+                                                        'lp': lp,
+                                                        'lc': lc,
+                                                        'dict_size': self.DICTIONARY_SIZE}])
+
+                dsize += len(d.decompress(data, self.MAX_OUTPUT))
+                while not d.eof and not d.needs_input:
+                    dsize += len(d.decompress(b'', self.MAX_OUTPUT))
+
+                if d.eof:
+                    return (csize + len(data) - len(d.unused_data), dsize)
+                csize += len(data)
+        except lzma.LZMAError as e:
+            pass
+
+        return None
+
+    def candidates(self, data, dlen):
+        '''
+        Finds the offsets in a data block that could start an LZMA stream, by
+        rejecting offsets that every properties value would be rejected at:
+
+            o Offsets that do not start with a 0 byte (liblzma requires it)
+            o Offsets whose range decoder code decodes a match as the first symbol
+            o Offsets whose range decoder code is 0; LZMA encoders encode runs of
+              bytes as matches, so only runs of 0 bytes, such as padding, start
+              with one
+
+        Offsets with less than 5 bytes of data only need to start with a 0 byte.
+
+        @data - The data block, as a bytes object.
+        @dlen - The length of the data block.
+
+        Returns a list of offsets.
+        '''
+        n = max(0, min(dlen, len(data) - 4))
+        offsets = []
+
+        if np is not None:
+            if n > 0:
+                A = np.frombuffer(data, dtype=np.uint8)
+                zeros = np.flatnonzero(A[:n] == 0)
+                code = np.zeros(len(zeros), dtype=np.uint32)
+                for k in range(1, 5):
+                    code = (code << np.uint32(8)) | A[zeros + k]
+                offsets = zeros[(code > 0) & (code < self.FIRST_LITERAL_BOUND)].tolist()
+        else:
+            i = data.find(b'\x00', 0, n)
+            while i != -1:
+                code = struct.unpack_from(">I", data, i + 1)[0]
+                if 0 < code < self.FIRST_LITERAL_BOUND:
+                    offsets.append(i)
+                i = data.find(b'\x00', i + 1, n)
+
+        return offsets + [i for i in range(n, dlen) if data[i:i + 1] == b'\x00']
 
 
 class Deflate(object):
@@ -162,6 +281,15 @@ class Deflate(object):
     BLOCK_SIZE = 33 * 1024
     DESCRIPTION = "Raw deflate compression stream"
 
+    # Maximum amount of data decompressed by each call to zlib; the decompressed data is discarded
+    MAX_OUTPUT = 64 * 1024
+
+    # Number of bytes needed to check the header of a deflate block (see self.candidates)
+    HEADER_SIZE = 10
+
+    # Bit-reversed byte values; Huffman codes are stored most significant bit first
+    REVERSED = [int('{0:08b}'.format(i)[::-1], 2) for i in range(0, 256)]
+
     def __init__(self, module):
         self.module = module
 
@@ -195,24 +323,636 @@ class Deflate(object):
         return retval
 
     def decompress(self, data):
-        # Looking for either a valid decompression, or an error indicating
-        # truncated input data
+        '''
+        Checks if data starts with a deflate stream.
+
+        @data - The data, as a str, bytes or memoryview object.
+
+        Returns self.DESCRIPTION for valid or truncated streams, None for bad data.
+        '''
+        if not isinstance(data, memoryview):
+            data = memoryview(binwalk.core.compat.str2bytes(data))
+
+        # Looking for either a valid decompression, or input data that was
+        # truncated; the decompressed data itself is never needed, so it is
+        # produced (and discarded) at most MAX_OUTPUT bytes at a time.
         try:
             # Negative window size (e.g., -15) indicates that raw decompression
             # should be performed
-            zlib.decompress(binwalk.core.compat.str2bytes(data), -15)
+            d = zlib.decompressobj(-15)
+            d.decompress(data, self.MAX_OUTPUT)
+            while d.unconsumed_tail and not d.eof:
+                d.decompress(d.unconsumed_tail, self.MAX_OUTPUT)
         except zlib.error as e:
-            if not str(e).startswith("Error -5"):
-                # Bad data.
-                return None
+            # Bad data.
+            return None
 
         return self.DESCRIPTION
 
+    def scan(self, data, dlen):
+        '''
+        Scans each offset of a data block for deflate streams.
+
+        @data - The data block, as returned by read_block.
+        @dlen - The length of the data block.
+
+        Yields tuples of (offset into data, description) for each stream found.
+        '''
+        data = binwalk.core.compat.str2bytes(data)
+        view = memoryview(data)
+
+        for i in self.candidates(data, dlen):
+            # Skip offsets inside a stream that has already been found
+            if i < self.module.skip:
+                continue
+
+            if self.decompress(view[i:i + self.BLOCK_SIZE]):
+                yield (i, self.DESCRIPTION)
+
+    def stream_size(self, blocks):
+        '''
+        Decompresses a deflate stream to its end.
+
+        @blocks - An iterator of consecutive pieces of the compressed data.
+
+        Returns a tuple of (compressed size, decompressed size), or None if the data
+        is invalid, or the stream does not end within the data.
+        '''
+        csize = 0
+        dsize = 0
+        d = zlib.decompressobj(-15)
+
+        try:
+            for data in blocks:
+                data = binwalk.core.compat.str2bytes(data)
+
+                out = d.decompress(data, self.MAX_OUTPUT)
+                dsize += len(out)
+                # zlib may also have more output pending after consuming all of its input
+                while not d.eof and (d.unconsumed_tail or len(out) == self.MAX_OUTPUT):
+                    out = d.decompress(d.unconsumed_tail, self.MAX_OUTPUT)
+                    dsize += len(out)
+
+                if d.eof:
+                    return (csize + len(data) - len(d.unused_data), dsize)
+                csize += len(data)
+        except zlib.error as e:
+            pass
+
+        return None
+
+    def candidates(self, data, dlen):
+        '''
+        Finds the offsets in a data block that could start a deflate stream, by
+        rejecting offsets whose first block header zlib would reject:
+
+            o Blocks of type 3 (reserved)
+            o Stored blocks whose LEN field is not the complement of NLEN
+            o Fixed Huffman blocks that start with a length/distance pair (there
+              is no data to refer back to yet), or an invalid code
+            o Dynamic Huffman blocks with too many literal/length or distance codes,
+              or an over-subscribed or incomplete code length code
+
+        Offsets with less than HEADER_SIZE bytes of data are not filtered.
+
+        @data - The data block, as a bytes object.
+        @dlen - The length of the data block.
+
+        Returns a list of offsets.
+        '''
+        n = max(0, min(dlen, len(data) - self.HEADER_SIZE + 1))
+
+        if np is not None:
+            offsets = self._candidates_numpy(data, n)
+        else:
+            offsets = self._candidates_python(bytearray(data), n)
+
+        return offsets + list(range(n, dlen))
+
+    def _candidates_python(self, data, n):
+        offsets = []
+        reverse = self.REVERSED
+
+        # The type of the first block is in bits 1-2 of its first byte; the pure Python
+        # checks are limited to those that are cheaper than letting zlib reject the data
+        for i in range(0, n):
+            b0 = data[i]
+            btype = (b0 >> 1) & 3
+
+            if btype == 1:
+                # The first fixed Huffman code starts at bit 3
+                code = reverse[((b0 | (data[i + 1] << 8)) >> 3) & 0xFF]
+                if (2 <= code < 48) or (192 <= code < 200):
+                    continue
+            elif btype == 2:
+                # HLIT (bits 3-7) and HDIST (bits 8-12) must not exceed 29
+                if b0 >= (30 << 3) or (data[i + 1] & 0x1F) >= 30:
+                    continue
+            elif btype == 0:
+                # LEN and NLEN follow the 3 header bits, at the next byte boundary
+                if (data[i + 1] ^ data[i + 3]) != 0xFF or (data[i + 2] ^ data[i + 4]) != 0xFF:
+                    continue
+            else:
+                continue
+
+            offsets.append(i)
+
+        return offsets
+
+    def _candidates_numpy(self, data, n):
+        if n < 1:
+            return []
+
+        A = np.frombuffer(data, dtype=np.uint8)
+        # B[k][i] is byte k of the header at offset i
+        B = [A[k:k + n] for k in range(0, self.HEADER_SIZE)]
+        btype = (B[0] >> 1) & 3
+
+        stored = (btype == 0) & ((B[1] ^ B[3]) == 0xFF) & ((B[2] ^ B[4]) == 0xFF)
+
+        # The first fixed Huffman code: 7 bit codes 1-23 are length codes, and
+        # 8 bit codes 192-199 are length codes or invalid
+        first = ((B[0].astype(np.uint16) | (B[1].astype(np.uint16) << 8)) >> 3) & 0xFF
+        code = np.array(self.REVERSED, dtype=np.uint8)[first]
+        fixed = (btype == 1) & ~(((code >= 2) & (code < 48)) | ((code >= 192) & (code < 200)))
+
+        # HLIT and HDIST must not exceed 29
+        dynamic = np.flatnonzero((btype == 2) & ((B[0] >> 3) < 30) & ((B[1] & 0x1F) < 30))
+
+        # Number of code length code lengths (HCLEN + 4)
+        hclen = ((B[1][dynamic] >> 5) | ((B[2][dynamic] & 1) << 3)).astype(np.int32) + 4
+
+        # The 3-bit code length code lengths start at bit 17; bits holds bits 16-79
+        bits = np.zeros(len(dynamic), dtype=np.uint64)
+        for k in range(2, self.HEADER_SIZE):
+            bits |= B[k][dynamic].astype(np.uint64) << np.uint64(8 * (k - 2))
+
+        # The code length code must be complete, unless all of its lengths are 0
+        # (zlib rejects that too, but not in the header)
+        kraft = np.zeros(len(dynamic), dtype=np.int32)
+        used = np.zeros(len(dynamic), dtype=bool)
+        for j in range(0, 19):
+            length = ((bits >> np.uint64(1 + (3 * j))) & np.uint64(7)).astype(np.int32)
+            active = (hclen > j) & (length > 0)
+            kraft += np.where(active, 128 >> length, 0)
+            used |= active
+
+        valid = stored | fixed
+        valid[dynamic[(kraft == 128) | ~used]] = True
+
+        return np.flatnonzero(valid).tolist()
+
+
+class Bzip2(object):
+
+    '''
+    Finds and extracts raw bzip2 compression blocks (i.e., bzip2 streams without
+    a stream header). Blocks after the first block of a stream are not byte aligned,
+    so blocks are found by their magic number at any bit offset.
+    '''
+
+    DESCRIPTION = "Raw bzip2 compression block"
+    BLOCK_SIZE = 32 * 1024
+
+    # Maximum amount of data decompressed by each call to bz2; the decompressed data is discarded
+    MAX_OUTPUT = 64 * 1024
+
+    # The 48-bit magic number at the start of each block
+    BLOCK_MAGIC = 0x314159265359
+
+    # The 48-bit magic number at the end of the stream, which is followed by the 32-bit
+    # combined CRC of all blocks in the stream
+    END_MAGIC = 0x177245385090
+
+    # The stream header for the largest block size, which is valid for blocks of any size
+    STREAM_HEADER = b"BZh9"
+
+    def __init__(self, module):
+        self.module = module
+        self.patterns = self.build_patterns(self.BLOCK_MAGIC)
+        self.end_patterns = self.build_patterns(self.END_MAGIC)
+
+        # Add an extraction rule
+        if self.module.extractor.enabled:
+            self.module.extractor.add_rule(regex='^%s' % self.DESCRIPTION.lower(), extension="bz2", cmd=self.extractor)
+
+    def extractor(self, file_name):
+        compressed_data = binwalk.core.compat.str2bytes(binwalk.core.common.BlockFile(file_name).read())
+
+        shift = self.block_shift(compressed_data)
+        if shift is not None:
+            # Add a stream header to the byte aligned block data, and try to extract it with
+            # all the normal bzip2 extractors until one works
+            with open(file_name, "wb") as fp:
+                fp.write(self.STREAM_HEADER + self.fix_stream_crc(self.realign(compressed_data, shift)))
+
+            for exrule in self.module.extractor.match("bzip2 compressed data"):
+                if self.module.extractor.execute(exrule['cmd'], file_name) == True:
+                    break
+
+    @staticmethod
+    def build_patterns(value):
+        # For each bit offset of a 48-bit magic number in its first byte, returns a tuple of
+        # (the bytes that are all magic bits, their offset, [(offset, mask, value)] of the
+        # bytes that are only partially magic bits).
+        patterns = []
+
+        for shift in range(0, 8):
+            size = 6 if shift == 0 else 7
+            magic = value << ((size * 8) - 48 - shift)
+            b = bytearray(binascii.unhexlify('%0*x' % (size * 2, magic)))
+
+            if shift == 0:
+                patterns.append((bytes(b), 0, []))
+            else:
+                patterns.append((bytes(b[1:6]), 1, [(0, 0xFF >> shift, b[0]),
+                                                    (6, (0xFF << (8 - shift)) & 0xFF, b[6])]))
+
+        return patterns
+
+    @staticmethod
+    def realign(data, shift):
+        '''
+        Drops the first bits of data.
+
+        @data  - The data, as a bytes object.
+        @shift - The number of bits to drop (0-7).
+
+        Returns the remaining whole bytes of data, as a bytes object.
+        '''
+        if not shift:
+            return bytes(data)
+        elif len(data) < 2:
+            return b''
+
+        value = int(binascii.hexlify(data), 16) >> (8 - shift)
+        size = len(data) - 1
+        return binascii.unhexlify('%0*x' % (size * 2, value & ((1 << (size * 8)) - 1)))
+
+    @staticmethod
+    def get_bits(data, position, count):
+        # Returns count bits of data, starting at a bit position
+        (i, shift) = divmod(position, 8)
+        size = (shift + count + 7) // 8
+        value = int(binascii.hexlify(data[i:i + size]), 16)
+        return (value >> ((size * 8) - shift - count)) & ((1 << count) - 1)
+
+    def fix_stream_crc(self, data):
+        '''
+        Stream data that does not start with the first block of the stream fails the
+        combined CRC check at the end of the stream. Replaces the combined CRC with the
+        CRC of the blocks that are in the data, and drops any data after the stream.
+
+        @data - The byte aligned stream data (without a stream header), as a bytes object.
+
+        Returns the fixed data, or the original data if it has no end of stream marker.
+        '''
+        end = self.candidates(data, len(data), self.end_patterns)
+        if not end:
+            return data
+
+        end = (end[0][0] * 8) + end[0][1]
+        if (end + 80) > (len(data) * 8):
+            return data
+
+        crc = 0
+        for (i, shift) in self.candidates(data, len(data)):
+            position = (i * 8) + shift
+            if position > end:
+                break
+            crc = (((crc << 1) | (crc >> 31)) & 0xFFFFFFFF) ^ self.get_bits(data, position + 48, 32)
+
+        # Replace the 32 bits after the end of stream magic, keeping the bits around them
+        size = ((end + 80) + 7) // 8
+        bits = size * 8
+        value = int(binascii.hexlify(data[:size]), 16)
+        value &= ~(0xFFFFFFFF << (bits - end - 80))
+        value |= crc << (bits - end - 80)
+        return binascii.unhexlify('%0*x' % (size * 2, value))
+
+    def block_shift(self, data, i=0):
+        '''
+        Returns the bit offset of a block magic number in the byte at data[i], or None.
+        '''
+        data = bytearray(data[i:i + 7])
+
+        for (shift, (pattern, start, partial)) in enumerate(self.patterns):
+            if (bytes(data[start:start + len(pattern)]) == pattern and
+                    all([j < len(data) and (data[j] & mask) == value for (j, mask, value) in partial])):
+                return shift
+
+        return None
+
+    def decompress(self, data, shift=0):
+        '''
+        Checks if data starts with a bzip2 block.
+
+        @data  - The data, as a str, bytes or memoryview object.
+        @shift - The bit offset of the block in the first byte of data.
+
+        Returns a description of valid or truncated blocks, None for bad data.
+        '''
+        data = self.STREAM_HEADER + self.realign(binwalk.core.compat.str2bytes(data), shift)
+
+        try:
+            d = bz2.BZ2Decompressor()
+            out = d.decompress(data, self.MAX_OUTPUT)
+            # bz2 may also have more output pending after consuming all of its input
+            while not d.eof and (not d.needs_input or len(out) == self.MAX_OUTPUT):
+                out = d.decompress(b'', self.MAX_OUTPUT)
+        except (IOError, OSError, ValueError) as e:
+            # Bad data.
+            return None
+
+        if shift:
+            return "%s, bit offset: %d" % (self.DESCRIPTION, shift)
+        return self.DESCRIPTION
+
+    def scan(self, data, dlen):
+        '''
+        Scans each bit offset of a data block for bzip2 blocks.
+
+        @data - The data block, as returned by read_block.
+        @dlen - The length of the data block.
+
+        Yields tuples of (offset into data, description) for each block found.
+        '''
+        data = binwalk.core.compat.str2bytes(data)
+        view = memoryview(data)
+
+        for (i, shift) in self.candidates(data, dlen):
+            # Skip offsets inside a stream that has already been found
+            if i < self.module.skip:
+                continue
+
+            description = self.decompress(view[i:i + self.BLOCK_SIZE + 1], shift)
+            if description:
+                yield (i, description)
+
+    def candidates(self, data, dlen, patterns=None):
+        '''
+        Finds the block magic numbers in a data block.
+
+        @data     - The data block, as a bytes object.
+        @dlen     - The length of the data block.
+        @patterns - The magic number patterns to find, as returned by build_patterns;
+                    defaults to the block magic number.
+
+        Returns a sorted list of (offset, bit offset) tuples.
+        '''
+        offsets = []
+
+        for (shift, (pattern, start, partial)) in enumerate(patterns or self.patterns):
+            j = data.find(pattern, start)
+            while j != -1 and j - start < dlen:
+                i = j - start
+                if all([i + k < len(data) and (ord(data[i + k:i + k + 1]) & mask) == value for (k, mask, value) in partial]):
+                    offsets.append((i, shift))
+                j = data.find(pattern, j + 1)
+
+        offsets.sort()
+        return offsets
+
+    def stream_size(self, blocks):
+        '''
+        Decompresses a bzip2 stream, from its first raw block to its end of stream marker.
+        Streams that are found from a block after the first block of the stream fail the
+        combined CRC check at the end of the stream, so the data is decompressed only up
+        to the end of stream marker.
+
+        @blocks - An iterator of consecutive pieces of the compressed data.
+
+        Returns a tuple of (compressed size, decompressed size), or None if the data
+        is invalid, or the stream does not end within the data.
+        '''
+        shift = None
+        carry = b''
+        tail = b''
+        csize = 0
+        dsize = 0
+        d = bz2.BZ2Decompressor()
+
+        try:
+            for data in blocks:
+                data = carry + bytes(binwalk.core.compat.str2bytes(data))
+
+                if shift is None:
+                    shift = self.block_shift(data)
+                    if shift is None:
+                        return None
+                    dsize += len(d.decompress(self.STREAM_HEADER))
+
+                # The last byte is needed to realign the next piece
+                (data, carry) = (self.realign(data, shift), data[-1:] if shift else b'')
+
+                # The end of stream marker may start in the previous piece
+                end = self.candidates(tail + data, len(tail) + len(data), self.end_patterns)
+                if end:
+                    (i, end_shift) = (end[0][0] - len(tail), end[0][1])
+                    data = data[:max(0, i + 1)]
+
+                out = d.decompress(data, self.MAX_OUTPUT)
+                dsize += len(out)
+                # bz2 may also have more output pending after consuming all of its input
+                while not d.eof and (not d.needs_input or len(out) == self.MAX_OUTPUT):
+                    out = d.decompress(b'', self.MAX_OUTPUT)
+                    dsize += len(out)
+
+                if end:
+                    # The original data starts with a partial byte, and the stream ends with
+                    # the 48-bit magic and the 32-bit CRC
+                    return (((shift + ((csize + i) * 8) + end_shift + 80) + 7) // 8, dsize)
+
+                csize += len(data)
+                tail = data[-6:]
+        except (IOError, OSError, ValueError) as e:
+            pass
+
+        return None
+
+
+class XZ(object):
+
+    '''
+    Finds and extracts raw xz compression blocks (i.e., xz streams without a
+    stream header), by the CRC32 of their block headers.
+    '''
+
+    DESCRIPTION = "Raw xz compression block"
+    BLOCK_SIZE = 32 * 1024
+
+    # Maximum amount of data decompressed by each call to the decoder; the decompressed data is discarded
+    MAX_OUTPUT = 64 * 1024
+
+    STREAM_MAGIC = b"\xFD7zXZ\x00"
+
+    # Integrity check types, in the order that they are tried: CRC64 (the default), CRC32, none and SHA-256.
+    # Blocks decompress the same way with any check type, up to the check at their end.
+    CHECKS = [0x04, 0x01, 0x00, 0x0A]
+
+    def __init__(self, module):
+        self.module = module
+
+        # Add an extraction rule
+        if self.module.extractor.enabled:
+            self.module.extractor.add_rule(regex='^%s' % self.DESCRIPTION.lower(), extension="xz", cmd=self.extractor)
+
+    def extractor(self, file_name):
+        compressed_data = binwalk.core.compat.str2bytes(binwalk.core.common.BlockFile(file_name).read())
+
+        # Find a check type that the data decompresses with, and add a stream header to it
+        check = self.check_type(compressed_data)
+
+        with open(file_name, "wb") as fp:
+            fp.write(self.stream_header(check) + compressed_data)
+
+        # Try to extract it with all the normal xz extractors until one works
+        for exrule in self.module.extractor.match("xz compressed data"):
+            if self.module.extractor.execute(exrule['cmd'], file_name) == True:
+                break
+
+    def stream_header(self, check):
+        flags = b"\x00" + struct.pack("B", check)
+        return self.STREAM_MAGIC + flags + struct.pack("<I", zlib.crc32(flags) & 0xFFFFFFFF)
+
+    def _decoder(self, check):
+        d = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+        d.decompress(self.stream_header(check))
+        return d
+
+    def decompress(self, data):
+        '''
+        Checks if data starts with an xz block.
+
+        @data - The data, as a str, bytes or memoryview object.
+
+        Returns self.DESCRIPTION for valid or truncated blocks, None for bad data.
+        '''
+        data = binwalk.core.compat.str2bytes(data)
+
+        for check in self.CHECKS:
+            try:
+                d = self._decoder(check)
+                d.decompress(data, self.MAX_OUTPUT)
+                while not d.eof and not d.needs_input:
+                    d.decompress(b'', self.MAX_OUTPUT)
+            except lzma.LZMAError as e:
+                continue
+
+            return self.DESCRIPTION
+
+        return None
+
+    def scan(self, data, dlen):
+        '''
+        Scans each offset of a data block for xz blocks.
+
+        @data - The data block, as returned by read_block.
+        @dlen - The length of the data block.
+
+        Yields tuples of (offset into data, description) for each block found.
+        '''
+        data = binwalk.core.compat.str2bytes(data)
+        view = memoryview(data)
+
+        for i in self.candidates(data, dlen):
+            # Skip offsets inside a stream that has already been found
+            if i < self.module.skip:
+                continue
+
+            if self.decompress(view[i:i + self.BLOCK_SIZE]):
+                yield (i, self.DESCRIPTION)
+
+    def candidates(self, data, dlen):
+        '''
+        Finds the offsets in a data block that start with a valid block header: its
+        first byte is its size in 4 byte units minus 1 (0 starts an xz index instead),
+        the reserved bits of its flags are 0, and it ends with its CRC32.
+
+        @data - The data block, as a bytes object.
+        @dlen - The length of the data block.
+
+        Returns a list of offsets.
+        '''
+        n = max(0, min(dlen, len(data) - 8))
+
+        if np is not None:
+            A = np.frombuffer(data, dtype=np.uint8)
+            offsets = np.flatnonzero((A[:n] != 0) & ((A[1:n + 1] & 0x3C) == 0)).tolist()
+        else:
+            offsets = [i for i in range(0, n) if data[i:i + 1] != b'\x00' and (ord(data[i + 1:i + 2]) & 0x3C) == 0]
+
+        valid = []
+        for i in offsets:
+            size = (ord(data[i:i + 1]) + 1) * 4
+            header = data[i:i + size]
+            if len(header) == size and (zlib.crc32(header[:-4]) & 0xFFFFFFFF) == struct.unpack("<I", header[-4:])[0]:
+                valid.append(i)
+
+        return valid
+
+    def check_type(self, data):
+        '''
+        Returns the first check type that an xz stream decompresses with, or the
+        default check type if it does not decompress with any.
+        '''
+        sizes = self._stream_size([data])
+        if sizes is None:
+            return self.CHECKS[0]
+        return sizes[2]
+
+    def stream_size(self, blocks):
+        '''
+        Decompresses an xz stream, from its first raw block to its stream footer.
+
+        @blocks - An iterator of consecutive pieces of the compressed data.
+
+        Returns a tuple of (compressed size, decompressed size), or None if the data
+        is invalid, or the stream does not end within the data.
+        '''
+        sizes = self._stream_size(blocks)
+        if sizes is None:
+            return None
+        return sizes[:2]
+
+    def _stream_size(self, blocks):
+        # The correct check type is only known at the end of the first block
+        decoders = dict([(check, self._decoder(check)) for check in self.CHECKS])
+        dsizes = dict([(check, 0) for check in self.CHECKS])
+        csize = 0
+
+        for data in blocks:
+            data = binwalk.core.compat.str2bytes(data)
+
+            for check in self.CHECKS:
+                d = decoders.get(check)
+                if d is None:
+                    continue
+
+                try:
+                    dsizes[check] += len(d.decompress(data, self.MAX_OUTPUT))
+                    while not d.eof and not d.needs_input:
+                        dsizes[check] += len(d.decompress(b'', self.MAX_OUTPUT))
+                except lzma.LZMAError as e:
+                    del decoders[check]
+                    continue
+
+                if d.eof:
+                    return (csize + len(data) - len(d.unused_data), dsizes[check], check)
+
+            if not decoders:
+                break
+            csize += len(data)
+
+        return None
+
 
 class RawCompression(Module):
 
     TITLE = 'Raw Compression'
 
+    PARALLEL = True
+
     CLI = [
         Option(short='X',
                long='deflate',
@@ -222,6 +962,12 @@ class RawCompression(Module):
                long='lzma',
                kwargs={'enabled': True, 'scan_for_lzma': True},
                description='Scan for raw LZMA compression streams'),
+        Option(long='bzip2',
+               kwargs={'enabled': True, 'scan_for_bzip2': True},
+               description='Scan for raw bzip2 compression blocks'),
+        Option(long='xz',
+               kwargs={'enabled': True, 'scan_for_xz': True},
+               description='Scan for raw xz compression blocks'),
         Option(short='P',
                long='partial',
                kwargs={'partial_scan': True},
@@ -238,42 +984,224 @@ class RawCompression(Module):
         Kwarg(name='stop_on_first_hit', default=False),
         Kwarg(name='scan_for_deflate', default=False),
         Kwarg(name='scan_for_lzma', default=False),
+        Kwarg(name='scan_for_bzip2', default=False),
+        Kwarg(name='scan_for_xz', default=False),
     ]
 
+    # Maximum amount of compressed data decompressed to find the end of a stream
+    MAX_STREAM_SIZE = 64 * 1024 * 1024
+
+    # Amount of compressed data read at once when finding the end of a stream;
+    # decompression of most false positives fails within the first few bytes
+    STREAM_READ_SIZE = 64 * 1024
+
+    # Minimum compressed size of a stream whose data is skipped; the streams that
+    # random data decompresses as are only a few dozen bytes long
+    MIN_SKIP_SIZE = 256
+
     def init(self):
+        # Offset into the current data block of the end of the last stream found;
+        # decompressors skip offsets before it
+        self.skip = 0
         self.decompressors = []
 
         if self.scan_for_deflate:
             self.decompressors.append(Deflate(self))
         if self.scan_for_lzma:
             self.decompressors.append(LZMA(self))
+        if self.scan_for_bzip2:
+            self.decompressors.append(Bzip2(self))
+        if self.scan_for_xz:
+            self.decompressors.append(XZ(self))
 
-    def run(self):
-        for fp in iter(self.next_file, None):
+    @staticmethod
+    def _tag(n, hits):
+        # Tags each (offset, description) hit with the index of its decompressor
+        for (i, description) in hits:
+            yield (i, n, description)
 
-            file_done = False
+    def hits(self, data, dlen):
+        '''
+        Scans a data block with all decompressors.
 
-            self.header()
+        @data - The data block, as returned by read_block.
+        @dlen - The length of the data block.
 
-            while not file_done:
-                (data, dlen) = fp.read_block()
+        Returns an iterator of (offset into data, decompressor index, description) tuples,
+        in order of offset.
+        '''
+        return heapq.merge(*[self._tag(n, decompressor.scan(data, dlen))
+                             for (n, decompressor) in enumerate(self.decompressors)])
+
+    def scan_blocks(self, fp, count):
+        '''
+        Analyzes data blocks for chunked parallel scans (see binwalk.core.parallel.ChunkedScan).
+
+        @fp    - The target file, positioned at the first block to analyze.
+        @count - The maximum number of blocks to analyze.
+
+        Returns a list of (block offset, block length, hits) tuples (see self.hits).
+        '''
+        blocks = []
+
+        for i in range(0, count):
+            (data, dlen) = fp.read_block()
+            block_start = fp.tell() - dlen
+
+            if dlen < 1:
+                blocks.append((block_start, dlen, []))
+                break
+
+            blocks.append((block_start, dlen, list(self.hits(data, dlen))))
+
+        return blocks
+
+    def stream_size(self, fp, offset, decompressor, data=b''):
+        '''
+        Finds the size of a compression stream in a target file.
+
+        @fp           - The target file.
+        @offset       - The file offset of the stream.
+        @decompressor - The decompressor that found the stream.
+        @data         - Data that has already been read from the file offset, if any.
+
+        Returns a tuple of (compressed size, decompressed size), or None if the end of
+        the stream was not found within MAX_STREAM_SIZE bytes or the scanned data.
+        '''
+        pieces = self._read_stream(fp, offset, data)
+        try:
+            return decompressor.stream_size(pieces)
+        finally:
+            pieces.close()
+
+    def _read_stream(self, fp, offset, data):
+        # Yields consecutive pieces of the scanned data of a target file, starting at offset
+        length = min(self.MAX_STREAM_SIZE, fp.offset + fp.length - offset)
+
+        data = data[:length]
+        if data:
+            yield data
+
+        length -= len(data)
+        if length < 1:
+            return
+
+        sfp = self.config.open_file(fp.args.fname,
+                                    offset=offset + len(data),
+                                    length=length,
+                                    block=self.STREAM_READ_SIZE,
+                                    peek=0)
+        try:
+            while True:
+                (data, dlen) = sfp.read_block()
                 if dlen < 1:
                     break
+                yield data[:dlen]
+        finally:
+            sfp.close()
 
-                for i in range(0, dlen):
-                    for decompressor in self.decompressors:
-                        description = decompressor.decompress(data[i:i + decompressor.BLOCK_SIZE])
-                        if description:
-                            self.result(description=description, file=fp, offset=fp.tell() - dlen + i)
-                            if self.stop_on_first_hit:
-                                file_done = True
-                                break
+    def scan_file(self, fp, chunks=None):
+        '''
+        Scans a target file for raw compression streams. Scanning resumes at the end
+        of each stream whose end is found.
+
+        @fp     - The target file.
+        @chunks - If specified, a binwalk.core.parallel.ChunkedScan instance which
+                  provides the analyzed data blocks of the file.
+
+        Returns None.
+        '''
+        while True:
+            self.skip = 0
+
+            if chunks is not None:
+                # Equivalent to fp.read_block, without reading any data
+                (hits, dlen) = chunks.block(fp.tell())
+                fp.seek(fp.tell() + dlen)
+            else:
+                (data, dlen) = fp.read_block()
+                if dlen > 0:
+                    data = binwalk.core.compat.str2bytes(data)
+                    view = memoryview(data)
+                    hits = self.hits(data, dlen)
 
-                    if file_done:
+            if dlen < 1:
+                break
+
+            block_start = fp.tell() - dlen
+
+            for (i, n, description) in hits:
+                # Hits found before the end of the last stream was known
+                if i < self.skip:
+                    continue
+
+                offset = block_start + i
+                if chunks is not None:
+                    sizes = self.stream_size(fp, offset, self.decompressors[n])
+                else:
+                    sizes = self.stream_size(fp, offset, self.decompressors[n], view[i:])
+
+                if sizes is None:
+                    self.result(description=description, file=fp, offset=offset)
+                else:
+                    (csize, dsize) = sizes
+                    self.result(description="%s, compressed size: %d, decompressed size: %d" % (description, csize, dsize),
+                                file=fp,
+                                offset=offset,
+                                size=csize,
+                                compressed_size=csize,
+                                decompressed_size=dsize,
+                                end_offset=offset + csize)
+
+                if self.stop_on_first_hit:
+                    return
+
+                # Short streams, and streams that don't compress their data (e.g., deflate
+                # stored blocks), are easily mimicked by random data and may overlap real
+                # streams, so they aren't skipped
+                if sizes is not None and sizes[1] > sizes[0] and sizes[0] >= self.MIN_SKIP_SIZE:
+                    self.skip = i + sizes[0]
+
+                    # If the stream extends beyond the current block, continue scanning
+                    # from the end of the stream
+                    if offset + sizes[0] >= fp.tell():
+                        fp.seek(offset + sizes[0])
                         break
 
-                    self.status.completed += 1
+            self.status.completed = fp.tell() - fp.offset
+
+    def run(self):
+        # Individual target files are split into chunks that are analyzed in parallel
+        if self.config.chunk and self.config.jobs != 1 and not self.config.worker:
+            pool = binwalk.core.parallel.ScanPool(self, self.config.jobs)
+        else:
+            pool = None
+
+        try:
+            for fp in iter(self.next_file, None):
+                chunks = None
+                if pool is not None:
+                    chunks = binwalk.core.parallel.ChunkedScan(pool, fp, self.config.chunk)
+
+                self.header()
+                self.scan_file(fp, chunks)
+                self.footer()
 
-                self.status.completed = fp.tell() - fp.offset
+                # Skip any chunks that are still queued (e.g., after the first hit with --stop)
+                if pool is not None:
+                    pool.discard()
+        except KeyboardInterrupt as e:
+            if pool is not None:
+                pool.terminate()
+            raise e
+        except Exception as e:
+            if pool is not None:
+                pool.terminate()
+            raise e
 
-            self.footer()
+        if pool is not None:
+            # With --stop, chunks that are still being analyzed are no longer needed
+            if self.stop_on_first_hit:
+                pool.terminate()
+            else:
+                pool.close()
@@ -1,6 +1,8 @@
+import os
 import capstone
 import binwalk.core.common
 import binwalk.core.compat
+import binwalk.core.archstats
 from binwalk.core.module import Module, Option, Kwarg
 
 
@@ -23,6 +25,19 @@ class Disasm(Module):
     THRESHOLD = 10
     DEFAULT_MIN_INSN_COUNT = 500
 
+    # Number of instructions disassembled at each offset before disassembling the
+    # entire code block, so that offsets that aren't code are rejected cheaply
+    PROBE_INSN_COUNT = 16
+
+    # The size of the largest instruction of any architecture
+    MAX_INSN_SIZE = 4
+
+    # With --fast-disasm, data blocks are classified in windows of this many bytes, and
+    # only windows that score at least FAST_MIN_SCORE bits per byte pair against the model
+    # of an architecture are disassembled (see binwalk.core.archstats)
+    FAST_WINDOW_SIZE = 4 * 1024
+    FAST_MIN_SCORE = 1.0
+
     TITLE = "Disassembly Scan"
     ORDER = 10
 
@@ -36,6 +51,9 @@ class Disasm(Module):
                type=int,
                kwargs={'min_insn_count': 0},
                description='Minimum number of consecutive instructions to be considered valid (default: %d)' % DEFAULT_MIN_INSN_COUNT),
+        Option(long='fast-disasm',
+               kwargs={'enabled': True, 'fast': True},
+               description='Only disassemble data that looks like code for the most likely architecture, by its byte statistics'),
         Option(long='continue',
                short='k',
                kwargs={'keep_going': True},
@@ -45,6 +63,7 @@ class Disasm(Module):
     KWARGS = [
         Kwarg(name='enabled', default=False),
         Kwarg(name='keep_going', default=False),
+        Kwarg(name='fast', default=False),
         Kwarg(name='min_insn_count', default=DEFAULT_MIN_INSN_COUNT),
     ]
 
@@ -52,41 +71,59 @@ class Disasm(Module):
         Architecture(type=capstone.CS_ARCH_ARM,
                      mode=capstone.CS_MODE_ARM,
                      endianness=capstone.CS_MODE_BIG_ENDIAN,
+                     alignment=4,
+                     context=None,
                      description="ARM executable code, 32-bit, big endian"),
         Architecture(type=capstone.CS_ARCH_ARM,
                      mode=capstone.CS_MODE_ARM,
                      endianness=capstone.CS_MODE_LITTLE_ENDIAN,
+                     alignment=4,
+                     context=None,
                      description="ARM executable code, 32-bit, little endian"),
         Architecture(type=capstone.CS_ARCH_ARM64,
                      mode=capstone.CS_MODE_ARM,
                      endianness=capstone.CS_MODE_BIG_ENDIAN,
+                     alignment=4,
+                     context=None,
                      description="ARM executable code, 64-bit, big endian"),
         Architecture(type=capstone.CS_ARCH_ARM64,
                      mode=capstone.CS_MODE_ARM,
                      endianness=capstone.CS_MODE_LITTLE_ENDIAN,
+                     alignment=4,
+                     context=None,
                      description="ARM executable code, 64-bit, little endian"),
 
         Architecture(type=capstone.CS_ARCH_PPC,
                      mode=capstone.CS_MODE_BIG_ENDIAN,
                      endianness=capstone.CS_MODE_BIG_ENDIAN,
+                     alignment=4,
+                     context=None,
                      description="PPC executable code, 32/64-bit, big endian"),
 
         Architecture(type=capstone.CS_ARCH_MIPS,
                      mode=capstone.CS_MODE_64,
                      endianness=capstone.CS_MODE_BIG_ENDIAN,
+                     alignment=4,
+                     context=None,
                      description="MIPS executable code, 32/64-bit, big endian"),
         Architecture(type=capstone.CS_ARCH_MIPS,
                      mode=capstone.CS_MODE_64,
                      endianness=capstone.CS_MODE_LITTLE_ENDIAN,
+                     alignment=4,
+                     context=None,
                      description="MIPS executable code, 32/64-bit, little endian"),
 
         Architecture(type=capstone.CS_ARCH_ARM,
                      mode=capstone.CS_MODE_THUMB,
                      endianness=capstone.CS_MODE_LITTLE_ENDIAN,
+                     alignment=2,
+                     context='it',
                      description="ARM executable code, 16-bit (Thumb), little endian"),
         Architecture(type=capstone.CS_ARCH_ARM,
                      mode=capstone.CS_MODE_THUMB,
                      endianness=capstone.CS_MODE_BIG_ENDIAN,
+                     alignment=2,
+                     context='it',
                      description="ARM executable code, 16-bit (Thumb), big endian"),
     ]
 
@@ -99,7 +136,169 @@ class Disasm(Module):
         self.disasm_data_size = self.min_insn_count * 10
 
         for arch in self.ARCHITECTURES:
-            self.disassemblers.append((capstone.Cs(arch.type, (arch.mode + arch.endianness)), arch.description))
+            self.disassemblers.append((capstone.Cs(arch.type, (arch.mode + arch.endianness)), arch))
+
+        self.models = None
+        if self.fast:
+            self._load_models()
+
+    def _load_models(self):
+        '''
+        Loads the architecture models for --fast-disasm; user models take precedence.
+        '''
+        for fname in [self.config.settings.user.archstats, self.config.settings.system.archstats]:
+            if fname and os.path.exists(fname) and binwalk.core.common.file_size(fname) > 0:
+                break
+        else:
+            binwalk.core.common.warning("Fast disassembly disabled: no architecture models found")
+            return
+
+        try:
+            self.models = binwalk.core.archstats.ArchModels(fname)
+        except KeyboardInterrupt as e:
+            raise e
+        except Exception as e:
+            binwalk.core.common.warning("Fast disassembly disabled: %s" % str(e))
+            return
+
+        # The disassembler of each model's architecture; models of unknown architectures are ignored
+        descriptions = [arch.description for (md, arch) in self.disassemblers]
+        self.model_disassemblers = []
+        for description in self.models.descriptions:
+            if description in descriptions:
+                self.model_disassemblers.append([self.disassemblers[descriptions.index(description)]])
+            else:
+                self.model_disassemblers.append([])
+
+    def windows(self, data, dlen):
+        '''
+        Splits a data block into the ranges to disassemble.
+
+        @data - The data block, as returned by read_block.
+        @dlen - The length of the data block.
+
+        Returns a list of (start offset, end offset, list of disassemblers) tuples.
+        '''
+        if self.models is None:
+            return [(0, dlen, self.disassemblers)]
+
+        windows = []
+        for (offset, model) in self.models.classify(data, dlen, self.FAST_WINDOW_SIZE, self.FAST_MIN_SCORE):
+            if self.model_disassemblers[model]:
+                # Code that starts part way into a window may not score high enough for that
+                # window to be classified, so disassemble the preceding window too
+                start = offset
+                if not windows or windows[-1][1] < offset:
+                    start = max(0, offset - self.FAST_WINDOW_SIZE)
+                windows.append((start, min(dlen, offset + self.FAST_WINDOW_SIZE), self.model_disassemblers[model]))
+        return windows
+
+    def instructions(self, md, arch, code, address, previous):
+        '''
+        Disassembles the consecutive valid instructions at the start of a code block.
+
+        @md       - The capstone.Cs instance to disassemble with.
+        @arch     - The Architecture of md.
+        @code     - The code block.
+        @address  - The address of the code block.
+        @previous - A dictionary of the last disassembly of each architecture that ended
+                    at an invalid instruction, as (instructions, {instruction address : index})
+                    tuples.
+
+        Returns a list of (address, size, mnemonic, operands) tuples.
+        '''
+        # An instruction inside a disassembled instruction stream that ended at an invalid
+        # instruction disassembles to the rest of that stream
+        if arch.description in previous:
+            (insns, index) = previous[arch.description]
+            if address in index:
+                return insns[index[address]:]
+
+        # Most offsets that aren't code fail within a few instructions
+        probe = min(self.PROBE_INSN_COUNT, self.min_insn_count)
+        insns = list(md.disasm_lite(code, address, probe))
+        if len(insns) == probe:
+            insns = list(md.disasm_lite(code, address))
+
+        size = sum([insn[1] for insn in insns])
+        # Streams that end at the end of the code block may continue past it, and
+        # instructions that change how the following instructions are disassembled
+        # (e.g., Thumb IT instructions) make the rest of a stream depend on its start
+        if size + self.MAX_INSN_SIZE <= len(code) and not (arch.context and
+                                                      any([insn[2].startswith(arch.context) for insn in insns])):
+            previous[arch.description] = (insns, dict([(insns[i][0], i) for i in range(1, len(insns))]))
+        else:
+            previous.pop(arch.description, None)
+
+        return insns
+
+    def disassemble(self, fp, data, start, end, total_read, disassemblers, result):
+        '''
+        Disassembles code at each offset in a range of a data block. Each architecture
+        is only disassembled at file offsets that are aligned to its instruction size.
+
+        @fp            - The target file.
+        @data          - The data block, as a bytes object.
+        @start         - The offset of the start of the range in the data block.
+        @end           - The offset of the end of the range in the data block.
+        @total_read    - The offset of the data block in the target file.
+        @disassemblers - A list of (capstone.Cs instance, Architecture) tuples to disassemble with.
+        @result        - The ArchResult found so far in the data block, or None.
+
+        Returns the ArchResult found so far in the data block, or None.
+        '''
+        previous = {}
+
+        # Step by the smallest instruction alignment of any architecture, starting at the
+        # first aligned file offset in the range
+        step = min([arch.alignment for (md, arch) in disassemblers])
+        block_offset = start + (-(fp.offset + total_read + start) % step)
+
+        # Loop through the entire range, or until we're pretty sure
+        # we've found some valid code in this block
+        while (block_offset < end) and (result is None or result.count < self.THRESHOLD):
+            # The architectures whose instructions are aligned at this offset
+            aligned = [(md, arch) for (md, arch) in disassemblers
+                       if (fp.offset + total_read + block_offset) % arch.alignment == 0]
+
+            if aligned:
+                # Don't pass the entire data block into disasm_lite, it's horribly inefficient
+                # to pass large strings around in Python. Break it up into
+                # smaller code blocks instead.
+                code_block = data[block_offset:block_offset + self.disasm_data_size]
+
+                # If this code block doesn't contain at least two different bytes, skip it
+                # to prevent false positives (e.g., "\x00\x00\x00\x00" is a
+                # nop in MIPS).
+                if code_block.count(code_block[:1]) < len(code_block):
+                    for (md, arch) in aligned:
+                        description = arch.description
+                        insns = self.instructions(md, arch, code_block, (total_read + block_offset), previous)
+                        binwalk.core.common.debug("0x%.8X   %s, at least %d valid instructions" % ((total_read + block_offset),
+                                                                             description,
+                                                                             len(insns)))
+
+                        # Did we disassemble at least self.min_insn_count
+                        # instructions?
+                        if len(insns) >= self.min_insn_count:
+                            # If we've already found the same type of code
+                            # in this block, simply update the result
+                            # counter
+                            if result and result.description == description:
+                                result.count += 1
+                                if result.count >= self.THRESHOLD:
+                                    break
+                            else:
+                                result = ArchResult(offset=total_read +
+                                    block_offset + fp.offset,
+                                    description=description,
+                                    insns=insns,
+                                    count=1)
+
+            block_offset += step
+            self.status.completed += step
+
+        return result
 
     def scan_file(self, fp):
         total_read = 0
@@ -111,49 +310,17 @@ class Disasm(Module):
             if dlen < 1:
                 break
 
+            # Convert the data block once, rather than each code block
+            data = binwalk.core.compat.str2bytes(data)
+
             # If this data block doesn't contain at least two different bytes, skip it
             # to prevent false positives (e.g., "\x00\x00\x00\x00" is a nop in
             # MIPS).
-            if len(set(data)) >= 2:
-                block_offset = 0
-
-                # Loop through the entire block, or until we're pretty sure
-                # we've found some valid code in this block
-                while (block_offset < dlen) and (result is None or result.count < self.THRESHOLD):
-                    # Don't pass the entire data block into disasm_lite, it's horribly inefficient
-                    # to pass large strings around in Python. Break it up into
-                    # smaller code blocks instead.
-                    code_block = binwalk.core.compat.str2bytes(data[block_offset:block_offset + self.disasm_data_size])
-
-                    # If this code block doesn't contain at least two different bytes, skip it
-                    # to prevent false positives (e.g., "\x00\x00\x00\x00" is a
-                    # nop in MIPS).
-                    if len(set(code_block)) >= 2:
-                        for (md, description) in self.disassemblers:
-                            insns = [insn for insn in md.disasm_lite(code_block, (total_read + block_offset))]
-                            binwalk.core.common.debug("0x%.8X   %s, at least %d valid instructions" % ((total_read + block_offset),
-                                                                                 description,
-                                                                                 len(insns)))
-
-                            # Did we disassemble at least self.min_insn_count
-                            # instructions?
-                            if len(insns) >= self.min_insn_count:
-                                # If we've already found the same type of code
-                                # in this block, simply update the result
-                                # counter
-                                if result and result.description == description:
-                                    result.count += 1
-                                    if result.count >= self.THRESHOLD:
-                                        break
-                                else:
-                                    result = ArchResult(offset=total_read +
-                                        block_offset + fp.offset,
-                                        description=description,
-                                        insns=insns,
-                                        count=1)
-
-                    block_offset += 1
-                    self.status.completed += 1
+            if data.count(data[:1]) < len(data):
+                for (start, end, disassemblers) in self.windows(data, dlen):
+                    result = self.disassemble(fp, data, start, end, total_read, disassemblers, result)
+                    if result is not None and result.count >= self.THRESHOLD:
+                        break
 
                 if result is not None:
                     r = self.result(offset=result.offset,
@@ -4,19 +4,179 @@ import os
 import sys
 import math
 import zlib
+import bisect
+import collections
+import binwalk.core.plot
 import binwalk.core.common
+import binwalk.core.bytestats
 from binwalk.core.compat import *
 from binwalk.core.module import Module, Option, Kwarg
 
-#try:
-#    import numpy as np
-#except ImportError:
-#    pass
 try:
-    from numba import njit
+    import numpy as np
 except ImportError:
-    def njit(func):
-        return func
+    np = None
+
+
+class RollingEntropy(object):
+
+    '''
+    Calculates the Shannon entropy of a window that slides over a stream of data.
+
+    The byte histogram of the window, and the sum of count * log2(count) over all
+    byte values, are updated incrementally as the window advances, so each step
+    costs O(step) rather than O(window). If NumPy is available and the window size
+    is a multiple of the step size, the histograms of many windows are instead
+    calculated at once from the cumulative histograms of each step.
+    '''
+
+    # Maximum number of windows processed at once with NumPy
+    NUMPY_BATCH_SIZE = 4096
+
+    def __init__(self, window, step):
+        '''
+        Class constructor.
+
+        @window - The window size, in bytes.
+        @step   - The number of bytes to advance the window by; must be less than the window size.
+
+        Returns None.
+        '''
+        self.window = window
+        self.step = step
+        self.log_window = math.log(window, 2)
+        # count * log2(count), for every possible byte count
+        self.clogc = [0.0] + [c * math.log(c, 2) for c in range(1, window + 1)]
+        # Byte histogram of the window at self.current, and its sum of count * log2(count)
+        self.counts = [0] * 256
+        self.total = 0.0
+        self.current = None
+        # Stream offset of the next window
+        self.next = 0
+        # Buffered data, and the stream offset of its first byte
+        self.data = bytearray()
+        self.offset = 0
+
+        if np is not None and window % step == 0:
+            self.np_clogc = np.array(self.clogc)
+        else:
+            self.np_clogc = None
+
+    def update(self, data):
+        '''
+        Appends data to the stream.
+
+        @data - The data to append.
+
+        Returns a tuple of (offset, entropies), where entropies is a list of the entropy
+        of each window that has been completed by the new data, and offset is the stream
+        offset of the first of those windows.
+        '''
+        offset = self.next
+
+        self.data += bytearray(str2bytes(data))
+
+        # Number of complete windows at self.next, self.next + self.step, ...
+        count = max(0, (self.offset + len(self.data) - self.window - self.next) // self.step + 1)
+
+        if self.np_clogc is not None:
+            entropies = self._numpy(count)
+        else:
+            entropies = self._python(count)
+
+        # Only keep the data needed for the current and next windows
+        if self.current is None:
+            drop = self.next - self.offset
+        else:
+            drop = min(self.current, self.next) - self.offset
+
+        if drop > 0:
+            del self.data[:drop]
+            self.offset += drop
+
+        return (offset, entropies)
+
+    def finish(self):
+        '''
+        Returns the entropy of all data in the stream if it was too short to fill a
+        single window, else None.
+        '''
+        if self.next == 0 and self.data:
+            counts = collections.Counter(self.data)
+            total = math.fsum([c * math.log(c, 2) for c in counts.values()])
+            return max(0.0, (math.log(len(self.data), 2) - (total / len(self.data))) / 8)
+        return None
+
+    def _python(self, count):
+        counts = self.counts
+        clogc = self.clogc
+        data = self.data
+        window = self.window
+        total = self.total
+        entropies = []
+
+        for i in range(0, count):
+            start = self.next - self.offset
+
+            if self.current is None:
+                for b in data[start:start + window]:
+                    counts[b] += 1
+                total = math.fsum([clogc[c] for c in counts])
+            else:
+                current = self.current - self.offset
+
+                # Bytes leaving the window
+                for b in data[current:start]:
+                    c = counts[b]
+                    total += clogc[c - 1] - clogc[c]
+                    counts[b] = c - 1
+
+                # Bytes entering the window
+                for b in data[current + window:start + window]:
+                    c = counts[b]
+                    total += clogc[c + 1] - clogc[c]
+                    counts[b] = c + 1
+
+            entropies.append(max(0.0, (self.log_window - (total / window)) / 8))
+
+            self.current = self.next
+            self.next += self.step
+
+        # Re-calculate the running sum from the histogram, so that rounding errors don't accumulate
+        if self.current is not None:
+            total = math.fsum([clogc[c] for c in counts])
+
+        self.total = total
+        return entropies
+
+    def _numpy(self, count):
+        A = np.frombuffer(bytes(self.data), dtype=np.uint8)
+        # Number of steps per window
+        m = self.window // self.step
+        start = self.next - self.offset
+        entropies = []
+
+        for first in range(0, count, self.NUMPY_BATCH_SIZE):
+            n = min(self.NUMPY_BATCH_SIZE, count - first)
+            # The byte histograms of each step covered by these n windows
+            steps = n + m - 1
+            i = start + (first * self.step)
+            R = A[i:i + (steps * self.step)].reshape(steps, self.step)
+            bins = (R + (np.arange(steps, dtype=np.intp) * 256)[:, None]).ravel()
+            histograms = np.bincount(bins, minlength=steps * 256).reshape(steps, 256)
+
+            # Each window's histogram is the difference of two cumulative step histograms
+            cumulative = np.zeros((steps + 1, 256), dtype=np.intp)
+            np.cumsum(histograms, axis=0, out=cumulative[1:])
+            windows = cumulative[m:m + n] - cumulative[0:n]
+
+            total = self.np_clogc[windows].sum(axis=1)
+            # Adding 0.0 turns any -0.0 into 0.0
+            entropies.extend((np.maximum((self.log_window - (total / self.window)) / 8, 0.0) + 0.0).tolist())
+
+        self.next += count * self.step
+        return entropies
+
 
 class Entropy(Module):
 
@@ -30,6 +190,7 @@ class Entropy(Module):
     FILE_FORMAT = 'png'
 
     COLORS = ['g', 'r', 'c', 'm', 'y']
+    SVG_COLORS = {'g': 'green', 'r': 'red', 'c': 'cyan', 'm': 'magenta', 'y': 'yellow'}
 
     DEFAULT_BLOCK_SIZE = 1024
     DEFAULT_DATA_POINTS = 2048
@@ -37,6 +198,9 @@ class Entropy(Module):
     DEFAULT_TRIGGER_HIGH = .95
     DEFAULT_TRIGGER_LOW = .85
 
+    # Maximum number of data bytes processed at once by shannon_numpy_blocks
+    NUMPY_BATCH_SIZE = 1024 * 1024
+
     TITLE = "Entropy"
     ORDER = 8
 
@@ -54,6 +218,9 @@ class Entropy(Module):
                long='save',
                kwargs={'save_plot': True},
                description='Save plot as a PNG'),
+        Option(long='svg',
+               kwargs={'save_plot': True, 'plot_format': 'svg'},
+               description='Save plot as an SVG (does not require matplotlib)'),
         Option(short='Q',
                long='nlegend',
                kwargs={'show_legend': False},
@@ -72,11 +239,26 @@ class Entropy(Module):
                type=float,
                kwargs={'trigger_low': DEFAULT_TRIGGER_LOW},
                description='Set the falling edge entropy trigger threshold (default: %.2f)' % DEFAULT_TRIGGER_LOW),
+        Option(long='step',
+               type=int,
+               kwargs={'step': 0},
+               description='Slide the entropy window (the block size) in <int> byte steps'),
+        Option(long='classify',
+               kwargs={'classify': True},
+               description='Classify data blocks as plaintext, compressed or encrypted'),
+        Option(long='index',
+               kwargs={'use_index': True},
+               description='Calculate entropy from a cached, multi-resolution index of file data'),
+        Option(long='indexsize',
+               type=int,
+               kwargs={'index_size': 0},
+               description='Maximum size of the --index cache, in MB (each GB of indexed data needs about 272 MB)'),
     ]
 
     KWARGS = [
         Kwarg(name='enabled', default=False),
         Kwarg(name='save_plot', default=False),
+        Kwarg(name='plot_format', default=FILE_FORMAT),
         Kwarg(name='trigger_high', default=DEFAULT_TRIGGER_HIGH),
         Kwarg(name='trigger_low', default=DEFAULT_TRIGGER_LOW),
         Kwarg(name='use_zlib', default=False),
@@ -84,6 +266,10 @@ class Entropy(Module):
         Kwarg(name='do_plot', default=True),
         Kwarg(name='show_legend', default=True),
         Kwarg(name='block_size', default=0),
+        Kwarg(name='step', default=0),
+        Kwarg(name='use_index', default=False),
+        Kwarg(name='classify', default=False),
+        Kwarg(name='index_size', default=4096),
     ]
 
     # Run this module last so that it can process all other module's results
@@ -96,13 +282,30 @@ class Entropy(Module):
         self.file_markers = {}
         self.output_file = None
 
+        # self.algorithm calculates the entropy of a single piece of data, and
+        # self.block_algorithm the entropy of each piece of an entire data block
         if self.use_zlib:
             self.algorithm = self.gzip
+            self.block_algorithm = self.blocks
+            if self.step:
+                binwalk.core.common.warning("Sliding entropy windows are not supported by the faster entropy analysis, ignoring --step")
+                self.step = 0
+        elif np is not None:
+            self.algorithm = self.shannon_numpy
+            self.block_algorithm = self.shannon_numpy_blocks
         else:
-            if 'numpy' in sys.modules:
-                self.algorithm = self.shannon_numpy
-            else:
-                self.algorithm = self.shannon
+            self.algorithm = self.shannon
+            self.block_algorithm = self.blocks
+
+        # The classification statistics are calculated from each block of file data
+        if self.classify and (self.step or self.use_index):
+            binwalk.core.common.warning("Data classification requires reading each data block, ignoring --step and --index")
+            self.step = 0
+            self.use_index = False
+
+        self.index_cache = None
+        if self.use_index:
+            self._open_index_cache()
 
         # Get a list of all other module's results to mark on the entropy graph
         for (module, obj) in iterator(self.modules):
@@ -129,6 +332,32 @@ class Entropy(Module):
             else:
                 self.block_size = None
 
+    def _open_index_cache(self):
+        '''
+        Opens the entropy index cache for this scan (see binwalk.core.entropyindex).
+        '''
+        if self.use_zlib:
+            binwalk.core.common.warning("Entropy index is not supported by the faster entropy analysis, ignoring --index")
+            return
+
+        if not self.config.settings.user.cache:
+            binwalk.core.common.warning("Entropy index disabled: no user cache directory")
+            return
+
+        try:
+            import binwalk.core.entropyindex
+            self.index_cache = binwalk.core.entropyindex.EntropyIndexCache(self.config.settings.user.cache,
+                                                                           self.index_size * 1024 * 1024)
+        except KeyboardInterrupt as e:
+            raise e
+        except Exception as e:
+            binwalk.core.common.warning("Entropy index disabled: %s" % str(e))
+
+    def unload(self):
+        if getattr(self, 'index_cache', None) is not None:
+            self.index_cache.close()
+            self.index_cache = None
+
     def _entropy_sigterm_handler(self, *args):
         print ("Fuck it all.")
 
@@ -137,7 +366,7 @@ class Entropy(Module):
 
     def _run(self):
         # Sanity check and warning if matplotlib isn't found
-        if self.do_plot:
+        if self.do_plot and not (self.save_plot and self.plot_format == 'svg'):
             try:
                 # If we're saving the plot to a file, configure matplotlib
                 # to use the Agg back-end. This does not require a X server,
@@ -177,6 +406,9 @@ class Entropy(Module):
             block_size = fp.size / self.DEFAULT_DATA_POINTS
             # Round up to the nearest DEFAULT_BLOCK_SIZE (1024)
             block_size = int(block_size + ((self.DEFAULT_BLOCK_SIZE - block_size) % self.DEFAULT_BLOCK_SIZE))
+            # Indexed data can only be divided on the index's boundaries
+            if self.index_cache is not None:
+                block_size += (-block_size) % binwalk.core.entropyindex.EntropyIndex.LEAF_SIZE
         else:
             block_size = self.block_size
 
@@ -187,6 +419,72 @@ class Entropy(Module):
         binwalk.core.common.debug("Entropy block size (%d data points): %d" %
                                   (self.DEFAULT_DATA_POINTS, block_size))
 
+        if self.step and self.step < block_size:
+            points = self._rolling_entropy(fp, block_size, self.step)
+        else:
+            index = self._open_index(fp, block_size)
+            if index is not None:
+                points = self._indexed_entropy(fp, index, block_size)
+            else:
+                points = self._block_entropy(fp, block_size)
+
+        # The classification of the last data point, if --classify was specified
+        last_classification = None
+
+        for (file_offset, step, entropies, statistics) in points:
+            if self.config.verbose:
+                edges = {}
+            else:
+                (edges, last_edge, trigger_reset) = self.find_edges(entropies, last_edge, trigger_reset)
+
+            for (i, entropy) in enumerate(entropies):
+                edge = edges.get(i, None)
+
+                if edge == 1:
+                    description = "Rising entropy edge (%f)" % entropy
+                    display = self.display_results
+                elif edge == 0:
+                    description = "Falling entropy edge (%f)" % entropy
+                    display = self.display_results
+                else:
+                    description = "%f" % entropy
+                    display = self.display_results and self.config.verbose
+
+                details = {}
+                if statistics is not None:
+                    stats = statistics[i]
+                    description += ", %s" % stats.classification
+
+                    # Changes in classification are displayed like entropy edges
+                    if stats.classification != last_classification:
+                        display = self.display_results
+                        last_classification = stats.classification
+
+                    details = dict(chi_square=stats.chi_square,
+                                   mean=stats.mean,
+                                   monte_carlo_pi=stats.monte_carlo_pi,
+                                   serial_correlation=stats.serial_correlation,
+                                   classification=stats.classification)
+
+                r = self.result(offset=(file_offset + (i * step)),
+                                file=fp,
+                                entropy=entropy,
+                                description=description,
+                                display=display,
+                                **details)
+
+        if self.do_plot:
+            self.plot_entropy(fp.name, fp.offset, min(fp.offset + fp.length, fp.size))
+
+    def _block_entropy(self, fp, block_size):
+        '''
+        Generates the entropy of each block_size piece of a file, one data block at a time.
+        If --classify was specified, the statistics of each piece are calculated from
+        the same data (see binwalk.core.bytestats).
+
+        Yields tuples of (file offset, distance between pieces, list of entropies,
+        list of ByteStatistics or None).
+        '''
         while True:
             file_offset = fp.tell()
 
@@ -194,42 +492,198 @@ class Entropy(Module):
             if dlen < 1:
                 break
 
-            i = 0
-            while i < dlen:
-                entropy = self.algorithm(data[i:i + block_size])
-                display = self.display_results
-                description = "%f" % entropy
+            if self.classify:
+                statistics = binwalk.core.bytestats.analyze_blocks(data, dlen, block_size)
+            else:
+                statistics = None
 
-                if not self.config.verbose:
-                    if last_edge in [None, 0] and entropy > self.trigger_low:
-                        trigger_reset = True
-                    elif last_edge in [None, 1] and entropy < self.trigger_high:
-                        trigger_reset = True
+            yield (file_offset, block_size, self.block_algorithm(data, dlen, block_size), statistics)
 
-                    if trigger_reset and entropy >= self.trigger_high:
-                        description = "Rising entropy edge (%f)" % entropy
-                        display = self.display_results
-                        last_edge = 1
-                        trigger_reset = False
-                    elif trigger_reset and entropy <= self.trigger_low:
-                        description = "Falling entropy edge (%f)" % entropy
-                        display = self.display_results
-                        last_edge = 0
-                        trigger_reset = False
-                    else:
-                        display = False
-                        description = "%f" % entropy
+    def _open_index(self, fp, block_size):
+        '''
+        Loads the entropy index for a file, if the index can be used to calculate the
+        entropy of the file's pieces.
 
-                r = self.result(offset=(file_offset + i),
-                                file=fp,
-                                entropy=entropy,
-                                description=description,
-                                display=display)
+        Returns an instance of binwalk.core.entropyindex.EntropyIndex, or None.
+        '''
+        if self.index_cache is None or isinstance(fp, binwalk.core.common.StringFile):
+            return None
+
+        if fp.swap_size or not fp.size:
+            return None
+
+        # Every piece of data must start and end on a boundary of the index
+        leaf = binwalk.core.entropyindex.EntropyIndex.LEAF_SIZE
+        end = min(fp.offset + fp.length, fp.size)
+        if (fp.offset % leaf or
+                fp.block_read_size % leaf or
+                fp.block_peek_size % leaf or
+                block_size % leaf or
+                (end % leaf and end != fp.size)):
+            binwalk.core.common.debug("Entropy index not used for '%s': offsets and sizes must be multiples of %d" % (fp.path, leaf))
+            return None
 
-                i += block_size
+        try:
+            index = self.index_cache.open(fp.path)
+        except KeyboardInterrupt as e:
+            raise e
+        except Exception as e:
+            binwalk.core.common.warning("Failed to load entropy index for '%s': %s" % (fp.path, str(e)))
+            return None
 
-        if self.do_plot:
-            self.plot_entropy(fp.name)
+        if index.size != fp.size:
+            return None
+
+        return index
+
+    def _indexed_entropy(self, fp, index, block_size):
+        '''
+        Generates the same entropy values as self._block_entropy, from the histograms in
+        an entropy index rather than from the file data.
+
+        Yields tuples of (file offset, distance between pieces, list of entropies, None).
+        '''
+        end = min(fp.offset + fp.length, fp.size)
+        # The file offset and number of consecutive, full block_size pieces not yet calculated
+        (run, count) = (fp.offset, 0)
+
+        # Walk the data blocks that self._block_entropy would read
+        block_offset = fp.offset
+        while block_offset < end:
+            dlen = min(fp.block_read_size, end - block_offset)
+            # Pieces may extend into the trailing peek data
+            data_end = min(block_offset + dlen + fp.block_peek_size, fp.size)
+            pieces = (dlen + block_size - 1) // block_size
+            full = min(pieces, (data_end - block_offset) // block_size)
+
+            if full:
+                if block_offset != run + (count * block_size):
+                    for point in self._indexed_run(index, run, block_size, count):
+                        yield point
+                    (run, count) = (block_offset, 0)
+                count += full
+
+            for i in range(full, pieces):
+                for point in self._indexed_run(index, run, block_size, count):
+                    yield point
+                (run, count) = (block_offset + ((i + 1) * block_size), 0)
+
+                piece_offset = block_offset + (i * block_size)
+                piece_end = min(piece_offset + block_size, data_end)
+                counts = index.histogram(piece_offset, piece_end).reshape(1, 256)
+                yield (piece_offset, block_size, self._shannon_counts(counts, piece_end - piece_offset), None)
+
+            block_offset += dlen
+
+        for point in self._indexed_run(index, run, block_size, count):
+            yield point
+
+    def _indexed_run(self, index, offset, block_size, count):
+        if count:
+            for (file_offset, counts) in index.histograms(offset, block_size, count):
+                yield (file_offset, block_size, self._shannon_counts(counts, block_size), None)
+
+    def _rolling_entropy(self, fp, window, step):
+        '''
+        Generates the entropy of a window that slides over a file in step byte increments,
+        one data block at a time. Windows must fit inside the file, unless the file is
+        smaller than a single window.
+
+        Yields tuples of (file offset, distance between windows, list of entropies, None).
+        '''
+        rolling = RollingEntropy(window, step)
+        start = None
+
+        while True:
+            file_offset = fp.tell()
+            if start is None:
+                start = file_offset
+
+            (data, dlen) = fp.read_block()
+            if dlen < 1:
+                break
+
+            (offset, entropies) = rolling.update(data[:dlen])
+            yield (start + offset, step, entropies, None)
+
+        entropy = rolling.finish()
+        if entropy is not None:
+            yield (start, step, [entropy], None)
+
+    def find_edges(self, entropies, last_edge, trigger_reset):
+        '''
+        Finds the rising and falling entropy edges in a list of entropy values.
+
+        Rather than stepping through every value, this jumps straight to the next value
+        that crosses the relevant trigger threshold, which is much faster when there
+        are few edges.
+
+        @entropies     - The list (or NumPy array) of entropy values.
+        @last_edge     - The last edge found (0 for falling, 1 for rising, None if none yet).
+        @trigger_reset - True if the trigger has been reset since the last edge.
+
+        Returns a tuple of ({index: edge}, last_edge, trigger_reset).
+        '''
+        edges = {}
+
+        # Sorted indices of the values that cross each trigger threshold
+        if np is not None:
+            values = np.asarray(entropies)
+            high = np.flatnonzero(values >= self.trigger_high)
+            low = np.flatnonzero(values <= self.trigger_low)
+            above_low = np.flatnonzero(values > self.trigger_low)
+            below_high = np.flatnonzero(values < self.trigger_high)
+        else:
+            high = [i for (i, e) in enumerate(entropies) if e >= self.trigger_high]
+            low = [i for (i, e) in enumerate(entropies) if e <= self.trigger_low]
+            above_low = [i for (i, e) in enumerate(entropies) if e > self.trigger_low]
+            below_high = [i for (i, e) in enumerate(entropies) if e < self.trigger_high]
+
+        def first(indices, i):
+            # The first index in indices that is >= i, or None
+            j = bisect.bisect_left(indices, i)
+            if j < len(indices):
+                return int(indices[j])
+            return None
+
+        i = 0
+        while i < len(entropies):
+            # After a falling edge, the trigger is reset by an entropy above the low
+            # threshold; after a rising edge, by an entropy below the high threshold.
+            if not trigger_reset:
+                i = first(above_low if last_edge == 0 else below_high, i)
+                if i is None:
+                    break
+                trigger_reset = True
+
+            rising = first(high, i)
+            falling = first(low, i)
+
+            if rising is not None and (falling is None or rising <= falling):
+                (i, last_edge) = (rising, 1)
+            elif falling is not None:
+                (i, last_edge) = (falling, 0)
+            else:
+                break
+
+            edges[i] = last_edge
+            trigger_reset = False
+            i += 1
+
+        return (edges, last_edge, trigger_reset)
+
+    def blocks(self, data, dlen, block_size):
+        '''
+        Calculates the entropy of each piece of a data block with self.algorithm.
+
+        @data       - The data block, as returned by read_block.
+        @dlen       - The length of the data block. Pieces start at offsets below dlen,
+                      but the last piece may extend into the block's trailing peek data.
+        @block_size - The size of each piece.
+
+        Returns a list of entropy values.
+        '''
+        return [self.algorithm(data[i:i + block_size]) for i in range(0, dlen, block_size)]
 
     def shannon(self, data):
         '''
@@ -240,30 +694,66 @@ class Entropy(Module):
         if data:
             length = len(data)
 
-            seen = dict(((chr(x), 0) for x in range(0, 256)))
-            for byte in data:
-                seen[byte] += 1
-
-            for x in range(0, 256):
-                p_x = float(seen[chr(x)]) / length
-                if p_x > 0:
-                    entropy -= p_x * math.log(p_x, 2)
+            # Bytes are counted by Counter in C; the sum is taken in byte order
+            for (byte, count) in sorted(collections.Counter(data).items()):
+                p_x = float(count) / length
+                entropy -= p_x * math.log(p_x, 2)
 
         return (entropy / 8)
 
     def shannon_numpy(self, data):
+        '''
+        Performs a Shannon entropy analysis on a given block of data, using NumPy.
+        '''
         if data:
-            return self._shannon_numpy(bytes2str(data))
+            A = np.frombuffer(str2bytes(data), dtype=np.uint8)
+            return self._shannon_counts(np.bincount(A, minlength=256).reshape(1, 256), len(A))[0]
         else:
             return 0
-    
-    @staticmethod
-    @njit
-    def _shannon_numpy(data):
-            A = np.frombuffer(data, dtype=np.uint8)
-            pA = np.bincount(A) / len(A)
-            entropy = -np.nansum(pA*np.log2(pA))
-            return (entropy / 8)
+
+    def shannon_numpy_blocks(self, data, dlen, block_size):
+        '''
+        Calculates the Shannon entropy of each piece of a data block, using NumPy.
+        The data block is viewed as a 2D array with one piece per row, and the byte
+        histograms of all rows are calculated with a single call to bincount.
+
+        Accepts the same arguments as, and returns the same values as, self.blocks.
+        '''
+        A = np.frombuffer(str2bytes(data), dtype=np.uint8)
+        starts = range(0, dlen, block_size)
+        # Number of pieces that are block_size bytes long
+        rows = min(len(starts), len(A) // block_size)
+        # Number of rows processed at once
+        batch = max(1, self.NUMPY_BATCH_SIZE // block_size)
+        entropy = []
+
+        for first in range(0, rows, batch):
+            n = min(batch, rows - first)
+            R = A[first * block_size:(first + n) * block_size].reshape(n, block_size)
+            # Offset each row's byte values so that each row gets its own 256 histogram bins
+            bins = (R + (np.arange(n, dtype=np.intp) * 256)[:, None]).ravel()
+            counts = np.bincount(bins, minlength=n * 256).reshape(n, 256)
+            entropy.extend(self._shannon_counts(counts, block_size))
+
+        # Any remaining piece at the end of the data is shorter than block_size
+        for i in starts[rows:]:
+            entropy.append(self.shannon_numpy(data[i:i + block_size]))
+
+        return entropy
+
+    def _shannon_counts(self, counts, length):
+        '''
+        Calculates the Shannon entropy of each row of a 2D array of byte counts.
+
+        @counts - An array of byte counts, with 256 columns.
+        @length - The total of each row's counts.
+
+        Returns a list of entropy values.
+        '''
+        p = counts / float(length)
+        # log2(1) == 0, so bytes that don't occur add nothing to the sum; the sum is
+        # subtracted from 0.0 so that an entropy of 0 isn't formatted as -0.000000
+        return ((0.0 - (p * np.log2(np.where(counts > 0, p, 1.0))).sum(axis=1)) / 8).tolist()
 
     def gzip(self, data, truncate=True):
         '''
@@ -279,20 +769,62 @@ class Entropy(Module):
 
         return e
 
-    def plot_entropy(self, fname):
-        try:
-            import matplotlib.pyplot as plt
-        except ImportError as e:
-            return
+    def plot_entropy(self, fname, start=None, end=None):
+        '''
+        Plots the entropy results of a file, along with the results of other modules.
 
-        i = 0
-        x = []
-        y = []
-        plotted_colors = {}
+        Results are decimated to FILE_WIDTH pixel columns (see binwalk.core.plot.Decimator),
+        and the markers for each description are drawn at once. SVG files are written
+        without matplotlib.
 
+        @fname - The file name.
+        @start - The lowest offset to plot (default: the lowest result offset).
+        @end   - The highest offset to plot (default: the highest result offset).
+
+        Returns None.
+        '''
+        svg = self.save_plot and self.plot_format == 'svg'
+
+        if not svg:
+            try:
+                import matplotlib.pyplot as plt
+            except ImportError as e:
+                return
+
+        if start is None or end is None:
+            offsets = [r.offset for r in self.results]
+            if not offsets:
+                return
+            (start, end) = (min(offsets), max(offsets))
+
+        decimator = binwalk.core.plot.Decimator(start, end, self.FILE_WIDTH)
         for r in self.results:
-            x.append(r.offset)
-            y.append(r.entropy)
+            decimator.add(r.offset, r.entropy)
+
+        if not decimator.count:
+            return
+
+        (x, y) = decimator.points()
+
+        # Each description is plotted in the next color, in the order they were found
+        markers = []
+        if self.show_legend and has_key(self.file_markers, fname):
+            groups = binwalk.core.plot.group_markers(self.file_markers[fname], decimator)
+            for (i, (description, offsets)) in enumerate(groups):
+                markers.append((description, self.COLORS[i % len(self.COLORS)], offsets))
+
+        if svg:
+            self.output_file = os.path.join(os.getcwd(), os.path.basename(fname)) + '.svg'
+            binwalk.core.plot.write_svg(self.output_file,
+                                        x,
+                                        y,
+                                        markers=[(d, self.SVG_COLORS[c], o) for (d, c, o) in markers],
+                                        title=self.TITLE,
+                                        xlabel=self.XLABEL,
+                                        ylabel=self.YLABEL,
+                                        ymax=1.1,
+                                        width=self.FILE_WIDTH)
+            return
 
         fig = plt.figure()
 
@@ -314,32 +846,15 @@ class Entropy(Module):
         ax.plot(-(max(x)*.001), 1.1, lw=0)
         ax.plot(-(max(x)*.001), 0, lw=0)
 
-        if self.show_legend and has_key(self.file_markers, fname):
-            for (offset, description) in self.file_markers[fname]:
-                # If this description has already been plotted at a different offset, we need to
-                # use the same color for the marker, but set the description to None to prevent
-                # duplicate entries in the graph legend.
-                #
-                # Else, get the next color and use it to mark descriptions of
-                # this type.
-                if has_key(plotted_colors, description):
-                    color = plotted_colors[description]
-                    description = None
-                else:
-                    color = self.COLORS[i]
-                    plotted_colors[description] = color
-
-                    i += 1
-                    if i >= len(self.COLORS):
-                        i = 0
-
-                ax.plot([offset, offset], [0, 1.1], '%s-' % color, lw=2, label=description)
+        if markers:
+            for (description, color, offsets) in markers:
+                ax.vlines(offsets, 0, 1.1, colors=color, lw=2, label=description)
 
             ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
 
         if self.save_plot:
-            self.output_file = os.path.join(os.getcwd(), os.path.basename(fname)) + '.png'
+            self.output_file = os.path.join(os.getcwd(), os.path.basename(fname)) + '.' + self.plot_format
             fig.savefig(self.output_file, bbox_inches='tight')
+            plt.close(fig)
         else:
             plt.show()
-
@@ -9,6 +9,7 @@ import shlex
 import tempfile
 import subprocess
 import binwalk.core.common
+import binwalk.core.bytestats
 from binwalk.core.compat import *
 from binwalk.core.module import Module, Option, Kwarg
 from binwalk.core.common import file_size, file_md5, unique_file_name, BlockFile
@@ -47,6 +48,36 @@ class Extractor(Module):
     # squashfs-root-0).
     UNIQUE_PATH_DELIMITER = '%%'
 
+    # Number of bytes of data checked by --nencrypted
+    ENCRYPTED_SAMPLE_SIZE = 1024 * 1024
+
+    # Size of the blocks of data classified by --nencrypted; each block of a file
+    # is classified at most once, no matter how many results it contains
+    ENCRYPTED_BLOCK_SIZE = 64 * 1024
+
+    # Descriptions of signatures for compressed formats, whose data often looks encrypted
+    # (e.g., LZMA's range coded output); --nencrypted doesn't check these results
+    COMPRESSED_FORMATS = [
+        'LZMA compressed data',
+        'xz compressed data',
+        'gzip compressed data',
+        'bzip2 compressed data',
+        'Zlib compressed data',
+        'LZ4 compressed data',
+        'LZO compressed data',
+        'lzop compressed data',
+        'lzip compressed data',
+        'lrzip compressed data',
+        'rzip compressed data',
+        'Snappy compression',
+        '7-zip archive data',
+        'Raw LZMA compression stream',
+        'Raw deflate compression stream',
+        'Raw bzip2 compression block',
+        'Raw xz compression block',
+    ]
+    COMPRESSED_DESCRIPTION = re.compile('^(%s)' % '|'.join([re.escape(x) for x in COMPRESSED_FORMATS]), re.IGNORECASE)
+
     TITLE = 'Extraction'
     ORDER = 9
     PRIMARY = False
@@ -104,6 +135,9 @@ class Extractor(Module):
                long='subdirs',
                kwargs={'extract_into_subdirs': True},
                description="Extract into sub-directories named by the offset"),
+        Option(long='nencrypted',
+               kwargs={'skip_encrypted': True},
+               description="Don't extract data that looks encrypted"),
     ]
 
     KWARGS = [
@@ -115,11 +149,54 @@ class Extractor(Module):
         Kwarg(name='load_default_rules', default=False),
         Kwarg(name='run_extractors', default=True),
         Kwarg(name='extract_into_subdirs', default=False),
+        Kwarg(name='skip_encrypted', default=False),
         Kwarg(name='manual_rules', default=[]),
         Kwarg(name='matryoshka', default=0),
         Kwarg(name='enabled', default=False),
     ]
 
+    def _looks_encrypted(self, file_name, offset, size):
+        '''
+        Checks if the data at the specified offset looks like encrypted data; signatures
+        found in encrypted data are almost certainly false positives. The data is
+        classified statistically (see binwalk.core.bytestats), so compressed data that
+        is indistinguishable from random data (e.g., LZMA) may also look encrypted;
+        callers should not check results for compressed formats.
+
+        The file is classified in blocks of ENCRYPTED_BLOCK_SIZE bytes, which are cached
+        in self.classifications, so data shared by several results is only read once.
+
+        @file_name - Path to the file.
+        @offset    - Offset of the data.
+        @size      - Size of the data.
+
+        Returns True if most of the blocks that hold the data look encrypted.
+        '''
+        classifications = self.classifications.setdefault(file_name, {})
+        first = offset // self.ENCRYPTED_BLOCK_SIZE
+        last = (offset + max(1, min(size, self.ENCRYPTED_SAMPLE_SIZE)) - 1) // self.ENCRYPTED_BLOCK_SIZE
+        blocks = list(range(first, last + 1))
+
+        missing = [i for i in blocks if i not in classifications]
+        if missing:
+            start = missing[0] * self.ENCRYPTED_BLOCK_SIZE
+            length = (missing[-1] + 1 - missing[0]) * self.ENCRYPTED_BLOCK_SIZE
+            fp = BlockFile(file_name, offset=start, length=length)
+            try:
+                data = fp.read(length)
+            finally:
+                fp.close()
+
+            for (i, stats) in enumerate(binwalk.core.bytestats.analyze_blocks(data, len(data), self.ENCRYPTED_BLOCK_SIZE)):
+                classifications[missing[0] + i] = stats.classification
+
+        encrypted = [i for i in blocks if classifications.get(i) == binwalk.core.bytestats.ENCRYPTED]
+        if len(encrypted) * 2 > len(blocks):
+            binwalk.core.common.debug("Not extracting encrypted looking data at %s @%d (%d of %d blocks)" % (file_name, offset, len(encrypted), len(blocks)))
+            return True
+
+        return False
+
     def load(self):
         # Holds a list of extraction rules loaded either from a file or when
         # manually specified.
@@ -135,6 +212,8 @@ class Extractor(Module):
         self.output = {}
         # Number of extracted files
         self.extraction_count = 0
+        # Classifications of the blocks of each file checked by --nencrypted (see self._looks_encrypted)
+        self.classifications = {}
         # Override the directory name used for extraction output directories
         self.output_directory_override = None
 
@@ -205,7 +284,10 @@ class Extractor(Module):
         # Only extract valid results that have been marked for extraction and displayed to the user.
         # Note that r.display is still True even if --quiet has been specified; it is False if the result has been
         # explicitly excluded via the -y/-x options.
-        if r.valid and r.extract and r.display and (not self.max_count or self.extraction_count < self.max_count):
+        if (r.valid and r.extract and r.display and (not self.max_count or self.extraction_count < self.max_count) and
+                not (self.skip_encrypted and
+                     not self.COMPRESSED_DESCRIPTION.search(r.description) and
+                     self._looks_encrypted(r.file.path, r.offset, size))):
             # Create some extract output for this file, it it doesn't already
             # exist
             if not binwalk.core.common.has_key(self.output, r.file.path):
@@ -521,12 +603,19 @@ class Extractor(Module):
 
             if self.output_directory_override:
                 output_directory = os.path.join(self.directory, subdir, self.output_directory_override)
+                if not os.path.exists(output_directory):
+                    os.mkdir(output_directory)
             else:
                 outdir = os.path.join(self.directory, subdir, '_' + basename)
-                output_directory = unique_file_name(outdir, extension='extracted')
-
-            if not os.path.exists(output_directory):
-                os.mkdir(output_directory)
+                while True:
+                    output_directory = unique_file_name(outdir, extension='extracted')
+                    # Parallel worker processes (--jobs) may be creating the same directory
+                    try:
+                        os.mkdir(output_directory)
+                        break
+                    except OSError as e:
+                        if not os.path.exists(output_directory):
+                            raise e
 
             self.extraction_directories[path] = output_directory
             self.output[path].directory = os.path.realpath(output_directory) + os.path.sep
@@ -798,7 +887,7 @@ class Extractor(Module):
             offset -= adjust
 
             # Open the target file and seek to the offset
-            fdin = self.config.open_file(file_name)
+            fdin = self.config.open_file(file_name, native=True)
             fdin.seek(offset)
 
             # Open the output file
@@ -87,6 +87,23 @@ class General(Module):
                type=int,
                kwargs={'status_server_port': 0},
                description='Enable the status server on the specified port'),
+        Option(long='mmap',
+               kwargs={'subclass': binwalk.core.common.MMapFile},
+               description='Read target files via memory mapped I/O'),
+        Option(long='native',
+               kwargs={'native': True},
+               description='Scan target files as bytes instead of str (Python 3)'),
+        Option(long='jobs',
+               type=int,
+               kwargs={'jobs': 0},
+               description='Scan target files in parallel using <int> processes (0: one per CPU)'),
+        Option(long='chunk',
+               type=int,
+               kwargs={'chunk': 0},
+               description='With --jobs, split each target file into <int> byte chunks scanned in parallel'),
+        Option(long='compact',
+               kwargs={'compact_results': True},
+               description='Store results in a compact form to reduce memory usage'),
         Option(long=None,
                short=None,
                type=binwalk.core.common.BlockFile,
@@ -96,6 +113,16 @@ class General(Module):
         Option(long="string",
                hidden=True,
                kwargs={'subclass': binwalk.core.common.StringFile}),
+        # Used by parallel worker processes to scan a single target file (see binwalk.core.parallel)
+        Option(long="worker",
+               hidden=True,
+               type=str,
+               kwargs={'worker': None}),
+        # Don't keep valid results in each module's results list; useful when they
+        # are consumed as they are found (see binwalk.iscan)
+        Option(long="discard",
+               hidden=True,
+               kwargs={'retain_results': False}),
     ]
 
     KWARGS = [
@@ -114,6 +141,12 @@ class General(Module):
         Kwarg(name='show_help', default=False),
         Kwarg(name='keep_going', default=False),
         Kwarg(name='subclass', default=io.FileIO),
+        Kwarg(name='native', default=False),
+        Kwarg(name='jobs', default=1),
+        Kwarg(name='chunk', default=0),
+        Kwarg(name='worker', default=None),
+        Kwarg(name='retain_results', default=True),
+        Kwarg(name='compact_results', default=False),
         Kwarg(name='file_name_include_regex', default=None),
         Kwarg(name='file_name_exclude_regex', default=None),
     ]
@@ -124,6 +157,14 @@ class General(Module):
         self.threads_active = False
         self.target_files = []
 
+        # Worker processes only scan the target file they were given, and leave
+        # the display of results to the parent process
+        if self.worker:
+            self.files = [self.worker]
+            self.quiet = True
+            self.log_file = None
+            self.status_server_port = 0
+
         # A special case for when we're loaded into IDA
         if self.subclass == io.FileIO and binwalk.core.idb.LOADED_IN_IDA:
             self.subclass = binwalk.core.idb.IDBFileIO
@@ -183,9 +224,10 @@ class General(Module):
 
         return True
 
-    def open_file(self, fname, length=None, offset=None, swap=None, block=None, peek=None):
+    def open_file(self, fname, length=None, offset=None, swap=None, block=None, peek=None, native=False):
         '''
         Opens the specified file with all pertinent configuration settings.
+        Data is read as bytes objects only if both native and self.native are set.
         '''
         if length is None:
             length = self.length
@@ -200,7 +242,8 @@ class General(Module):
                                              offset=offset,
                                              swap=swap,
                                              block=block,
-                                             peek=peek)
+                                             peek=peek,
+                                             native=(native and self.native))
 
     def _open_target_files(self):
         '''
@@ -210,7 +253,7 @@ class General(Module):
         # Validate the target files listed in target_files
         for tfile in self.files:
             # Ignore directories.
-            if not self.subclass == io.FileIO or not os.path.isdir(tfile):
+            if not issubclass(self.subclass, io.FileIO) or not os.path.isdir(tfile):
                 # Make sure we can open the target files
                 try:
                     fp = self.open_file(tfile)
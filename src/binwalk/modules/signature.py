@@ -1,6 +1,8 @@
 # Basic signature scan module. This is the default (and primary) feature
 # of binwalk.
 import binwalk.core.magic
+import binwalk.core.common
+import binwalk.core.parallel
 from binwalk.core.module import Module, Option, Kwarg
 
 
@@ -8,6 +10,8 @@ class Signature(Module):
 
     TITLE = "Signature Scan"
     ORDER = 10
+    PARALLEL = True
+    NATIVE = True
 
     CLI = [
         Option(short='B',
@@ -50,6 +54,16 @@ class Signature(Module):
                type=list,
                dtype=str.__name__,
                description='Only show results that match <str>'),
+        Option(long='aggregate',
+               kwargs={'aggregate': True},
+               description='Report runs of repeating signatures (e.g., JFFS2 nodes) as one result'),
+        Option(long='cache',
+               kwargs={'result_cache': True},
+               description='Cache scan results of target files, keyed by their contents'),
+        Option(long='cachesize',
+               type=int,
+               kwargs={'cache_size': 0},
+               description='Maximum size of the --cache database, in MB'),
     ]
 
     KWARGS = [
@@ -62,12 +76,18 @@ class Signature(Module):
         Kwarg(name='explicit_signature_scan', default=False),
         Kwarg(name='dumb_scan', default=False),
         Kwarg(name='magic_files', default=[]),
+        Kwarg(name='aggregate', default=False),
+        Kwarg(name='result_cache', default=False),
+        Kwarg(name='cache_size', default=256),
     ]
 
     VERBOSE_FORMAT = "%s    %d"
 
     def init(self):
         self.one_of_many = None
+        # The first result of the current run of a repeating signature, if aggregating (see self.aggregate_run)
+        self.current_run = None
+        self.scanning = False
 
         # Append the user's magic file first so that those signatures take
         # precedence
@@ -83,31 +103,87 @@ class Signature(Module):
             self.magic_files += self.config.settings.user.magic + \
                 self.config.settings.system.magic
 
-        # Initialize libmagic
-        self.magic = binwalk.core.magic.Magic(include=self.include_filters,
-                                              exclude=self.exclude_filters,
-                                              invalid=self.show_invalid)
-
         # Create a signature from the raw bytes, if any
-        if self.raw_bytes:
-            raw_signatures = []
-            for raw_bytes in self.raw_bytes:
-                raw_signatures.append("0    string    %s    Raw signature (%s)" % (raw_bytes, raw_bytes))
-            binwalk.core.common.debug("Parsing raw signatures: %s" % str(raw_signatures))
-            self.magic.parse(raw_signatures)
-
-        # Parse the magic file(s)
-        if self.magic_files:
-            binwalk.core.common.debug("Loading magic files: %s" % str(self.magic_files))
-            for f in self.magic_files:
-                self.magic.load(f)
+        raw_signatures = []
+        for raw_bytes in self.raw_bytes:
+            raw_signatures.append("0    string    %s    Raw signature (%s)" % (raw_bytes, raw_bytes))
+
+        # Initialize libmagic; previously loaded signatures with the same
+        # settings are re-used from the process-wide registry
+        self.magic = binwalk.core.magic.registry.acquire(files=self.magic_files,
+                                                         raw=raw_signatures,
+                                                         include=self.include_filters,
+                                                         exclude=self.exclude_filters,
+                                                         invalid=self.show_invalid,
+                                                         cache=self.config.settings.user.cache)
 
         self.VERBOSE = ["Signatures:", len(self.magic.signatures)]
 
+        self.cache = None
+        if self.result_cache:
+            self._open_cache(raw_signatures)
+
+    def _open_cache(self, raw_signatures):
+        '''
+        Opens the result cache for this scan (see binwalk.core.resultcache).
+
+        @raw_signatures - The signatures built from self.raw_bytes.
+
+        Returns None.
+        '''
+        try:
+            import binwalk.core.resultcache
+        except ImportError as e:
+            binwalk.core.common.warning("Result cache disabled: %s" % str(e))
+            return
+
+        if not self.config.settings.user.cache:
+            binwalk.core.common.warning("Result cache disabled: no user cache directory")
+            return
+
+        try:
+            self.cache = binwalk.core.resultcache.ResultCache(self.config.settings.user.cache,
+                                                              self.cache_size * 1024 * 1024)
+            # Cached data blocks depend on the loaded signatures, not just the magic file names
+            self.cache_signatures = ([binwalk.core.resultcache.ResultCache.digest(f) for f in self.magic_files],
+                                     raw_signatures,
+                                     self.include_filters,
+                                     self.exclude_filters,
+                                     self.show_invalid)
+        except KeyboardInterrupt as e:
+            raise e
+        except Exception as e:
+            binwalk.core.common.warning("Result cache disabled: %s" % str(e))
+            self.cache = None
+
+    def unload(self):
+        # Hand the signatures back to the registry for use by subsequent scans
+        if getattr(self, 'magic', None) is not None:
+            binwalk.core.magic.registry.release(self.magic)
+        if getattr(self, 'cache', None) is not None:
+            self.cache.close()
+            self.cache = None
+
     def validate(self, r):
         '''
         Called automatically by self.result.
         '''
+        self._validate(r)
+
+        if r.valid:
+            # Don't keep displaying signatures that repeat a bunch of times
+            # (e.g., JFFS2 nodes)
+            if r.id == self.one_of_many:
+                r.display = False
+            elif r.many:
+                self.one_of_many = r.id
+            else:
+                self.one_of_many = None
+
+    def _validate(self, r):
+        '''
+        Validates a result against the target file.
+        '''
         if self.show_invalid:
             r.valid = True
         elif r.valid:
@@ -123,22 +199,146 @@ class Signature(Module):
             if hasattr(r, "location") and (r.location != r.offset):
                 r.valid = False
 
-        if r.valid:
-            # Don't keep displaying signatures that repeat a bunch of times
-            # (e.g., JFFS2 nodes)
-            if r.id == self.one_of_many:
-                r.display = False
-            elif r.many:
-                self.one_of_many = r.id
-            else:
-                self.one_of_many = None
+    def _store_result(self, r):
+        # When aggregating, the first result of a run of repeating signatures is held
+        # back until the run ends
+        if self.aggregate and self.scanning:
+            if self.current_run is not None and r.id == self.current_run.id:
+                self.aggregate_run(r)
+                return
+
+            self.end_run()
+            if r.many:
+                self.current_run = r
+                self.current_run.count = 1
+                self.current_run.last_offset = r.offset
+                self.current_run.end_offset = r.offset + (r.size or r.jump)
+                self.current_run.last_description = r.description
+                return
+
+        super(self.__class__, self)._store_result(r)
+
+    def _build_display_args(self, r):
+        args = super(self.__class__, self)._build_display_args(r)
+
+        if args and getattr(r, 'count', 1) > 1:
+            args[-1] = "%s (%d occurrences through offset 0x%X)" % (args[-1], r.count, r.last_offset + self.config.base)
+
+        return args
+
+    def aggregate_run(self, r):
+        '''
+        Adds a result to the current run of repeating signatures, instead of storing it.
+        Called by self._store_result, so the result has already been validated, and
+        processed by plugins and dependency modules, by self.result.
+
+        @r - The result, with the same signature ID as the first result of the run.
+
+        Returns None.
+        '''
+        self.current_run.count += 1
+        self.current_run.last_offset = r.offset
+        self.current_run.end_offset = r.offset + (r.size or r.jump)
+        self.current_run.last_description = r.description
+
+    def end_run(self):
+        '''
+        Stores the result for the current run of repeating signatures, if any.
+
+        The result is the first result of the run, with these additional attributes:
+
+            o count            - The number of results in the run.
+            o last_offset      - The offset of the last result in the run.
+            o end_offset       - The end offset (offset plus size or jump) of the last result in the run.
+            o last_description - The description of the last result in the run.
+
+        The individual results of a run can be listed by scanning from its offset to its
+        end_offset without aggregation.
+
+        Returns None.
+        '''
+        if self.current_run is not None:
+            (r, self.current_run) = (self.current_run, None)
+            super(self.__class__, self)._store_result(r)
+
+    def scan_blocks(self, fp, count):
+        '''
+        Analyzes data blocks for chunked parallel scans (see binwalk.core.parallel.ChunkedScan).
+
+        @fp    - The target file, positioned at the first block to analyze.
+        @count - The maximum number of blocks to analyze.
+
+        Returns a list of (block offset, block length, hits) tuples (see Magic.hits).
+        '''
+        blocks = []
+
+        for i in range(0, count):
+            (data, dlen) = fp.read_block()
+            block_start = fp.tell() - dlen
+
+            if dlen < 1:
+                blocks.append((block_start, dlen, []))
+                break
+
+            blocks.append((block_start, dlen, self.magic.hits(data, dlen)))
+
+        return blocks
+
+    def scan_file(self, fp, chunks=None, record=False):
+        '''
+        Scans a target file for signatures.
+
+        @fp     - The target file.
+        @chunks - If specified, a binwalk.core.parallel.ChunkedScan or binwalk.core.resultcache.CachedScan
+                  instance which provides the analyzed data blocks of the file.
+        @record - If True, keep a record of the analyzed data blocks.
+
+        Returns a list of (block offset, block length, hits) tuples if record is True, else None.
+        '''
+        blocks = [] if record else None
 
-    def scan_file(self, fp):
         self.one_of_many = None
         self.magic.reset()
 
+        self.current_run = None
+        self.scanning = True
+        try:
+            self._scan_file(fp, chunks, blocks)
+        finally:
+            self.scanning = False
+
+        # Store any run of repeating signatures at the end of the file
+        self.end_run()
+
+        return blocks
+
+    def _scan_file(self, fp, chunks, blocks):
+        record = blocks is not None
+
         while True:
-            (data, dlen) = fp.read_block()
+            block = None
+            if chunks is not None:
+                block = chunks.block(fp.tell())
+
+            if block is None:
+                (data, dlen) = fp.read_block()
+                if dlen < 1:
+                    hits = []
+                elif record:
+                    hits = self.magic.hits(data, dlen)
+                    results = self.magic.select(hits)
+                else:
+                    results = self.magic.scan(data, dlen)
+            else:
+                # Equivalent to fp.read_block, without reading any data
+                (hits, dlen) = block
+                fp.seek(fp.tell() + dlen)
+                if dlen > 0:
+                    results = self.magic.select(hits)
+
+            if record:
+                blocks.append((fp.tell() - dlen, dlen, hits))
+
             if dlen < 1:
                 break
 
@@ -147,7 +347,7 @@ class Signature(Module):
             self.status.completed = block_start - fp.offset
 
             # Scan this data block for magic signatures
-            for r in self.magic.scan(data, dlen):
+            for r in results:
                 # current_block_offset is set when a jump-to-offset keyword is encountered while
                 # processing signatures. This points to an offset inside the current data block
                 # that scanning should jump to, so ignore any subsequent candidate signatures that
@@ -165,15 +365,18 @@ class Signature(Module):
                 # Provide an instance of the current file object
                 r.file = fp
 
+                # If a sigure specified the end tag, jump to the end of the file. This
+                # must be set before the result is stored; stored results may be copied
+                # (see --compact).
+                if r.end == True:
+                    r.jump = fp.size - r.offset
+
                 # Register the result for futher processing/display
                 # self.result automatically calls self.validate for result
-                # validation
+                # validation. When aggregating, valid repeating signatures
+                # after the first are only counted (see self._store_result).
                 self.result(r=r)
 
-                # If a sigure specified the end tag, jump to the end of the file
-                if r.end == True:
-                    r.jump = fp.size
-
                 # Is this a valid result and did it specify a jump-to-offset
                 # keyword, and are we doing a "smart" scan?
                 if r.valid and r.jump > 0 and not self.dumb_scan:
@@ -187,7 +390,44 @@ class Signature(Module):
                         break
 
     def run(self):
-        for fp in iter(self.next_file, None):
-            self.header()
-            self.scan_file(fp)
-            self.footer()
+        # Individual target files are split into chunks that are analyzed in parallel
+        if self.config.chunk and self.config.jobs != 1 and not self.config.worker:
+            pool = binwalk.core.parallel.ScanPool(self, self.config.jobs)
+        else:
+            pool = None
+
+        try:
+            for fp in iter(self.next_file, None):
+                key = None
+                cached = None
+                chunks = None
+
+                # Identical data scanned with identical options is replayed from the cache
+                if self.cache is not None:
+                    key = self.cache.key(fp, self.name, self.cache_signatures, self.dumb_scan)
+                    blocks = self.cache.get(key)
+                    if blocks is not None:
+                        binwalk.core.common.debug("Using cached results for '%s'" % fp.path)
+                        cached = chunks = binwalk.core.resultcache.CachedScan(blocks)
+
+                if chunks is None and pool is not None:
+                    chunks = binwalk.core.parallel.ChunkedScan(pool, fp, self.config.chunk)
+
+                self.header()
+                blocks = self.scan_file(fp, chunks, record=(key is not None))
+                self.footer()
+
+                # Update the cache entry if this scan analyzed any data blocks that weren't cached
+                if key is not None and (cached is None or cached.misses):
+                    self.cache.put(key, blocks)
+        except KeyboardInterrupt as e:
+            if pool is not None:
+                pool.terminate()
+            raise e
+        except Exception as e:
+            if pool is not None:
+                pool.terminate()
+            raise e
+
+        if pool is not None:
+            pool.close()
@@ -18,6 +18,7 @@ class HilinkDecryptor(binwalk.core.plugin.Plugin):
     Plugin to decrypt, validate, and extract Hilink encrypted firmware.
     '''
     MODULES = ["Signature"]
+    NATIVE = True
 
     DES_KEY = "H@L9K*(3"
     SIGNATURE_DESCRIPTION = "Encrypted Hilink uImage firmware".lower()
@@ -71,7 +72,7 @@ class HilinkDecryptor(binwalk.core.plugin.Plugin):
                 if result.description.lower().startswith(self.SIGNATURE_DESCRIPTION) is True:
                     # Read in the first 64 bytes of the suspected encrypted
                     # uImage header
-                    fd = self.module.config.open_file(result.file.path, offset=result.offset)
+                    fd = self.module.config.open_file(result.file.path, offset=result.offset, native=True)
                     encrypted_header_data = binwalk.core.compat.str2bytes(fd.read(64))
                     fd.close()
 
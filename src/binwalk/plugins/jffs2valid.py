@@ -13,6 +13,7 @@ class JFFS2ValidPlugin(binwalk.core.plugin.Plugin):
     0x00's) in between nodes.
     '''
     MODULES = ['Signature']
+    NATIVE = True
 
     def _check_crc(self, node_header):
         # struct and binascii want a bytes object in Python3
@@ -34,7 +35,7 @@ class JFFS2ValidPlugin(binwalk.core.plugin.Plugin):
         if result.file and result.description.lower().startswith('jffs2 filesystem'):
 
             # Seek to and read the suspected JFFS2 node header
-            fd = self.module.config.open_file(result.file.path, offset=result.offset)
+            fd = self.module.config.open_file(result.file.path, offset=result.offset, native=True)
             # JFFS2 headers are only 12 bytes in size, but reading larger amounts of
             # data from disk speeds up repeated disk access and decreases performance
             # hits (disk caching?).
@@ -9,10 +9,11 @@ class LZMAPlugin(binwalk.core.plugin.Plugin):
     Validates lzma signature results.
     '''
     MODULES = ['Signature']
+    NATIVE = True
 
     # Some lzma files exclude the file size, so we have to put it back in.
     # See also the lzmamod.py plugin.
-    FAKE_LZMA_SIZE = "\xFF\xFF\xFF\xFF\xFF\xFF\xFF\xFF"
+    FAKE_LZMA_SIZE = b"\xFF\xFF\xFF\xFF\xFF\xFF\xFF\xFF"
 
     # Check up to the first 64KB
     MAX_DATA_SIZE = 64 * 1024
@@ -52,8 +53,8 @@ class LZMAPlugin(binwalk.core.plugin.Plugin):
         if result.valid and result.file and result.description.lower().startswith('lzma compressed data'):
 
             # Seek to and read the suspected lzma data
-            fd = self.module.config.open_file(result.file.path, offset=result.offset, length=self.MAX_DATA_SIZE)
-            data = fd.read(self.MAX_DATA_SIZE)
+            fd = self.module.config.open_file(result.file.path, offset=result.offset, length=self.MAX_DATA_SIZE, native=True)
+            data = binwalk.core.compat.str2bytes(fd.read(self.MAX_DATA_SIZE))
             fd.close()
 
             # Validate the original data; if that fails, maybe it is missing the size field,
@@ -12,6 +12,7 @@ class UBIValidPlugin(binwalk.core.plugin.Plugin):
     Checks header CRC and calculates jump value
     '''
     MODULES = ['Signature']
+    NATIVE = True
     current_file = None
     last_ec_hdr_offset = None
     peb_size = None
@@ -56,7 +57,7 @@ class UBIValidPlugin(binwalk.core.plugin.Plugin):
     def scan(self, result):
         if result.file and result.description.lower().startswith('ubi erase count header'):
             # Seek to and read the suspected UBI erase count header
-            fd = self.module.config.open_file(result.file.path, offset=result.offset)
+            fd = self.module.config.open_file(result.file.path, offset=result.offset, native=True)
 
             ec_header = binwalk.core.compat.str2bytes(fd.read(1024))
             fd.close()
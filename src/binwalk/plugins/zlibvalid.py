@@ -10,6 +10,7 @@ class ZlibValidPlugin(binwalk.core.plugin.Plugin):
     Validates zlib compressed data.
     '''
     MODULES = ['Signature']
+    NATIVE = True
 
     MAX_DATA_SIZE = 33 * 1024
 
@@ -27,9 +28,9 @@ class ZlibValidPlugin(binwalk.core.plugin.Plugin):
             offset = result.offset - adjust
 
             # Seek to and read the suspected zlib data
-            fd = self.module.config.open_file(result.file.path)
+            fd = self.module.config.open_file(result.file.path, native=True)
             fd.seek(offset)
-            data = fd.read(self.MAX_DATA_SIZE)[adjust:]
+            data = binwalk.core.compat.str2bytes(fd.read(self.MAX_DATA_SIZE))[adjust:]
             fd.close()
 
             # Check if this is valid zlib data. It is valid if:
@@ -37,7 +38,7 @@ class ZlibValidPlugin(binwalk.core.plugin.Plugin):
             #   1. It decompresses without error
             #   2. Decompression fails only because of truncated input
             try:
-                zlib.decompress(binwalk.core.compat.str2bytes(data))
+                zlib.decompress(data)
             except zlib.error as e:
                 # Error -5, incomplete or truncated data input
                 if not str(e).startswith("Error -5"):
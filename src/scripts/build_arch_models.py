@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# Builds the byte pair models used by the Disasm module's --fast-disasm option
+# (src/binwalk/config/archstats.npz) from the code sections of ELF files.
+#
+# Usage:
+#
+#   build_arch_models.py OUTPUT --arch DESCRIPTION FILE [FILE ...] [--arch ...]
+#
+# DESCRIPTION must match the description of an architecture in the Disasm module.
+# Each FILE is an ELF file, or an ar archive of ELF files (e.g., a static library).
+# FILE may be prefixed with "swap16:" or "swap32:" to swap the byte order of the
+# 16-bit or 32-bit words of its code, e.g. to build a big endian model from little
+# endian code.
+#
+# The bundled models were built from the static C library (musl) that zig cc builds
+# for the arm, thumb, aarch64, powerpc, mips and mipsel targets; the big endian ARM,
+# AArch64 and Thumb models were built from the byte swapped little endian code.
+
+import sys
+import struct
+import argparse
+import numpy as np
+import binwalk.core.archstats
+
+SHF_EXECINSTR = 0x4
+
+
+def elf_code(data):
+    # Returns the contents of an ELF file's executable sections
+    if data[:4] != b'\x7fELF':
+        return []
+
+    endian = '<' if data[5:6] == b'\x01' else '>'
+    if data[4:5] == b'\x02':
+        (shoff,) = struct.unpack(endian + 'Q', data[0x28:0x30])
+        (shentsize, shnum) = struct.unpack(endian + 'HH', data[0x3A:0x3E])
+        header = endian + 'IIQQQQ'
+    else:
+        (shoff,) = struct.unpack(endian + 'I', data[0x20:0x24])
+        (shentsize, shnum) = struct.unpack(endian + 'HH', data[0x2E:0x32])
+        header = endian + 'IIIIII'
+
+    code = []
+    for i in range(0, shnum):
+        entry = data[shoff + (i * shentsize):shoff + (i * shentsize) + struct.calcsize(header)]
+        (name, stype, flags, addr, offset, size) = struct.unpack(header, entry)
+        # SHT_NOBITS sections have no data in the file
+        if (flags & SHF_EXECINSTR) and stype != 8:
+            code.append(data[offset:offset + size])
+
+    return code
+
+
+def ar_members(data):
+    # Returns the contents of an ar archive's members
+    members = []
+    offset = 8
+
+    while offset + 60 <= len(data):
+        size = int(data[offset + 48:offset + 58].strip())
+        members.append(data[offset + 60:offset + 60 + size])
+        offset += 60 + size + (size % 2)
+
+    return members
+
+
+def file_code(fname):
+    swap = None
+    for prefix in ['swap16:', 'swap32:']:
+        if fname.startswith(prefix):
+            swap = np.dtype('>u%d' % (int(prefix[4:6]) // 8))
+            fname = fname[len(prefix):]
+
+    with open(fname, 'rb') as fp:
+        data = fp.read()
+
+    if data.startswith(b'!<arch>\n'):
+        members = ar_members(data)
+    else:
+        members = [data]
+
+    code = []
+    for member in members:
+        for section in elf_code(member):
+            if swap is not None:
+                section = section[:len(section) - (len(section) % swap.itemsize)]
+                section = np.frombuffer(section, dtype=swap).astype(swap.newbyteorder()).tobytes()
+            code.append(section)
+
+    return code
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the byte pair models of the Disasm module's --fast-disasm option")
+    parser.add_argument('output', help='Path to the models file')
+    parser.add_argument('--arch', nargs='+', action='append', required=True, metavar=('DESCRIPTION', 'FILE'),
+                        help='An architecture description, followed by the files to build its model from')
+    args = parser.parse_args()
+
+    counts = []
+    for arch in args.arch:
+        total = np.zeros(65536, dtype=np.int64)
+        size = 0
+
+        for fname in arch[1:]:
+            for code in file_code(fname):
+                total += binwalk.core.archstats.pair_counts(code)
+                size += len(code)
+
+        sys.stdout.write("%s: %d bytes of code\n" % (arch[0], size))
+        counts.append((arch[0], total))
+
+    binwalk.core.archstats.ArchModels.save(args.output, counts)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+'''
+Input vectors and temporary files shared by the tests.
+'''
+import os
+import shutil
+import tempfile
+import contextlib
+
+INPUT_VECTORS = os.path.join(os.path.dirname(__file__), "input-vectors")
+
+def input_vector(name):
+    return os.path.join(INPUT_VECTORS, name)
+
+def read_input_vector(name):
+    with open(input_vector(name), "rb") as fp:
+        return fp.read()
+
+def random_bytes(rand, size):
+    '''
+    Returns size pseudo-random bytes, reproducible for a seeded random.Random.
+    '''
+    return bytes(bytearray(rand.randint(0, 255) for i in range(size)))
+
+def random_words(rand, count=500, letters='abcdefghij'):
+    '''
+    Returns a vocabulary of count pseudo-random words for random_text.
+    '''
+    return [''.join(rand.choice(letters) for i in range(rand.randint(2, 8))) for j in range(count)]
+
+def random_text(rand, words, length):
+    '''
+    Returns length words, chosen from words, as compressible ASCII text.
+    '''
+    return ' '.join(rand.choice(words) for i in range(length)).encode('ascii')
+
+@contextlib.contextmanager
+def temp_dir():
+    '''
+    Creates a temporary directory, and removes it and its contents on exit.
+    '''
+    path = tempfile.mkdtemp()
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path)
+
+@contextlib.contextmanager
+def temp_file(data, name="input.bin"):
+    '''
+    Writes data to a file in a temporary directory, yielding the file's path.
+
+    @data - The file contents.
+    @name - The file name.
+    '''
+    with temp_dir() as path:
+        fname = os.path.join(path, name)
+        with open(fname, "wb") as fp:
+            fp.write(data)
+        yield fname
+
+@contextlib.contextmanager
+def user_dir():
+    '''
+    Points the binwalk user directory (via XDG_CONFIG_HOME) at a temporary directory,
+    yielding the path of its binwalk subdirectory.
+    '''
+    xdg_config_home = os.environ.get('XDG_CONFIG_HOME')
+    with temp_dir() as path:
+        os.environ['XDG_CONFIG_HOME'] = path
+        try:
+            yield os.path.join(path, "binwalk")
+        finally:
+            if xdg_config_home is None:
+                del os.environ['XDG_CONFIG_HOME']
+            else:
+                os.environ['XDG_CONFIG_HOME'] = xdg_config_home
+
+@contextlib.contextmanager
+def without_numpy(*modules):
+    '''
+    Hides NumPy from the given modules, which import it as the optional np global.
+    '''
+    saved = [module.np for module in modules]
+    for module in modules:
+        module.np = None
+    try:
+        yield
+    finally:
+        for (module, np) in zip(modules, saved):
+            module.np = np
+
+@contextlib.contextmanager
+def working_dir(path):
+    '''
+    Changes the working directory, where plots are saved, for the duration of a test.
+    '''
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(cwd)
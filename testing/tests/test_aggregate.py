@@ -0,0 +1,83 @@
+import random
+import struct
+import binascii
+import binwalk
+from nose.tools import eq_, ok_
+from helpers import read_input_vector, random_bytes, temp_file
+
+def jffs2_nodes(rand, count, endianness, bad=()):
+    '''
+    Generates consecutive JFFS2 nodes of random types and lengths. The nodes with
+    indexes in bad have an incorrect header CRC.
+    '''
+    data = b''
+    for i in range(count):
+        length = rand.randint(12, 200)
+        header = struct.pack(endianness + 'HHI', 0x1985, rand.choice([0xE001, 0xE002, 0x2003]), length)
+        crc = (binascii.crc32(header, -1) ^ -1) & 0xFFFFFFFF
+        if i in bad:
+            crc ^= 1
+        data += header + struct.pack(endianness + 'I', crc)
+        data += random_bytes(rand, length - 12)
+    return data
+
+def test_aggregate():
+    '''
+    Test: Create a file containing runs of little and big endian JFFS2 nodes, and an LZMA
+    file, and scan it for signatures with and without --aggregate.
+    Verify that each run of consecutive JFFS2 results with the same signature is reported
+    as a single result, with the number of nodes in the run and the offsets of its last
+    node and its end, and that the other results are unchanged.
+    '''
+    lzma = read_input_vector("foobar.lzma")
+
+    rand = random.Random(0)
+
+    # A run ends at a result of a different signature, not at a gap between nodes
+    data = random_bytes(rand, 1000) + jffs2_nodes(rand, 50, '<') + random_bytes(rand, 1000) + jffs2_nodes(rand, 20, '<')
+    data += jffs2_nodes(rand, 30, '>') + random_bytes(rand, 100) + lzma + jffs2_nodes(rand, 1, '>')
+    data += random_bytes(rand, 100) + jffs2_nodes(rand, 5, '>') + random_bytes(rand, 100)
+    runs = [70, 30, 6]
+
+    with temp_file(data, "jffs2.bin") as input_vector_file:
+        expected = binwalk.scan(input_vector_file, signature=True, quiet=True)[0].results
+        results = binwalk.scan(input_vector_file, signature=True, aggregate=True, quiet=True)[0].results
+
+        nodes = [r for r in expected if r.description.startswith("JFFS2")]
+        eq_(len(nodes), sum(runs))
+        ok_([r for r in expected if r.description.startswith("LZMA")])
+
+        # Results other than JFFS2 nodes are not aggregated
+        eq_([(r.offset, r.description) for r in results if not r.description.startswith("JFFS2")],
+            [(r.offset, r.description) for r in expected if not r.description.startswith("JFFS2")])
+
+        results = [r for r in results if r.description.startswith("JFFS2")]
+        eq_([getattr(r, 'count', 1) for r in results], runs)
+
+        i = 0
+        for (r, count) in zip(results, runs):
+            (first, last) = (nodes[i], nodes[i + count - 1])
+            eq_((r.offset, r.description), (first.offset, first.description))
+            eq_(r.last_offset, last.offset)
+            eq_(r.end_offset, last.offset + last.jump)
+            eq_(r.last_description, last.description)
+            i += count
+
+def test_aggregate_invalid():
+    '''
+    Test: Create a file containing a run of JFFS2 nodes, some of which have an incorrect
+    header CRC, and scan it for signatures with and without --aggregate.
+    Verify that the nodes that the JFFS2 plugin rejects are not counted in the run.
+    '''
+    rand = random.Random(0)
+    bad = set([0, 3, 4, 10, 39])
+    data = random_bytes(rand, 1000) + jffs2_nodes(rand, 40, '<', bad) + random_bytes(rand, 1000)
+
+    with temp_file(data, "jffs2.bin") as input_vector_file:
+        expected = binwalk.scan(input_vector_file, signature=True, quiet=True)[0].results
+        results = binwalk.scan(input_vector_file, signature=True, aggregate=True, quiet=True)[0].results
+
+        eq_(len(expected), 40 - len(bad))
+        eq_(len(results), 1)
+        eq_((results[0].offset, results[0].count), (expected[0].offset, len(expected)))
+        eq_(results[0].last_offset, expected[-1].offset)
@@ -0,0 +1,54 @@
+import os
+import random
+import binwalk.core.settings
+import binwalk.core.archstats
+from nose.tools import eq_, ok_
+from nose.plugins.skip import SkipTest
+from helpers import random_bytes
+
+try:
+    from binwalk.modules.disasm import Disasm
+    (FAST_WINDOW_SIZE, FAST_MIN_SCORE) = (Disasm.FAST_WINDOW_SIZE, Disasm.FAST_MIN_SCORE)
+except ImportError:
+    # The Disasm module requires capstone; the models don't
+    (FAST_WINDOW_SIZE, FAST_MIN_SCORE) = (4 * 1024, 1.0)
+
+def models():
+    if binwalk.core.archstats.np is None:
+        raise SkipTest("NumPy is not installed")
+    return binwalk.core.archstats.ArchModels(binwalk.core.settings.Settings().system.archstats)
+
+def test_archstats_noise():
+    '''
+    Test: Score windows of random data and of 0 bytes against the architecture models.
+    Verify that no window scores at least the minimum score of --fast-disasm against any model.
+    '''
+    m = models()
+    ok_(m.descriptions)
+
+    rand = random.Random(0)
+    random_data = random_bytes(rand, 64 * FAST_WINDOW_SIZE)
+    zeros = b'\x00' * (16 * FAST_WINDOW_SIZE)
+
+    for data in [random_data, os.urandom(16 * FAST_WINDOW_SIZE), zeros]:
+        scores = m.score(data, FAST_WINDOW_SIZE)
+        eq_(scores.shape, (len(data) // FAST_WINDOW_SIZE, len(m.descriptions)))
+        ok_(scores.max() < FAST_MIN_SCORE)
+        eq_(m.classify(data, len(data), FAST_WINDOW_SIZE, FAST_MIN_SCORE), [])
+
+def test_archstats_classify_dlen():
+    '''
+    Test: Classify the windows of data blocks with trailing peek data, with a threshold
+    that every window scores above.
+    Verify that only windows that start below the data block length are classified,
+    including a last window that extends into the peek data.
+    '''
+    m = models()
+
+    rand = random.Random(0)
+    data = random_bytes(rand, 20 * FAST_WINDOW_SIZE)
+
+    for dlen in [FAST_WINDOW_SIZE, 10 * FAST_WINDOW_SIZE, (10 * FAST_WINDOW_SIZE) + 1, (12 * FAST_WINDOW_SIZE) - 1, 1]:
+        windows = m.classify(data, dlen, FAST_WINDOW_SIZE, -1000.0)
+        eq_([offset for (offset, model) in windows], list(range(0, dlen, FAST_WINDOW_SIZE)))
+        ok_(all([0 <= model < len(m.descriptions) for (offset, model) in windows]))
@@ -0,0 +1,80 @@
+import random
+import struct
+import binwalk
+from nose.tools import eq_, ok_
+from nose.plugins.skip import SkipTest
+from helpers import random_bytes, temp_file
+
+def firmware_image(rand, base, endianness, count=200):
+    '''
+    Generates random data containing a table of strings, and a table of pointers to
+    those strings for an image loaded at base.
+    '''
+    strings = b''
+    pointers = []
+    for i in range(count):
+        pointers.append(base + 0x4000 + len(strings))
+        strings += ('string %d: %s\x00' % (i, 'x' * rand.randint(0, 16))).encode('ascii')
+    table = struct.pack('%s%dI' % (endianness, count), *pointers)
+
+    data = bytearray(random_bytes(rand, 0x10000))
+    data[0x4000:0x4000 + len(strings)] = strings
+    data[0x8000:0x8000 + len(table)] = table
+    return data
+
+def test_base_address():
+    '''
+    Test: Create firmware images with little and big endian pointer tables, and scan them
+    for their base address.
+    Verify that only the base address the images were generated for is reported.
+    '''
+    try:
+        import numpy
+        import capstone
+    except ImportError:
+        raise SkipTest("numpy and capstone are required")
+
+    rand = random.Random(0)
+    for (base, endianness, name) in [(0x80010000, '<', 'little'), (0x10000000, '>', 'big')]:
+        with temp_file(bytes(firmware_image(rand, base, endianness)), "firmware.bin") as input_vector_file:
+            scan_result = binwalk.scan(input_vector_file,
+                                       quiet=True,
+                                       **{'base-address': True})
+
+            eq_(len(scan_result), 1)
+            eq_(len(scan_result[0].results), 1)
+
+            result = scan_result[0].results[0]
+            eq_(result.offset, 0)
+            eq_(result.base, base)
+            ok_(result.matches >= 195)
+            ok_(result.description.startswith("Base address: 0x%X, %d of " % (base, result.matches)))
+            ok_(result.description.endswith(", %s endian 32-bit pointers" % name))
+
+def test_base_address_limit():
+    '''
+    Test: Create a firmware image whose pointer table starts at MAX_IMAGE_SIZE, with
+    MAX_IMAGE_SIZE lowered to fit the test, and scan it for its base address.
+    Verify that the data past MAX_IMAGE_SIZE isn't searched, so that no base address
+    is reported.
+    '''
+    try:
+        import numpy
+        import capstone
+    except ImportError:
+        raise SkipTest("numpy and capstone are required")
+
+    from binwalk.modules.baseaddress import BaseAddress
+
+    rand = random.Random(0)
+    max_image_size = BaseAddress.MAX_IMAGE_SIZE
+    BaseAddress.MAX_IMAGE_SIZE = 0x8000
+    try:
+        with temp_file(bytes(firmware_image(rand, 0x80010000, '<')), "firmware.bin") as input_vector_file:
+            scan_result = binwalk.scan(input_vector_file,
+                                       quiet=True,
+                                       **{'base-address': True})
+            eq_(len(scan_result), 1)
+            eq_(scan_result[0].results, [])
+    finally:
+        BaseAddress.MAX_IMAGE_SIZE = max_image_size
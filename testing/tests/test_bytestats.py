@@ -0,0 +1,69 @@
+import os
+import zlib
+import random
+import string
+import binwalk.core.bytestats
+from nose.tools import eq_, ok_
+from nose.plugins.skip import SkipTest
+from helpers import random_bytes, random_words, random_text, without_numpy
+
+def text(rand, length):
+    return random_text(rand, random_words(rand, 5000, string.ascii_lowercase), length)
+
+def analyze(data, numpy):
+    if numpy:
+        return binwalk.core.bytestats.analyze(data)
+    with without_numpy(binwalk.core.bytestats):
+        return binwalk.core.bytestats.analyze(data)
+
+def test_bytestats_numpy():
+    '''
+    Test: Calculate the statistics of each piece of data blocks of text, compressed and
+    random data with NumPy, for several piece sizes, including data blocks whose length
+    isn't a multiple of the piece size and data blocks with trailing peek data.
+    Verify that the statistics and classifications are the same as those calculated
+    without NumPy.
+    '''
+    if binwalk.core.bytestats.np is None:
+        raise SkipTest("NumPy is not installed")
+
+    rand = random.Random(0)
+    plaintext = text(rand, 3000)
+    data = plaintext + zlib.compress(plaintext * 4, 9) + random_bytes(rand, 20000) + b'\x00' * 5000
+
+    for block_size in [37, 256, 4096, 65536]:
+        for (dlen, peek) in [(len(data), 0), (len(data) - 1000, 1000)]:
+            block = data[:dlen + peek]
+            stats = binwalk.core.bytestats.analyze_blocks(block, dlen, block_size)
+            expected = [analyze(block[i:i + block_size], numpy=False) for i in range(0, dlen, block_size)]
+            eq_(len(stats), len(expected))
+
+            for (a, b) in zip(stats, expected):
+                eq_(a.length, b.length)
+                eq_(a.classification, b.classification)
+                for attribute in ['entropy', 'chi_square', 'mean', 'monte_carlo_pi', 'serial_correlation']:
+                    ok_(abs(getattr(a, attribute) - getattr(b, attribute)) < 1e-6)
+
+def test_bytestats_classification():
+    '''
+    Test: Classify pieces of text, zlib compressed text and random data.
+    Verify that they are classified as plaintext, compressed and encrypted.
+    '''
+    rand = random.Random(0)
+    plaintext = text(rand, 300000)
+    compressed = zlib.compress(plaintext, 9)
+    block_size = 64 * 1024
+
+    for numpy in [False, True]:
+        if numpy and binwalk.core.bytestats.np is None:
+            continue
+
+        for i in range(0, 4 * block_size, block_size):
+            eq_(analyze(plaintext[i:i + block_size], numpy).classification, binwalk.core.bytestats.PLAINTEXT)
+
+        for i in range(0, len(compressed) - block_size, block_size):
+            eq_(analyze(compressed[i:i + block_size], numpy).classification, binwalk.core.bytestats.COMPRESSED)
+
+        # Random data fails the statistical tests about 1% of the time
+        encrypted = [analyze(os.urandom(block_size), numpy).classification for i in range(20)]
+        ok_(encrypted.count(binwalk.core.bytestats.ENCRYPTED) >= 16)
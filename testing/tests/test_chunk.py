@@ -0,0 +1,36 @@
+import random
+import binwalk
+from nose.tools import eq_, ok_
+from helpers import read_input_vector, random_bytes, temp_file
+
+def results(scan_result):
+    return [(r.offset, r.description) for r in scan_result[0].results]
+
+def test_chunk():
+    '''
+    Test: Create a file containing two squashfs images at offsets that aren't multiples
+    of the block size, and scan it for signatures in small chunks with two worker
+    processes (--jobs, --chunk).
+    Verify that the results are the same as those of a sequential scan, including the
+    results after each jump past a squashfs image, which moves the scan off the grid
+    of data blocks that the chunks were laid out on.
+    '''
+    squashfs = read_input_vector("firmware.squashfs")
+    lzma = read_input_vector("foobar.lzma")
+
+    rand = random.Random(0)
+    data = (random_bytes(rand, 70001) + squashfs + random_bytes(rand, 100003) + squashfs +
+            lzma + random_bytes(rand, 50000))
+
+    with temp_file(data, "firmware.bin") as input_vector_file:
+        expected = results(binwalk.scan(input_vector_file, signature=True, block=65536, quiet=True))
+
+        # Both squashfs images are found, and the scan jumps past each of them
+        squashfs_offsets = [offset for (offset, description) in expected if description.startswith("Squashfs")]
+        eq_(squashfs_offsets, [70001, 70001 + len(squashfs) + 100003])
+        for offset in squashfs_offsets:
+            ok_(not [o for (o, description) in expected if offset < o < offset + len(squashfs)])
+        lzma_offset = 70001 + len(squashfs) + 100003 + len(squashfs)
+        ok_([description for (offset, description) in expected if offset == lzma_offset][0].startswith("LZMA"))
+
+        eq_(results(binwalk.scan(input_vector_file, signature=True, block=65536, jobs=2, chunk=131072, quiet=True)), expected)
@@ -0,0 +1,99 @@
+import random
+import binwalk
+from binwalk.core.module import Result, Error, ResultList
+from nose.tools import eq_, ok_
+from helpers import input_vector, read_input_vector, random_bytes, temp_file
+
+def items(r):
+    return sorted([(name, type(value), value) for (name, value) in r._items()], key=lambda item: (item[0], str(item[2])))
+
+def test_result_list():
+    '''
+    Test: Store results with various offsets, sizes, descriptions and other attributes
+    in a ResultList.
+    Verify that the results read back from the ResultList have the same classes and
+    the same attribute values, of the same types.
+    '''
+    results = [
+        Result(offset=0, description="foo"),
+        Result(offset=1, size=2, description="foo"),
+        Result(offset=2 ** 40, size=2 ** 62, description="bar", valid=False),
+        # Offsets that are too large for the arrays, or aren't integers
+        Result(offset=2 ** 63, size=-(2 ** 63), description="baz"),
+        Result(offset=1.5, size=None, description=u"unicode"),
+        # Values that are equal, but have different types
+        Result(offset=3, description="foo", valid=1),
+        Result(offset=4, description="foo", valid=True),
+        # Attributes that aren't slots, including unhashable ones
+        Result(offset=5, description="foo", jump=10, entropy=0.5),
+        Result(offset=6, description="foo", jump=10, entropy=0.5),
+        Result(offset=7, description="foo", tags=[1, 2]),
+        Error(offset=8, description="error", exception=ValueError("bad")),
+        Result(offset=-1, description=""),
+    ]
+
+    compact = ResultList(results[:3])
+    compact += results[3:6]
+    compact.extend(results[6:10])
+    compact.append(results[10])
+    compact.append(results[11])
+
+    eq_(len(compact), len(results))
+    for (a, b) in zip(compact, results):
+        eq_(type(a), type(b))
+        eq_(items(a), items(b))
+
+    eq_([r.offset for r in compact[2:5]], [r.offset for r in results[2:5]])
+    eq_(compact[-1].offset, -1)
+
+    # Descriptions, and the other attributes of results with identical attribute values, are shared
+    eq_(len(compact.strings), 6)
+    eq_(len(compact.prototype_list), 8)
+
+def test_compact():
+    '''
+    Test: Scan the input vectors for signatures and entropy, with and without --compact.
+    Verify that the results are the same.
+    '''
+    input_vector_files = [input_vector(f) for f in ["firmware.squashfs", "foobar.lzma", "hello-world.ihex"]]
+
+    expected = binwalk.scan(*input_vector_files, signature=True, entropy=True, nplot=True, quiet=True)
+    results = binwalk.scan(*input_vector_files, signature=True, entropy=True, nplot=True, compact=True, quiet=True)
+    compare(results, expected)
+
+def test_compact_end():
+    '''
+    Test: Create a file containing an ISO 9660 primary volume descriptor, whose signature
+    ends the scan of the file, followed by an LZMA file. Scan it for signatures with and
+    without --compact.
+    Verify that the results are the same, and that the ISO 9660 result jumps to the end
+    of the file.
+    '''
+    descriptor = bytearray(2048)
+    descriptor[0:7] = b'\x01CD001\x01'
+    descriptor[8:13] = b'LINUX'
+    descriptor[40:47] = b'BINWALK'
+
+    rand = random.Random(0)
+    data = random_bytes(rand, 1000) + b'\x00' * 32768 + bytes(descriptor) + read_input_vector("foobar.lzma")
+
+    with temp_file(data, "iso.bin") as input_vector_file:
+        expected = binwalk.scan(input_vector_file, signature=True, quiet=True)
+        results = binwalk.scan(input_vector_file, signature=True, compact=True, quiet=True)
+        compare(results, expected)
+
+        eq_(len(results[0].results), 1)
+        r = results[0].results[0]
+        ok_(r.description.startswith("ISO 9660 Primary Volume"))
+        eq_(r.offset, 1000)
+        eq_(r.offset + r.jump, len(data))
+
+def compare(results, expected):
+    for (a, b) in zip(results, expected):
+        ok_(isinstance(a.results, ResultList))
+        ok_(len(b.results) > 0)
+        eq_(len(a.results), len(b.results))
+        for (ra, rb) in zip(a.results, b.results):
+            eq_([item for item in items(ra) if item[0] != 'file'],
+                [item for item in items(rb) if item[0] != 'file'])
+            eq_(ra.file.path, rb.file.path)
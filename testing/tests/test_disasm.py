@@ -0,0 +1,44 @@
+import random
+import struct
+import binwalk
+from nose.tools import eq_, ok_
+from nose.plugins.skip import SkipTest
+from helpers import random_bytes, temp_file
+
+def arm_code(rand, count):
+    '''
+    Generates little endian ARM data processing instructions.
+    '''
+    words = []
+    for i in range(count):
+        # Opcodes 8-11 without the S bit are not data processing instructions
+        opcode = rand.choice([0, 1, 2, 3, 4, 5, 6, 7, 12, 13, 14, 15])
+        words.append(0xE0000000 | (opcode << 21) | (rand.randint(0, 1) << 20) |
+                     (rand.randint(0, 14) << 16) | (rand.randint(0, 14) << 12) |
+                     (rand.randint(0, 31) << 7) | (rand.randint(0, 3) << 5) | rand.randint(0, 14))
+    return struct.pack('<%dI' % count, *words)
+
+def test_disasm():
+    '''
+    Test: Create a file that starts with ARM code, and scan it for code starting at
+    aligned and unaligned offsets.
+    Verify that the code is found at the first aligned offset.
+    '''
+    try:
+        import capstone
+    except ImportError:
+        raise SkipTest("capstone is not installed")
+
+    rand = random.Random(0)
+    data = arm_code(rand, 2000) + random_bytes(rand, 10000)
+
+    with temp_file(data, "arm.bin") as input_vector_file:
+        for (offset, expected_offset) in [(0, 0), (1, 4), (3, 4), (4, 4)]:
+            scan_result = binwalk.scan(input_vector_file,
+                                       disasm=True,
+                                       offset=offset,
+                                       quiet=True)
+
+            eq_(len(scan_result[0].results), 1)
+            eq_(scan_result[0].results[0].offset, expected_offset)
+            ok_(scan_result[0].results[0].description.endswith("at least 1250 valid instructions"))
@@ -0,0 +1,41 @@
+import os
+import random
+import binwalk
+import binwalk.core.entropyindex
+from nose.tools import eq_, ok_
+from nose.plugins.skip import SkipTest
+from helpers import input_vector, temp_file, user_dir
+
+def entropies(input_vector_file, **kwargs):
+    scan_result = binwalk.scan(input_vector_file, entropy=True, nplot=True, quiet=True, **kwargs)
+    return [(r.offset, r.entropy) for r in scan_result[0].results]
+
+def test_entropy_index():
+    '''
+    Test: Calculate the entropy of the input vectors and of a file whose size isn't a
+    multiple of the index's leaf size, with and without an entropy index (-E --index),
+    for several block sizes.
+    Verify that the results are the same, and that an index was used.
+    '''
+    if binwalk.core.entropyindex.np is None:
+        raise SkipTest("NumPy is not installed")
+
+    rand = random.Random(0)
+    data = bytearray()
+    for alphabet in [4, 256, 16, 1, 256]:
+        data += bytearray(rand.randint(0, alphabet - 1) for i in range(rand.randint(20000, 80000)))
+
+    with user_dir() as config_dir, temp_file(bytes(data), "entropy.bin") as entropy_file:
+        ok_(len(data) % binwalk.core.entropyindex.EntropyIndex.LEAF_SIZE)
+
+        for input_vector_file in [entropy_file, input_vector("firmware.squashfs")]:
+            for block in [4096, 12288, 65536, 1000]:
+                expected = entropies(input_vector_file, block=block)
+                results = entropies(input_vector_file, block=block, index=True)
+                ok_(expected)
+                eq_([offset for (offset, entropy) in results], [offset for (offset, entropy) in expected])
+                ok_(max([abs(a[1] - b[1]) for (a, b) in zip(results, expected)]) < 1e-9)
+
+        # An index was built for each file
+        cache = os.path.join(config_dir, "cache")
+        eq_(len([f for (path, dirs, files) in os.walk(cache) for f in files if f.startswith("level0")]), 2)
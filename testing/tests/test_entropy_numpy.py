@@ -0,0 +1,57 @@
+import random
+import binwalk
+import binwalk.modules.entropy
+from nose.tools import eq_, ok_
+from nose.plugins.skip import SkipTest
+from helpers import input_vector, without_numpy
+
+def scan(input_vector_file, numpy, **kwargs):
+    if numpy:
+        return binwalk.scan(input_vector_file, entropy=True, nplot=True, quiet=True, **kwargs)
+    with without_numpy(binwalk.modules.entropy):
+        return binwalk.scan(input_vector_file, entropy=True, nplot=True, quiet=True, **kwargs)
+
+def test_entropy_numpy_blocks():
+    '''
+    Test: Calculate the entropy of each piece of data blocks with NumPy, for several
+    piece sizes, including data blocks whose length isn't a multiple of the piece size
+    and data blocks with trailing peek data, in batches of several sizes.
+    Verify that the entropies are the same as those calculated without NumPy.
+    '''
+    if binwalk.modules.entropy.np is None:
+        raise SkipTest("NumPy is not installed")
+
+    input_vector_file = input_vector("foobar.lzma")
+    module = scan(input_vector_file, numpy=True)[0]
+
+    rand = random.Random(0)
+    data = bytes(bytearray(rand.randint(0, rand.choice([1, 16, 255])) for i in range(20000)))
+
+    for block_size in [7, 256, 1024, 4096, 100000]:
+        for (dlen, peek) in [(len(data), 0), (len(data) - 1000, 1000), (10001, 500)]:
+            block = data[:dlen + peek]
+            expected = [module.shannon(block[i:i + block_size]) for i in range(0, dlen, block_size)]
+
+            for batch in [binwalk.modules.entropy.Entropy.NUMPY_BATCH_SIZE, block_size * 3, 1]:
+                module.NUMPY_BATCH_SIZE = batch
+                entropies = module.shannon_numpy_blocks(block, dlen, block_size)
+                eq_(len(entropies), len(expected))
+                ok_(max([abs(a - b) for (a, b) in zip(entropies, expected)]) < 1e-9)
+
+def test_entropy_numpy():
+    '''
+    Test: Calculate the entropy of the input vectors with and without NumPy (-E).
+    Verify that the results are the same.
+    '''
+    if binwalk.modules.entropy.np is None:
+        raise SkipTest("NumPy is not installed")
+
+    for (name, kwargs) in [("firmware.squashfs", {'block': 100000}),
+                           ("foobar.lzma", {}),
+                           ("hello-world.ihex", {'block': 1000})]:
+        input_vector_file = input_vector(name)
+        expected = [(r.offset, r.entropy) for r in scan(input_vector_file, numpy=False, **kwargs)[0].results]
+        results = [(r.offset, r.entropy) for r in scan(input_vector_file, numpy=True, **kwargs)[0].results]
+        ok_(expected)
+        eq_([offset for (offset, entropy) in results], [offset for (offset, entropy) in expected])
+        ok_(max([abs(a[1] - b[1]) for (a, b) in zip(results, expected)]) < 1e-9)
@@ -0,0 +1,69 @@
+import math
+import random
+import collections
+import binwalk
+import binwalk.modules.entropy
+from nose.tools import eq_, ok_
+from helpers import temp_file, without_numpy
+
+def entropy(data):
+    counts = collections.Counter(bytearray(data))
+    return -sum([(float(c) / len(data)) * math.log(float(c) / len(data), 2) for c in counts.values()]) / 8
+
+def sample_data():
+    # Sections of low, medium and high entropy data
+    rand = random.Random(0)
+    data = bytearray()
+    for alphabet in [4, 256, 16, 1, 256]:
+        data += bytearray(rand.randint(0, alphabet - 1) for i in range(rand.randint(2000, 8000)))
+    return bytes(data)
+
+def rolling(window, step, pieces):
+    r = binwalk.modules.entropy.RollingEntropy(window, step)
+    entropies = []
+    for piece in pieces:
+        (offset, values) = r.update(piece)
+        eq_(offset, len(entropies) * step)
+        entropies += values
+    return entropies
+
+def test_rolling_entropy():
+    '''
+    Test: Calculate the entropy of windows sliding over data, supplied in pieces of
+    various sizes, with several window and step sizes, with and without NumPy.
+    Verify that the entropy of each window is the same as the entropy calculated from
+    the window's data.
+    '''
+    data = sample_data()
+    rand = random.Random(1)
+
+    pieces = []
+    i = 0
+    while i < len(data):
+        size = rand.choice([1, 100, 1000, 4096, 10000])
+        pieces.append(data[i:i + size])
+        i += size
+
+    for (window, step) in [(1024, 256), (1024, 1000), (4096, 7), (256, 1), (512, 512 - 1)]:
+        expected = [entropy(data[i:i + window]) for i in range(0, len(data) - window + 1, step)]
+        with without_numpy(binwalk.modules.entropy):
+            results = [rolling(window, step, pieces)]
+        results.append(rolling(window, step, pieces))
+        for entropies in results:
+            eq_(len(entropies), len(expected))
+            ok_(max([abs(a - b) for (a, b) in zip(entropies, expected)]) < 1e-9)
+
+def test_entropy_step():
+    '''
+    Test: Calculate the entropy of a file with a sliding window (-E --step).
+    Verify that each result is the entropy of the window at its offset.
+    '''
+    data = sample_data()
+
+    with temp_file(data, "entropy.bin") as input_vector_file:
+        scan_result = binwalk.scan(input_vector_file, entropy=True, nplot=True, block=2048, step=300, quiet=True)
+        results = scan_result[0].results
+
+        eq_([r.offset for r in results], list(range(0, len(data) - 2048 + 1, 300)))
+        for r in results:
+            ok_(abs(r.entropy - entropy(data[r.offset:r.offset + 2048])) < 1e-9)
@@ -0,0 +1,71 @@
+import os
+import lzma
+import random
+import binwalk
+import binwalk.core.bytestats
+import binwalk.modules.extractor
+from nose.tools import eq_, ok_
+from helpers import read_input_vector, random_bytes, random_words, random_text, temp_file
+
+def test_extract_encrypted():
+    '''
+    Test: Create a raw LZMA file, scan it for signatures and extract it with --nencrypted.
+    Verify that the LZMA data looks encrypted, but is still extracted.
+    '''
+    rand = random.Random(0)
+    data = lzma.compress(random_text(rand, random_words(rand, 5000), 400000), format=lzma.FORMAT_ALONE)
+
+    # LZMA's range coded output is statistically indistinguishable from encrypted data
+    eq_(binwalk.core.bytestats.analyze(data[:1024 * 1024]).classification, binwalk.core.bytestats.ENCRYPTED)
+
+    with temp_file(data, "text.lzma") as input_vector_file:
+        scan_result = binwalk.scan(input_vector_file,
+                                   signature=True,
+                                   extract=True,
+                                   nencrypted=True,
+                                   directory=os.path.dirname(input_vector_file),
+                                   quiet=True)
+
+        eq_(len(scan_result[0].results), 1)
+        ok_(scan_result[0].results[0].description.startswith("LZMA compressed data"))
+
+        # The LZMA data should have been carved out of the input file
+        output = scan_result[0].extractor.output[input_vector_file]
+        ok_(os.path.isfile(output.carved[0]))
+
+        # Results for compressed formats are not checked
+        eq_(scan_result[0].extractor.classifications, {})
+
+def test_extract_encrypted_squashfs():
+    '''
+    Test: Create a file containing random data, with the header of a squashfs image
+    embedded in it, scan it for signatures and extract it with and without --nencrypted.
+    Verify that the squashfs image is only carved out without --nencrypted, and that
+    only the blocks of data after the squashfs header are classified.
+    '''
+    extractor = binwalk.modules.extractor.Extractor
+    rand = random.Random(0)
+    squashfs = read_input_vector("firmware.squashfs")
+    offset = 100000
+    data = random_bytes(rand, offset) + squashfs[:4096] + os.urandom(len(squashfs))
+
+    ok_(not extractor.COMPRESSED_DESCRIPTION.search("Squashfs filesystem, little endian, version 4.0, compression:lzma"))
+
+    with temp_file(data, "encrypted.bin") as input_vector_file:
+        for nencrypted in [False, True]:
+            scan_result = binwalk.scan(input_vector_file,
+                                       signature=True,
+                                       extract=True,
+                                       nencrypted=nencrypted,
+                                       directory=os.path.dirname(input_vector_file),
+                                       quiet=True)
+
+            squashfs_results = [r for r in scan_result[0].results if r.description.startswith("Squashfs")]
+            eq_([r.offset for r in squashfs_results], [offset])
+
+            output = scan_result[0].extractor.output.get(input_vector_file)
+            eq_(output is not None and offset in output.carved, not nencrypted)
+
+        classifications = scan_result[0].extractor.classifications[input_vector_file]
+        first = offset // extractor.ENCRYPTED_BLOCK_SIZE
+        eq_(sorted(classifications.keys()), list(range(first, first + extractor.ENCRYPTED_SAMPLE_SIZE // extractor.ENCRYPTED_BLOCK_SIZE + 1)))
@@ -0,0 +1,29 @@
+
+import os
+import binwalk
+from nose.tools import eq_, ok_
+
+def test_iscan():
+    '''
+    Test: Open foobar.lzma, scan for signatures with binwalk.iscan.
+    Verify that the same results are yielded as reported by binwalk.scan.
+    '''
+    input_vector_file = os.path.join(os.path.dirname(__file__),
+                                     "input-vectors",
+                                     "foobar.lzma")
+
+    scan_result = binwalk.scan(input_vector_file,
+                               signature=True,
+                               quiet=True)
+
+    iscan_result = list(binwalk.iscan(input_vector_file,
+                                      signature=True,
+                                      quiet=True,
+                                      discard=True))
+
+    # There should be only one result
+    eq_(len(iscan_result), 1)
+
+    # That result should be identical to the binwalk.scan result
+    ok_(iscan_result[0].offset == scan_result[0].results[0].offset)
+    ok_(iscan_result[0].description == scan_result[0].results[0].description)
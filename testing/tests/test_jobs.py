@@ -0,0 +1,19 @@
+import os
+import binwalk
+from nose.tools import eq_, ok_
+from helpers import input_vector
+
+def results(scan_result):
+    return [(os.path.basename(r.file.path), r.offset, r.description) for r in scan_result[0].results]
+
+def test_jobs():
+    '''
+    Test: Scan the input vectors for signatures with two worker processes (--jobs).
+    Verify that the results are the same as those of a sequential scan, in the same order.
+    '''
+    input_vector_files = [input_vector(name) for name in ["foobar.lzma", "firmware.squashfs"]]
+
+    expected = results(binwalk.scan(*input_vector_files, signature=True, quiet=True))
+    eq_([name for (name, offset, description) in expected], ["foobar.lzma", "firmware.squashfs"])
+
+    eq_(results(binwalk.scan(*input_vector_files, signature=True, jobs=2, quiet=True)), expected)
@@ -0,0 +1,57 @@
+import os
+import random
+import binwalk.core.magic
+import binwalk.core.compat
+import binwalk.core.settings
+from nose.tools import eq_, ok_
+from helpers import INPUT_VECTORS, read_input_vector, random_bytes
+
+def analyze(function, *args):
+    try:
+        return function(*args)
+    except Exception as e:
+        return type(e)
+
+def random_data(rand, size):
+    return binwalk.core.compat.bytes2str(random_bytes(rand, size))
+
+def test_magic_compiler():
+    '''
+    Test: Load the bundled magic signatures, and analyze every candidate offset in each
+    input vector, and in data containing the magic bytes of every signature, with both
+    the compiled signature analyzers and the reference interpreter.
+    Verify that both give the same results.
+    '''
+    magic = binwalk.core.magic.Magic(invalid=True)
+    for magic_file in binwalk.core.settings.Settings().system.magic:
+        magic.load(magic_file)
+
+    prefilter = binwalk.core.magic.Prefilter(magic.signatures)
+    vectors = []
+    analyzed = 0
+
+    for name in sorted(os.listdir(INPUT_VECTORS)):
+        vectors.append((name, binwalk.core.compat.bytes2str(read_input_vector(name))))
+
+    # The magic bytes of each signature, surrounded by random data
+    rand = random.Random(0)
+    magic_bytes = [random_data(rand, 256) + signature.literal + random_data(rand, 256)
+                   for signature in magic.signatures if signature.literal]
+    vectors.append(("magic bytes", ''.join(magic_bytes)))
+
+    for (name, data) in vectors:
+        bdata = binwalk.core.compat.str2bytes(data)
+
+        magic.data = data
+        for (signature, offsets) in zip(magic.signatures, prefilter.candidates(data, len(data))):
+            if not offsets:
+                continue
+
+            analyzer = binwalk.core.magic.SignatureCompiler(magic, signature).compile()
+            for offset in offsets:
+                compiled = analyze(analyzer, data, bdata, offset)
+                interpreted = analyze(magic._analyze, signature, offset)
+                eq_(compiled, interpreted, "%s @%d: %s" % (name, offset, signature.title))
+                analyzed += 1
+
+    ok_(analyzed > 0)
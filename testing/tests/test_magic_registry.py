@@ -0,0 +1,36 @@
+import binwalk.core.magic
+from nose.tools import eq_, ok_
+
+RAW = ["0 string BINWALK Binwalk test signature"]
+
+def test_magic_registry():
+    '''
+    Test: Acquire and release Magic instances for more signature configurations, and
+    more concurrent users of one configuration, than the registry keeps idle instances for.
+    Verify that released instances are handed out again, and that only the idle instances
+    of the most recently released configurations are kept.
+    '''
+    registry = binwalk.core.magic.MagicRegistry()
+
+    magic = registry.acquire(raw=RAW)
+    registry.release(magic)
+    ok_(registry.acquire(raw=RAW) is magic)
+    registry.release(magic)
+
+    # Concurrent users of one configuration
+    users = [registry.acquire(raw=RAW) for i in range(registry.MAX_IDLE + 2)]
+    eq_(len(set([id(m) for m in users])), len(users))
+    for m in users:
+        registry.release(m)
+    eq_(registry.idle[magic.registry_key], users[-registry.MAX_IDLE:])
+
+    # Configurations with different include filters
+    for i in range(registry.MAX_CONFIGURATIONS * 2):
+        registry.release(registry.acquire(raw=RAW, include=["binwalk %d" % i]))
+        ok_(len(registry.idle) <= registry.MAX_CONFIGURATIONS)
+    ok_(magic.registry_key not in registry.idle)
+
+    last = registry.acquire(raw=RAW, include=["binwalk %d" % (registry.MAX_CONFIGURATIONS * 2 - 1)])
+    ok_(last.registry_key not in registry.idle)
+    registry.release(last)
+    eq_(list(registry.idle.keys())[-1], last.registry_key)
@@ -0,0 +1,53 @@
+import io
+import os
+import binwalk
+import binwalk.core.common
+from nose.tools import eq_, ok_
+from helpers import INPUT_VECTORS, input_vector, temp_file
+
+def read_blocks(fname, subclass, **kwargs):
+    blocks = []
+    fp = binwalk.core.common.BlockFile(fname, subclass=subclass, **kwargs)
+    try:
+        while True:
+            (data, dlen) = fp.read_block()
+            blocks.append((data, dlen, fp.tell(), fp.total_read))
+            if dlen < 1:
+                break
+        # Blocks must be the same after seeking back into the file, too
+        fp.seek(fp.offset + 1000)
+        blocks.append(fp.read_block() + (fp.tell(), fp.total_read))
+    finally:
+        fp.close()
+    return blocks
+
+def test_mmap_blocks():
+    '''
+    Test: Read a file in blocks via memory mapped I/O, with various offsets, lengths,
+    and block and peek sizes.
+    Verify that the blocks, file positions and read counts are the same as when reading
+    the file via normal file I/O.
+    '''
+    with temp_file(os.urandom(300000)) as input_vector_file:
+        for kwargs in [{},
+                       {'offset': 12345},
+                       {'offset': 12345, 'length': 100000},
+                       {'offset': -5000},
+                       {'block': 65536, 'peek': 1024},
+                       {'block': 65536, 'peek': 1024, 'length': 70000},
+                       {'native': True}]:
+            expected = read_blocks(input_vector_file, io.FileIO, **kwargs)
+            eq_(read_blocks(input_vector_file, binwalk.core.common.MMapFile, **kwargs), expected, kwargs)
+
+def test_mmap_scan():
+    '''
+    Test: Scan each input vector for signatures via memory mapped I/O.
+    Verify that the results are the same as those of a normal scan.
+    '''
+    for name in sorted(os.listdir(INPUT_VECTORS)):
+        input_vector_file = input_vector(name)
+
+        expected = binwalk.scan(input_vector_file, signature=True, quiet=True)[0].results
+        results = binwalk.scan(input_vector_file, signature=True, mmap=True, quiet=True)[0].results
+
+        eq_([(r.offset, r.description) for r in results], [(r.offset, r.description) for r in expected])
@@ -0,0 +1,61 @@
+import os
+import sys
+import binwalk
+from nose.tools import eq_, ok_
+from nose.plugins.skip import SkipTest
+from helpers import INPUT_VECTORS, input_vector, user_dir
+
+PLUGIN = '''
+import binwalk.core.plugin
+
+class %sPlugin(binwalk.core.plugin.Plugin):
+    MODULES = ['Signature']
+    NATIVE = %s
+
+    def scan(self, result):
+        # Record the type of the data read from result files by each plugin
+        if not hasattr(self.module, 'data_types'):
+            self.module.data_types = {}
+        self.module.data_types.setdefault(self.NATIVE, set()).add(type(result.file.peek(4)))
+'''
+
+def test_native_scan():
+    '''
+    Test: Scan each input vector for signatures as bytes (--native), with and without
+    memory mapped I/O.
+    Verify that the results are the same as those of a normal scan.
+    '''
+    if sys.version_info[0] < 3:
+        raise SkipTest("--native requires Python 3")
+
+    for name in sorted(os.listdir(INPUT_VECTORS)):
+        input_vector_file = input_vector(name)
+        expected = binwalk.scan(input_vector_file, signature=True, quiet=True)[0].results
+
+        for kwargs in [{}, {'mmap': True}]:
+            results = binwalk.scan(input_vector_file, signature=True, native=True, quiet=True, **kwargs)[0].results
+            eq_([(r.offset, r.description) for r in results], [(r.offset, r.description) for r in expected])
+
+def test_native_plugins():
+    '''
+    Test: Scan an input vector as bytes (--native), with a plugin that supports bytes
+    data and a plugin that doesn't.
+    Verify that the files passed to each plugin return the data types they expect.
+    '''
+    if sys.version_info[0] < 3:
+        raise SkipTest("--native requires Python 3")
+
+    input_vector_file = input_vector("foobar.lzma")
+
+    with user_dir() as config_dir:
+        plugins = os.path.join(config_dir, "plugins")
+        os.makedirs(plugins)
+        with open(os.path.join(plugins, "native_test_plugin.py"), "w") as fp:
+            fp.write(PLUGIN % ("Native", True))
+        with open(os.path.join(plugins, "legacy_test_plugin.py"), "w") as fp:
+            fp.write(PLUGIN % ("Legacy", False))
+
+        scan_result = binwalk.scan(input_vector_file, signature=True, native=True, quiet=True)
+        eq_(len(scan_result[0].results), 1)
+
+        eq_(scan_result[0].data_types, {True: set([bytes]), False: set([str])})
@@ -0,0 +1,96 @@
+import os
+import random
+import binwalk
+import binwalk.core.plot
+import xml.etree.ElementTree as ElementTree
+from nose.tools import eq_, ok_
+from helpers import input_vector, temp_dir, working_dir
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+def test_decimator():
+    '''
+    Test: Decimate random points, added out of order, to a small number of pixel columns.
+    Verify that the first, last, minimum and maximum points of each column are kept, and
+    nothing else.
+    '''
+    rand = random.Random(0)
+    points = [(rand.randint(1000, 100000), rand.random()) for i in range(20000)]
+
+    decimator = binwalk.core.plot.Decimator(1000, 100000, 50)
+    for (x, y) in points:
+        decimator.add(x, y)
+    eq_(decimator.count, len(points))
+
+    (x, y) = decimator.points()
+    eq_(x, sorted(x))
+
+    columns = {}
+    for point in points:
+        columns.setdefault(decimator.column(point[0]), []).append(point)
+    eq_(len(columns), 50)
+
+    kept = list(zip(x, y))
+    for (col, column) in columns.items():
+        decimated = [p for p in kept if decimator.column(p[0]) == col]
+        ok_(len(decimated) <= 4)
+        eq_(min([p[0] for p in decimated]), min([p[0] for p in column]))
+        eq_(max([p[0] for p in decimated]), max([p[0] for p in column]))
+        eq_(min([p[1] for p in decimated]), min([p[1] for p in column]))
+        eq_(max([p[1] for p in decimated]), max([p[1] for p in column]))
+        ok_(set(decimated) <= set(column))
+
+def test_write_svg():
+    '''
+    Test: Write a plot with markers, and a title and descriptions that contain XML
+    special characters, to an SVG file.
+    Verify that the SVG file is well-formed, and contains the plotted points, the
+    markers and the escaped text.
+    '''
+    x = list(range(0, 1000, 10))
+    y = [(i % 7) / 7.0 for i in range(len(x))]
+    markers = [('<LZMA> & "gzip"', 'green', [100, 500]), ('Squashfs', 'red', [900, 2000])]
+
+    with temp_dir() as path:
+        fname = os.path.join(path, "plot.svg")
+        binwalk.core.plot.write_svg(fname, x, y, markers=markers, title='a < b & c', xlabel='Offset', ylabel='Entropy')
+
+        root = ElementTree.parse(fname).getroot()
+        eq_(root.tag, SVG + "svg")
+
+        polylines = root.findall(SVG + "polyline")
+        eq_(len(polylines), 1)
+        eq_(len(polylines[0].get("points").split()), len(x))
+
+        # Markers outside of the plotted x values are not drawn
+        paths = root.findall(SVG + "path")
+        eq_([p.get("stroke") for p in paths], ['green', 'red'])
+        eq_(paths[0].get("d").count("M"), 2)
+        eq_(paths[1].get("d").count("M"), 1)
+
+        texts = [t.text for t in root.findall(SVG + "text")]
+        for text in ['a < b & c', 'Offset', 'Entropy', '<LZMA> & "gzip"', 'Squashfs']:
+            ok_(text in texts)
+
+def test_entropy_svg():
+    '''
+    Test: Scan firmware.squashfs for signatures, and save its entropy plot as an SVG (-B -E --svg).
+    Verify that the SVG file is well-formed, with one decimated plot line and a marker
+    for the signature results.
+    '''
+    input_vector_file = input_vector("firmware.squashfs")
+
+    # The plot is saved to the working directory
+    with temp_dir() as path, working_dir(path):
+        scan_result = binwalk.scan(input_vector_file, signature=True, entropy=True, svg=True, block=256, quiet=True)
+        entropy = scan_result[1]
+        eq_(entropy.output_file, os.path.join(path, "firmware.squashfs.svg"))
+
+        root = ElementTree.parse(entropy.output_file).getroot()
+        polylines = root.findall(SVG + "polyline")
+        eq_(len(polylines), 1)
+        points = len(polylines[0].get("points").split())
+        ok_(0 < points <= 4 * entropy.FILE_WIDTH < len(entropy.results))
+
+        ok_(root.findall(SVG + "path"))
+        ok_([t.text for t in root.findall(SVG + "text") if t.text.startswith("Squashfs")])
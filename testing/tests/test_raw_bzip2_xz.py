@@ -0,0 +1,79 @@
+import bz2
+import lzma
+import random
+import binascii
+import binwalk
+from nose.tools import eq_, ok_
+from helpers import random_bytes, random_words, random_text, temp_file
+
+def scan(data, **kwargs):
+    with temp_file(data, "raw.bin") as input_vector_file:
+        return binwalk.scan(input_vector_file, quiet=True, **kwargs)
+
+def test_raw_bzip2():
+    '''
+    Test: Create a bzip2 stream with several blocks, and embed its data without the
+    stream header in random data, followed by its data from the second block, which
+    does not start at a byte boundary. Scan it for raw bzip2 blocks (--bzip2).
+    Verify that both are found at their offsets, the second with its bit offset, and
+    with the compressed sizes of the data up to the end of the stream.
+    '''
+    rand = random.Random(0)
+    plaintext = random_text(rand, random_words(rand), 60000)
+    stream = bz2.compress(plaintext, 1)
+
+    # Find the magic number of the second block, after the stream header and the first block magic
+    bits = bin(int(binascii.hexlify(stream), 16))[2:].zfill(len(stream) * 8)
+    position = bits.find(bin(0x314159265359)[2:].zfill(48), 80)
+    ok_(position > 0)
+    (second, shift) = divmod(position, 8)
+    ok_(shift != 0)
+
+    data = random_bytes(rand, 1000)
+    first_offset = len(data)
+    data += stream[4:] + random_bytes(rand, 2000)
+    second_offset = len(data)
+    data += stream[second:] + random_bytes(rand, 1000)
+
+    results = dict([(r.offset, r) for r in scan(data, bzip2=True)[0].results])
+
+    r = results[first_offset]
+    eq_(r.size, len(stream) - 4)
+    eq_(r.decompressed_size, len(plaintext))
+    eq_(r.description, "Raw bzip2 compression block, compressed size: %d, decompressed size: %d" % (len(stream) - 4, len(plaintext)))
+
+    r = results[second_offset]
+    eq_(r.size, len(stream) - second)
+    ok_(0 < r.decompressed_size < len(plaintext))
+    ok_(r.description.startswith("Raw bzip2 compression block, bit offset: %d, " % shift))
+
+def test_raw_xz():
+    '''
+    Test: Create xz streams with each integrity check type, and embed their data without
+    the stream header in random data. Scan it for raw xz blocks (--xz).
+    Verify that each is found at its offset, with its compressed and decompressed sizes,
+    and that the check type of each is detected.
+    '''
+    rand = random.Random(0)
+    words = random_words(rand)
+
+    data = b''
+    expected = []
+    for check in [lzma.CHECK_CRC64, lzma.CHECK_CRC32, lzma.CHECK_NONE, lzma.CHECK_SHA256]:
+        plaintext = random_text(rand, words, rand.randint(1000, 20000))
+        raw = lzma.compress(plaintext, format=lzma.FORMAT_XZ, check=check)[12:]
+        data += random_bytes(rand, rand.randint(1000, 5000))
+        expected.append((len(data), len(raw), len(plaintext), raw, check))
+        data += raw
+    data += random_bytes(rand, 1000)
+
+    scan_result = scan(data, xz=True)
+    results = dict([(r.offset, r) for r in scan_result[0].results])
+    decompressor = scan_result[0].decompressors[0]
+
+    for (offset, size, decompressed_size, raw, check) in expected:
+        r = results[offset]
+        eq_(r.size, size)
+        eq_(r.decompressed_size, decompressed_size)
+        eq_(r.description, "Raw xz compression block, compressed size: %d, decompressed size: %d" % (size, decompressed_size))
+        eq_(decompressor.check_type(raw), check)
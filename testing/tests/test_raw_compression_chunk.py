@@ -0,0 +1,39 @@
+import zlib
+import random
+import binwalk
+from nose.tools import eq_, ok_
+from helpers import random_bytes, random_words, random_text, temp_file
+
+def results(scan_result):
+    return [(r.offset, r.size, r.description) for r in scan_result[0].results]
+
+def test_raw_compression_chunk():
+    '''
+    Test: Create a file containing raw deflate streams at offsets that aren't multiples
+    of the block size, some of which extend across several blocks, and scan it for raw
+    deflate streams in small chunks with two worker processes (-X, --jobs, --chunk).
+    Verify that the results are the same as those of a sequential scan, including the
+    results after each stream that the scan resumes past.
+    '''
+    rand = random.Random(0)
+    words = random_words(rand)
+
+    data = b''
+    offsets = []
+    for length in [1000, 40000, 5000, 90000]:
+        data += random_bytes(rand, rand.randint(3000, 20000))
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+        stream = compressor.compress(random_text(rand, words, length)) + compressor.flush()
+        offsets.append((len(data), len(stream)))
+        data += stream
+    data += random_bytes(rand, 10000)
+
+    with temp_file(data, "deflate.bin") as input_vector_file:
+        expected = results(binwalk.scan(input_vector_file, deflate=True, block=16384, quiet=True))
+
+        # All streams are found, with their sizes, and the scan resumes past each of them
+        for (offset, size) in offsets:
+            ok_((offset, size) in [(o, s) for (o, s, description) in expected])
+            ok_(not [o for (o, s, description) in expected if offset < o < offset + size])
+
+        eq_(results(binwalk.scan(input_vector_file, deflate=True, block=16384, jobs=2, chunk=32768, quiet=True)), expected)
@@ -0,0 +1,91 @@
+import lzma
+import zlib
+import random
+import binwalk
+from nose.tools import eq_, ok_
+from helpers import random_bytes, random_words, random_text, temp_file
+
+def raw_lzma(data):
+    return lzma.compress(data, format=lzma.FORMAT_RAW, filters=[{'id': lzma.FILTER_LZMA1}])
+
+def raw_deflate(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+def test_raw_compression_size():
+    '''
+    Test: Create a file containing a raw LZMA stream that extends across several data
+    blocks, immediately followed by a raw deflate stream, then random data and a raw
+    LZMA stream that is truncated by the end of the file. Scan it for raw LZMA and
+    deflate streams (-Z, -X).
+    Verify that the complete streams are reported with their compressed and decompressed
+    sizes and end offsets, that the scan resumes at the end of the first stream, and
+    that the truncated stream is reported without a size.
+    '''
+    rand = random.Random(0)
+    words = random_words(rand)
+
+    first_text = random_text(rand, words, 100000)
+    first = raw_lzma(first_text)
+    second_text = random_text(rand, words, 1000)
+    second = raw_deflate(second_text)
+    truncated = raw_lzma(random_text(rand, words, 10000))[:4096]
+
+    data = random_bytes(rand, 3001) + first + second + random_bytes(rand, 5000)
+    truncated_offset = len(data)
+    data += truncated
+
+    with temp_file(data, "streams.bin") as input_vector_file:
+        scan_result = binwalk.scan(input_vector_file, lzma=True, deflate=True, block=16384, quiet=True)
+        results = dict([(r.offset, r) for r in scan_result[0].results])
+
+        # The first stream is longer than the data blocks, and the scan resumes at its end
+        ok_(len(first) > 4 * 16384)
+        r = results[3001]
+        eq_(r.size, len(first))
+        eq_(r.compressed_size, len(first))
+        eq_(r.decompressed_size, len(first_text))
+        eq_(r.end_offset, 3001 + len(first))
+        ok_(r.description.startswith("Raw LZMA compression stream, "))
+        ok_(r.description.endswith(", compressed size: %d, decompressed size: %d" % (len(first), len(first_text))))
+        ok_(not [offset for offset in results if 3001 < offset < r.end_offset])
+
+        r = results[3001 + len(first)]
+        eq_(r.size, len(second))
+        eq_(r.decompressed_size, len(second_text))
+        eq_(r.description, "Raw deflate compression stream, compressed size: %d, decompressed size: %d" % (len(second), len(second_text)))
+
+        r = results[truncated_offset]
+        eq_(r.size, 0)
+        ok_(r.description.startswith("Raw LZMA compression stream, "))
+        ok_("compressed size" not in r.description)
+
+def test_raw_compression_overlap():
+    '''
+    Test: Create a file containing random data that decompresses as a short raw deflate
+    stream, which overlaps a real raw deflate stream following the random data. Scan it
+    for raw deflate streams (-X).
+    Verify that the short stream doesn't hide the real stream, which is reported with
+    its compressed size.
+    '''
+    rand = random.Random(2)
+    words = random_words(rand)
+
+    text = random_text(rand, words, 1000)
+    stream = raw_deflate(text)
+    # Random data that, followed by the real stream, decompresses as a 22 byte stream at offset 1774
+    data = random_bytes(rand, 2000)[:1779] + stream
+
+    with temp_file(data, "overlap.bin") as input_vector_file:
+        scan_result = binwalk.scan(input_vector_file, deflate=True, quiet=True)
+        results = dict([(r.offset, r) for r in scan_result[0].results])
+
+        r = results[1774]
+        eq_(r.size, 22)
+        ok_(r.decompressed_size > r.size)
+
+        r = results[1779]
+        eq_(r.size, len(stream))
+        eq_(r.compressed_size, len(stream))
+        eq_(r.decompressed_size, len(text))
+        ok_(not [offset for offset in results if 1779 < offset < r.end_offset])
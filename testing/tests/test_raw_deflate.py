@@ -0,0 +1,84 @@
+import zlib
+import random
+import binwalk
+import binwalk.modules.compression
+from nose.tools import eq_, ok_
+from nose.plugins.skip import SkipTest
+from helpers import input_vector, random_bytes, random_words, random_text, temp_file, without_numpy
+
+def deflate(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+def results(scan_result):
+    return [(r.offset, r.size, getattr(r, 'decompressed_size', None), r.description) for r in scan_result[0].results]
+
+def scan(input_vector_file, numpy):
+    if numpy:
+        return binwalk.scan(input_vector_file, deflate=True, quiet=True)
+    with without_numpy(binwalk.modules.compression):
+        return binwalk.scan(input_vector_file, deflate=True, quiet=True)
+
+def test_raw_deflate():
+    '''
+    Test: Create a file containing raw deflate streams with fixed and dynamic Huffman
+    blocks embedded in random data, including a stream that decompresses to much more
+    than is decompressed at once, and scan it for raw deflate streams (-X), with and
+    without NumPy.
+    Verify that each stream is found at its offset, with its compressed and decompressed
+    sizes, and that the results with and without NumPy are the same.
+    '''
+    rand = random.Random(0)
+    words = random_words(rand)
+
+    streams = [
+        # Fixed Huffman block
+        (b'binwalk raw deflate', 1),
+        # Dynamic Huffman blocks
+        (random_text(rand, words, 20000), 9),
+        # Many dynamic Huffman blocks, decompressing to about 4 MB
+        (random_text(rand, words, 700000), 6),
+    ]
+
+    data = b''
+    expected = []
+    for (plaintext, level) in streams:
+        data += random_bytes(rand, rand.randint(1000, 5000))
+        stream = deflate(plaintext, level)
+        expected.append((len(data), len(stream), len(plaintext)))
+        data += stream
+    data += random_bytes(rand, 1000)
+
+    with temp_file(data, "deflate.bin") as input_vector_file:
+        python = results(scan(input_vector_file, numpy=False))
+        for (offset, size, decompressed_size) in expected:
+            ok_((offset, size, decompressed_size) in [r[:3] for r in python])
+
+        if binwalk.modules.compression.np is not None:
+            eq_(results(scan(input_vector_file, numpy=True)), python)
+
+def test_raw_deflate_candidates():
+    '''
+    Test: Find the candidate offsets of raw deflate streams in random data, with and
+    without NumPy.
+    Verify that the NumPy checks (including the code length code checks) reject a
+    subset of the offsets that the pure Python checks reject, and none of the offsets
+    that zlib accepts.
+    '''
+    if binwalk.modules.compression.np is None:
+        raise SkipTest("NumPy is not installed")
+
+    input_vector_file = input_vector("foobar.lzma")
+    decompressor = binwalk.scan(input_vector_file, deflate=True, quiet=True)[0].decompressors[0]
+
+    rand = random.Random(0)
+    data = random_bytes(rand, 65536)
+    n = len(data) - decompressor.HEADER_SIZE + 1
+
+    python = decompressor._candidates_python(bytearray(data), n)
+    numpy = decompressor._candidates_numpy(data, n)
+    ok_(set(numpy) < set(python))
+
+    valid = [i for i in python if decompressor.decompress(data[i:i + decompressor.BLOCK_SIZE])]
+    ok_(valid)
+    ok_(set(valid) <= set(numpy))
@@ -0,0 +1,81 @@
+import lzma
+import random
+import binwalk
+import binwalk.modules.compression
+from nose.tools import eq_, ok_
+from helpers import input_vector, random_bytes, random_words, random_text, temp_file, without_numpy
+
+def raw_lzma(data, dict_size, pb=2, lp=0, lc=3):
+    filters = [{'id': lzma.FILTER_LZMA1, 'dict_size': dict_size, 'pb': pb, 'lp': lp, 'lc': lc}]
+    return lzma.compress(data, format=lzma.FORMAT_RAW, filters=filters)
+
+def test_raw_lzma():
+    '''
+    Test: Create a file containing raw LZMA streams embedded in random data: one with
+    uncommon properties, and one with a match, within the data that is decompressed to
+    detect streams, that refers back further than the smallest dictionary size that
+    decompression is attempted with. Scan it for raw LZMA streams (-Z).
+    Verify that each stream is found at its offset, with its properties, and that the
+    second stream only decodes with a larger dictionary size.
+    '''
+    rand = random.Random(0)
+    words = random_words(rand)
+
+    # The second copy of the random data is encoded as a match about 115 KB back
+    repeated = random_bytes(rand, 2048)
+    far_match = repeated + random_text(rand, words, 20000) + repeated + random_text(rand, words, 2000)
+    ok_(len(far_match) > 2 * binwalk.modules.compression.LZMA.MIN_DICTIONARY_SIZE)
+
+    streams = [
+        (raw_lzma(random_text(rand, words, 5000), 2 ** 16, pb=1, lp=1, lc=2),
+         "properties: 0x38 [pb: 1, lp: 1, lc: 2]"),
+        (raw_lzma(far_match, 2 ** 20),
+         "properties: 0x5D [pb: 2, lp: 0, lc: 3]"),
+    ]
+
+    data = b''
+    expected = []
+    for (stream, properties) in streams:
+        data += random_bytes(rand, rand.randint(1000, 5000))
+        expected.append((len(data), "Raw LZMA compression stream, " + properties))
+        data += stream
+    data += random_bytes(rand, 1000)
+
+    with temp_file(data, "lzma.bin") as input_vector_file:
+        scan_result = binwalk.scan(input_vector_file, lzma=True, quiet=True)
+        for (offset, description) in expected:
+            ok_([r for r in scan_result[0].results if r.offset == offset and r.description.startswith(description)])
+
+        # The dictionary size that a stream decodes with is not its actual dictionary size
+        ok_(not [r for r in scan_result[0].results if "dictionary" in r.description])
+
+        decompressor = scan_result[0].decompressors[0]
+        stream = streams[1][0][:decompressor.BLOCK_SIZE]
+        ok_(decompressor._decode(stream, 0x5D, decompressor.MIN_DICTIONARY_SIZE))
+        eq_(decompressor._decode(stream, 0x5D, decompressor.DICTIONARY_SIZE), None)
+
+def test_raw_lzma_candidates():
+    '''
+    Test: Find the candidate offsets of raw LZMA streams in random data with many 0
+    bytes, with and without NumPy.
+    Verify that the candidates are the same with and without NumPy, and include every
+    offset whose first bytes liblzma accepts, other than those that start runs of 0 bytes.
+    '''
+    input_vector_file = input_vector("foobar.lzma")
+    decompressor = binwalk.scan(input_vector_file, lzma=True, quiet=True)[0].decompressors[0]
+
+    rand = random.Random(0)
+    data = bytes(bytearray(rand.choice([0, rand.randint(0, 255)]) for i in range(16384)))
+    dlen = len(data) - 100
+
+    candidates = decompressor.candidates(data, dlen)
+    with without_numpy(binwalk.modules.compression):
+        eq_(decompressor.candidates(data, dlen), candidates)
+
+    # Runs of 0 bytes are deliberately rejected, although liblzma accepts them
+    offsets = [i for i in range(0, dlen) if data[i + 1:i + 5] != b'\x00' * 4]
+
+    for prop in decompressor.COMMON_PROPERTIES:
+        valid = [i for i in offsets if decompressor._decode(data[i:i + 16], prop, decompressor.MIN_DICTIONARY_SIZE) is None]
+        ok_(valid)
+        ok_(set(valid) <= set(candidates))
@@ -0,0 +1,102 @@
+import os
+import shutil
+import binwalk
+import binwalk.core.resultcache
+from nose.tools import eq_, ok_
+from helpers import input_vector, temp_dir, user_dir
+
+def results(scan_result):
+    return [(os.path.basename(r.file.path), r.offset, r.description) for r in scan_result[0].results]
+
+def cached_scan(*files, **kwargs):
+    '''
+    Scans files for signatures with --cache, recording the result of each cache lookup.
+
+    Returns a tuple of (results, list of True/False for each cache hit/miss).
+    '''
+    lookups = []
+    get = binwalk.core.resultcache.ResultCache.get
+
+    def recording_get(self, key):
+        data = get(self, key)
+        lookups.append(data is not None)
+        return data
+
+    binwalk.core.resultcache.ResultCache.get = recording_get
+    try:
+        return (results(binwalk.scan(*files, signature=True, cache=True, quiet=True, **kwargs)), lookups)
+    finally:
+        binwalk.core.resultcache.ResultCache.get = get
+
+def test_result_cache():
+    '''
+    Test: Scan the input vectors for signatures twice with --cache, then scan a
+    modified copy of a vector, scan with different options (--dumb), and scan twice
+    with a --cachesize too small for any entry.
+    Verify that the second scan is replayed from the cache with identical results,
+    and that the modified file, different options and oversized entries are not.
+    '''
+    with user_dir(), temp_dir() as path:
+        input_vector_files = [os.path.join(path, f) for f in ["firmware.squashfs", "foobar.lzma"]]
+        for f in input_vector_files:
+            shutil.copy(input_vector(os.path.basename(f)), f)
+
+        expected = results(binwalk.scan(*input_vector_files, signature=True, quiet=True))
+        ok_(expected)
+
+        (first, lookups) = cached_scan(*input_vector_files)
+        eq_(first, expected)
+        eq_(lookups, [False, False])
+
+        (second, lookups) = cached_scan(*input_vector_files)
+        eq_(second, expected)
+        eq_(lookups, [True, True])
+
+        # Different options
+        (dumb, lookups) = cached_scan(*input_vector_files, dumb=True)
+        eq_(dumb, results(binwalk.scan(*input_vector_files, signature=True, dumb=True, quiet=True)))
+        eq_(lookups, [False, False])
+
+        # Different file contents
+        with open(input_vector_files[1], "ab") as fp:
+            fp.write(b"\x00")
+        (modified, lookups) = cached_scan(input_vector_files[1])
+        eq_(modified, [r for r in expected if r[0] == "foobar.lzma"])
+        eq_(lookups, [False])
+
+        # Entries larger than --cachesize are never stored, even after evicting everything else
+        with open(input_vector_files[1], "ab") as fp:
+            fp.write(b"\x00")
+        (uncached, lookups) = cached_scan(input_vector_files[1], cachesize=0)
+        (uncached, lookups) = cached_scan(input_vector_files[1], cachesize=0)
+        eq_(uncached, modified)
+        eq_(lookups, [False])
+
+def test_result_cache_eviction():
+    '''
+    Test: Store more entries in a result cache than fit in its maximum size, looking up
+    the oldest entry before storing the last one.
+    Verify that the least recently used entries are evicted, and that entries larger
+    than the maximum size are not stored.
+    '''
+    with temp_dir() as path:
+        cache = binwalk.core.resultcache.ResultCache(path, 256)
+        try:
+            # Incompressible entries of about 100 bytes each
+            entries = dict([(k, os.urandom(100)) for k in "abcd"])
+
+            cache.put("a", entries["a"])
+            cache.put("b", entries["b"])
+            eq_(cache.get("a"), entries["a"])
+            cache.put("c", entries["c"])
+
+            # "b" is the least recently used entry
+            eq_(cache.get("b"), None)
+            eq_(cache.get("a"), entries["a"])
+            eq_(cache.get("c"), entries["c"])
+
+            cache.put("d", os.urandom(1024))
+            eq_(cache.get("d"), None)
+            eq_(cache.get("a"), entries["a"])
+        finally:
+            cache.close()
@@ -0,0 +1,28 @@
+import os
+import binwalk.core.magic
+import binwalk.core.settings
+from nose.tools import eq_, ok_
+from helpers import temp_dir
+
+def signatures(cache, **kwargs):
+    magic = binwalk.core.magic.Magic(cache=cache, **kwargs)
+    for magic_file in binwalk.core.settings.Settings().system.magic:
+        magic.load(magic_file)
+    return [(s.id, s.title, s.confidence) for s in magic.signatures]
+
+def test_signature_cache():
+    '''
+    Test: Load the bundled magic signatures with a signature cache, with several
+    include/exclude filters, twice each.
+    Verify that the signatures are the same as those loaded without a cache, and that
+    the cache holds one file per magic file, regardless of the filters.
+    '''
+    magic_files = binwalk.core.settings.Settings().system.magic
+
+    with temp_dir() as cache:
+        for kwargs in [{}, {'include': ['^squashfs']}, {'exclude': ['^lzma', 'filesystem']}, {}]:
+            expected = signatures(None, **kwargs)
+            ok_(expected)
+            eq_(signatures(cache, **kwargs), expected)
+            eq_(signatures(cache, **kwargs), expected)
+            eq_(len(os.listdir(cache)), len(magic_files))